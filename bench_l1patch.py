@@ -0,0 +1,135 @@
+#!/usr/bin/python
+
+import sys
+import json
+import time
+import resource
+import argparse
+import patch_node
+import patch_wire_group
+import patch_flowgen
+import patch_flowopt
+import patch_topogen
+
+
+class FlowRuleBenchmark(object):
+    """
+    Measure each phase of flow rule generation with synthetic topology:
+    parse (json), model (NodeManager/WireManager), mapping (setup_wire_entity),
+    generation and serialization.
+    """
+    PHASES = ['parse', 'model', 'mapping', 'generation', 'serialization']
+
+    def __init__(self, topology, use_mode='all'):
+        self.use_mode = use_mode
+        # input as text: same as reading files
+        self.node_text = json.dumps(topology.node_data())
+        self.wire_text = json.dumps(topology.wire_data())
+        self.phase_times = {}
+        self.rule_count = 0
+
+    def _run_phase(self, phase, func, *args):
+        start_time = time.time()
+        result = func(*args)
+        elapsed = time.time() - start_time
+        if phase not in self.phase_times or elapsed < self.phase_times[phase]:
+            self.phase_times[phase] = elapsed  # keep best time
+        return result
+
+    def run(self):
+        node_data, wire_data = self._run_phase(
+            'parse', lambda: (json.loads(self.node_text), json.loads(self.wire_text))
+        )
+        flow_rule_generator = self._run_phase(
+            'model', lambda: patch_flowgen.FlowRuleGenerator.from_managers(
+                patch_node.NodeManager(node_data),
+                patch_wire_group.WireManager(wire_data)
+            )
+        )
+        self._run_phase('mapping', flow_rule_generator.map_wire_and_port)
+        flow_rule = self._run_phase(
+            'generation', flow_rule_generator.generate_flow_rule, self.use_mode
+        )
+        self._run_phase('serialization', lambda: json.dumps(flow_rule, indent=2))
+        self.rule_count = patch_flowopt.count_flow_rule_entries(flow_rule)
+
+    def summary(self):
+        generation_time = self.phase_times.get('generation', 0)
+        total_time = sum(self.phase_times.values())
+        return {
+            'phases': self.phase_times,
+            'total': total_time,
+            'rules': self.rule_count,
+            'generation-rules-per-sec':
+                self.rule_count / generation_time if generation_time else None,
+            'total-rules-per-sec': self.rule_count / total_time if total_time else None,
+            # linux: ru_maxrss is KB
+            'peak-rss-kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        }
+
+    def dump(self, params):
+        summary = self.summary()
+        print "# benchmark: %s" % json.dumps(params, sort_keys=True)
+        for phase in self.PHASES:
+            print "  %-14s: %10.6f [sec]" % (phase, summary['phases'][phase])
+        print "  %-14s: %10.6f [sec]" % ('total', summary['total'])
+        print "  %-14s: %d" % ('rules', summary['rules'])
+        print "  %-14s: %.1f" % ('rules/sec(gen)', summary['generation-rules-per-sec'] or 0)
+        print "  %-14s: %.1f" % ('rules/sec(all)', summary['total-rules-per-sec'] or 0)
+        print "  %-14s: %d [KB]" % ('peak RSS', summary['peak-rss-kb'])
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Benchmark L1patch flow rule generation by synthetic topology"
+    )
+    arg_parser.add_argument('-d', '--dispatchers', type=int, default=4)
+    arg_parser.add_argument(
+        '-f', '--fabric',
+        default='line', choices=patch_topogen.SyntheticTopology.FABRIC_SHAPES
+    )
+    arg_parser.add_argument('-w', '--wires', type=int, default=1000)
+    arg_parser.add_argument(
+        '-e', '--exclusive-ratio', type=float, default=0.25,
+        help="Ratio of exclusive mode wire (default:0.25)"
+    )
+    arg_parser.add_argument('-g', '--wire-group-size', type=int, default=4)
+    arg_parser.add_argument(
+        '-m', '--mode',
+        default='all', choices=['all', 'exclusive', 'shared']
+    )
+    arg_parser.add_argument(
+        '-r', '--repeat', type=int, default=1,
+        help="Repeat count (report best time of each phase)"
+    )
+    arg_parser.add_argument(
+        '-j', '--json',
+        action="store_true", default=False,
+        help="Output summary as json"
+    )
+    args = arg_parser.parse_args()
+
+    params = {
+        'dispatchers': args.dispatchers,
+        'fabric': args.fabric,
+        'wires': args.wires,
+        'exclusive-ratio': args.exclusive_ratio,
+        'wire-group-size': args.wire_group_size,
+        'mode': args.mode
+    }
+    topology = patch_topogen.SyntheticTopology(
+        args.dispatchers, args.fabric, args.wires,
+        args.exclusive_ratio, args.wire_group_size
+    )
+    # benchmark only valid wire definitions
+    topology.check_placement()
+    benchmark = FlowRuleBenchmark(topology, args.mode)
+    for _ in xrange(max(1, args.repeat)):
+        benchmark.run()
+    if args.json:
+        summary = benchmark.summary()
+        summary['params'] = params
+        json.dump(summary, sys.stdout, indent=2)
+        print
+    else:
+        benchmark.dump(params)
@@ -0,0 +1,162 @@
+"""
+Delta of flow rule documents (run_l1patch_diff.py, patch_ofc_rest_knocker.py -m apply).
+Delta is applied in order: 'delete' then 'put'.
+- Added rule is put, removed rule is deleted.
+- Rule whose actions changed (same match key):
+  shared mode rule is only put: flow-mod ADD overwrites the flow entry
+  that has same match and priority, and OFC replaces it in flow store.
+  Exclusive mode rule is deleted and put again: OFC rejects the put
+  as conflict while the old rule (other wire) holds the port.
+- Changed group is put (group-mod MODIFY) without delete.
+"""
+import json
+import patch_flowgen
+import patch_ofc_flowstore
+
+
+class FlowRuleDiff(object):
+    """
+    Compare two flow rule documents ({dispatcher: [rules]})
+    and make minimal delta to apply: {'delete': {...}, 'put': {...}}.
+    Rules are identified by dpid, inport, priority and match conditions,
+    group entries (--group-table) by dpid and group id.
+    """
+    def __init__(self, base_flow_rule, target_flow_rule):
+        self.base_index = self._make_rule_index(base_flow_rule)
+        self.target_index = self._make_rule_index(target_flow_rule)
+
+    @staticmethod
+    def _make_rule_index(flow_rule):
+        # match key: (dispatcher name, rule), keep order of rules
+        rule_index = {}
+        rule_keys = []
+        for dispatcher_name, rules in flow_rule.items():
+            for rule in rules:
+                key = patch_ofc_flowstore.entry_key(rule)
+                if key not in rule_index:
+                    rule_keys.append(key)
+                rule_index[key] = (dispatcher_name, rule)
+        return rule_keys, rule_index
+
+    @staticmethod
+    def _same_rule(rule1, rule2):
+        # compare as json because actions contains list (outports)
+        return json.dumps(rule1, sort_keys=True) == json.dumps(rule2, sort_keys=True)
+
+    def diff(self):
+        delete_rule = {}
+        put_rule = {}
+        base_keys, base_index = self.base_index
+        target_keys, target_index = self.target_index
+
+        for key in base_keys:
+            dispatcher_name, rule = base_index[key]
+            if key not in target_index:
+                self._merge_rule(delete_rule, dispatcher_name, rule)
+        for key in target_keys:
+            dispatcher_name, rule = target_index[key]
+            if key not in base_index:
+                self._merge_rule(put_rule, dispatcher_name, rule)
+            elif not self._same_rule(rule, base_index[key][1]):
+                # actions changed: put only, except exclusive rule (see module doc)
+                if patch_ofc_flowstore.is_exclusive_flow(rule):
+                    base_dispatcher_name, base_rule = base_index[key]
+                    self._merge_rule(delete_rule, base_dispatcher_name, base_rule)
+                self._merge_rule(put_rule, dispatcher_name, rule)
+
+        return {
+            'delete': delete_rule,
+            'put': put_rule
+        }
+
+    def removal(self):
+        """
+        delta to remove rules of target from base:
+        rules of target that are in base (rules not in base are not sent).
+        """
+        delete_rule = {}
+        target_keys, target_index = self.target_index
+        base_keys, base_index = self.base_index
+        for key in target_keys:
+            if key in base_index:
+                dispatcher_name, rule = base_index[key]
+                self._merge_rule(delete_rule, dispatcher_name, rule)
+        return {
+            'delete': delete_rule,
+            'put': {}
+        }
+
+    @staticmethod
+    def _merge_rule(flow_rule, dispatcher_name, rule):
+        if dispatcher_name in flow_rule:
+            flow_rule[dispatcher_name].append(rule)
+        else:
+            flow_rule[dispatcher_name] = [rule]
+
+
+class FlowRuleDiffGenerator(object):
+    """
+    Make delta flow rules between snapshots of node/wire info,
+    or between snapshot and controller flows (GET /patch/flow).
+    """
+    def __init__(self, nodeinfo_filename, wireinfo_filename, use_mode='all',
+                 ofp_version="OpenFlow10", group_table=False):
+        self.use_mode = use_mode
+        self.ofp_version = ofp_version
+        self.group_table = group_table
+        self.flow_rule_generator = patch_flowgen.FlowRuleGenerator(
+            nodeinfo_filename, wireinfo_filename, ofp_version, group_table
+        )
+        self.flow_rule = self.flow_rule_generator.generate_flow_rule(use_mode)
+
+    def diff_by_files(self, base_nodeinfo_filename, base_wireinfo_filename, removal=False):
+        """ :param removal: make delta to remove the snapshot instead of apply """
+        base_flow_rule_generator = patch_flowgen.FlowRuleGenerator(
+            base_nodeinfo_filename, base_wireinfo_filename,
+            self.ofp_version, self.group_table
+        )
+        base_flow_rule = base_flow_rule_generator.generate_flow_rule(self.use_mode)
+        return self._delta(base_flow_rule, removal)
+
+    def diff_by_controller_flows(self, controller_flows, removal=False):
+        """
+        :param controller_flows: list of flow (response of GET /patch/flow)
+        :param removal: make delta to remove the snapshot instead of apply
+        """
+        base_flow_rule = self.flow_rule_by_dispatcher(self.flows_of_mode(controller_flows))
+        return self._delta(base_flow_rule, removal)
+
+    def _delta(self, base_flow_rule, removal):
+        flow_rule_diff = FlowRuleDiff(base_flow_rule, self.flow_rule)
+        if removal:
+            return flow_rule_diff.removal()
+        return flow_rule_diff.diff()
+
+    def flows_of_mode(self, flows):
+        """
+        controller has flows of all modes: select flows of use_mode,
+        otherwise flows of other mode are stale (deleted) in delta.
+        exclusive mode wire rule has EXCLUSIVE_PRIORITY,
+        group is broadcast of wire-group (shared mode).
+        """
+        if self.use_mode == 'all':
+            return flows
+        exclusive = self.use_mode == 'exclusive'
+        return [
+            flow for flow in flows
+            if exclusive == (not patch_ofc_flowstore.is_group_entry(flow)
+                             and patch_ofc_flowstore.is_exclusive_flow(flow))
+        ]
+
+    def flow_rule_by_dispatcher(self, flows):
+        # controller flows does not have dispatcher name: find it by dpid
+        dispatcher_names = {}
+        node_mgr = self.flow_rule_generator.node_mgr
+        for name, dispatcher in node_mgr.dispatcher_index.items():
+            dispatcher_names[dispatcher.datapath_id] = name
+        flow_rule = {}
+        for flow in flows:
+            dpid = flow.get('dpid')
+            dispatcher_name = dispatcher_names.get(dpid, "dpid:%s" % dpid)
+            FlowRuleDiff._merge_rule(flow_rule, dispatcher_name, flow)
+        return flow_rule
@@ -1,21 +1,86 @@
 import json
+import itertools
+import collections
+import multiprocessing
 import patch_node
 import patch_wire_group
+import patch_flowopt
+import patch_path
+import patch_placement
+import patch_profile
 import patch_error
 
+# generator shared with forked worker processes (copy-on-write)
+_worker_generator = None
+# key order of rule: True if dict rebuilt from items has same key order
+_rebuild_keeps_order = {}
+
+
+def _portable_rule(rule):
+    """
+    rule to send to parent process as (keeps order, tuple of items).
+    dict rebuilt from items may have other key order (by hash collision)
+    than generated one: such rule is rebuilt as OrderedDict,
+    because json output must be same as serial generation.
+    """
+    items = tuple(rule.iteritems())
+    keys = tuple(key for key, value in items)
+    keeps_order = _rebuild_keeps_order.get(keys)
+    if keeps_order is None:
+        keeps_order = _rebuild_keeps_order[keys] = tuple(dict(items)) == keys
+    return keeps_order, items
+
+
+def _generate_unit_fragment(unit):
+    """ run in worker process: flow rule fragment of a wire/wire-group """
+    kind, name = unit
+    fragment = _worker_generator.generate_unit_fragment(kind, name)
+    return [
+        (dispatcher_name, [_portable_rule(rule) for rule in rules])
+        for dispatcher_name, rules in fragment.iteritems()
+    ]
+
+
+def _rebuild_fragment(portable_fragment):
+    """ run in parent process: rebuild fragment in order of dispatchers """
+    return collections.OrderedDict(
+        (dispatcher_name, [
+            dict(items) if keeps_order else collections.OrderedDict(items)
+            for keeps_order, items in rules
+        ])
+        for dispatcher_name, rules in portable_fragment
+    )
+
 
 class FlowRuleGenerator(object):
-    def __init__(self, nodeinfo_filename, wireinfo_filename):
+    def __init__(self, nodeinfo_filename, wireinfo_filename,
+                 ofp_version="OpenFlow10", group_table=False):
         self.node_mgr = self.gen_node_manager_by_file(nodeinfo_filename)
-        self.wire_mgr = self.gen_wire_manager_by_file(wireinfo_filename)
+        self.wire_mgr = self.gen_wire_manager_by_file(
+            wireinfo_filename, ofp_version, group_table
+        )
+        self.path_computer = None
+        self.wire_mapped = False
+
+    @classmethod
+    def from_managers(cls, node_mgr, wire_mgr):
+        """ create generator by (already loaded) node/wire manager """
+        flow_rule_generator = cls.__new__(cls)
+        flow_rule_generator.node_mgr = node_mgr
+        flow_rule_generator.wire_mgr = wire_mgr
+        flow_rule_generator.path_computer = None
+        flow_rule_generator.wire_mapped = False
+        return flow_rule_generator
 
     @staticmethod
     def gen_node_manager_by_file(file_name):
         try:
-            node_data_file = open(file_name, 'r')
-            node_data = json.load(node_data_file)
-            node_data_file.close()
-            return patch_node.NodeManager(node_data)
+            with patch_profile.span('nodeinfo.parse'):
+                node_data_file = open(file_name, 'r')
+                node_data = json.load(node_data_file)
+                node_data_file.close()
+            with patch_profile.span('nodeinfo.model'):
+                return patch_node.NodeManager(node_data)
         except ValueError as err:
             msg = "Node info file, %s: json parse error.\n%s" % (file_name, err)
             raise patch_error.PatchDefinitionError(msg)
@@ -24,12 +89,14 @@ class FlowRuleGenerator(object):
             raise patch_error.PatchError(msg)
 
     @staticmethod
-    def gen_wire_manager_by_file(file_name):
+    def gen_wire_manager_by_file(file_name, ofp_version="OpenFlow10", group_table=False):
         try:
-            wire_data_file = open(file_name, 'r')
-            wire_data = json.load(wire_data_file)
-            wire_data_file.close()
-            return patch_wire_group.WireManager(wire_data)
+            with patch_profile.span('wireinfo.parse'):
+                wire_data_file = open(file_name, 'r')
+                wire_data = json.load(wire_data_file)
+                wire_data_file.close()
+            with patch_profile.span('wireinfo.model'):
+                return patch_wire_group.WireManager(wire_data, ofp_version, group_table)
         except ValueError as err:
             msg = "Wire info file, %s: json parse error.\n%s" % (file_name, err)
             raise patch_error.PatchDefinitionError(msg)
@@ -37,49 +104,154 @@ class FlowRuleGenerator(object):
             msg = "Cannot open wire info file: %s.\n%s" % (file_name, err)
             raise patch_error.PatchError(msg)
 
-    def _map_wire_and_port(self):
-        for name, wire in self.wire_mgr.wire_index.items():
-            wire.setup_wire_entity(self.node_mgr)
-
-    def _generate_exclusive_mode_flow_rule(self, flow_rule):
-        # create rules for exclusive mode wire
-        for exc_wire_name, exc_wire in self.wire_mgr.exclusive_wire_index.items():
-            flow_rule_by_exc_wire = exc_wire.generate_flow_rule()
-            self._merge_flow_rule(flow_rule, flow_rule_by_exc_wire)
-
-    def _generate_shared_mode_flow_rule(self, flow_rule):
-        # create rules for shared mode wire by wire-group
-        for wire_group_name, wire_group in self.wire_mgr.wire_group_index.items():
-            for wire_name in wire_group.wires:
-                # get wire object
-                wire = self.wire_mgr.wire_by_name(wire_name)
-                # get flow rules by wire
-                flow_rule_by_wire = wire.generate_flow_rule()
-                # save rules into flow_rule
-                self._merge_flow_rule(flow_rule, flow_rule_by_wire)
-
-            # get broadcast rules
-            # Notice: use path of 1st wire in wire_group as broadcast path
-            bcast_wire = self.wire_mgr.wire_by_name(wire_group.wires[0])
-            out_ports = self.wire_mgr.generate_bcast_outports_by_wire_group(
-                wire_group
+    def fill_wire_paths(self):
+        """ compute path of wires that does not have path in wire info """
+        if all(wire.has_path() for wire in self.wire_mgr.wire_index.values()):
+            return
+        with patch_profile.span('path-computation'):
+            if self.path_computer is None:
+                # adjacency of dispatchers is made once for the topology
+                self.path_computer = patch_path.PathComputer(self.node_mgr)
+            self.path_computer.fill_wire_paths(self.wire_mgr)
+
+    def place_wires(self, rebalance=True):
+        """
+        check capacity of inter-switch links (and rebalance wires on parallel links).
+        :return: placement optimizer (has per-link utilization)
+        """
+        self.fill_wire_paths()
+        with patch_profile.span('placement'):
+            placement = patch_placement.WirePlacementOptimizer(self.node_mgr)
+            placement.place(self.wire_mgr, rebalance)
+        # paths may be changed: map port entities again
+        self.wire_mapped = False
+        return placement
+
+    def map_wire_and_port(self):
+        self.fill_wire_paths()
+        with patch_profile.span('mapping'):
+            for name, wire in self.wire_mgr.wire_index.items():
+                wire.setup_wire_entity(self.node_mgr)
+        self.wire_mapped = True
+
+    def _generate_wire_group_flow_rule(self, wire_group):
+        # create rules for shared mode wire in wire-group
+        flow_rule = {}
+        for wire_name in wire_group.wires:
+            # get wire object
+            wire = self.wire_mgr.wire_by_name(wire_name)
+            # get flow rules by wire
+            flow_rule_by_wire = wire.generate_flow_rule()
+            self._count_flow_rule(wire_name, flow_rule_by_wire)
+            # save rules into flow_rule
+            self._merge_flow_rule(flow_rule, flow_rule_by_wire)
+
+        # get broadcast rules
+        # Notice: use path of 1st wire in wire_group as broadcast path
+        bcast_wire = self.wire_mgr.wire_by_name(wire_group.wires[0])
+        out_ports = self.wire_mgr.generate_bcast_outports_by_wire_group(
+            wire_group
+        )
+        flow_rule_by_wire_group = wire_group.generate_bcast_rule_by_wire_group(
+            bcast_wire, out_ports
+        )
+        self._count_flow_rule(wire_group.name, flow_rule_by_wire_group)
+        # save rules
+        self._merge_flow_rule(flow_rule, flow_rule_by_wire_group)
+        return flow_rule
+
+    @staticmethod
+    def _count_flow_rule(wire_name, flow_rule_fragment):
+        for dispatcher_name, rules in flow_rule_fragment.items():
+            patch_profile.count('rules-per-dpid', dispatcher_name, len(rules))
+            patch_profile.count('rules-per-wire', wire_name, len(rules))
+
+    def _generation_units(self, use_mode):
+        """ :return: list of (kind, name) in order of generation """
+        units = []
+        if use_mode == 'all' or use_mode == 'exclusive':
+            # exclusive mode wire
+            units.extend(
+                ('exclusive-wire', name) for name in self.wire_mgr.exclusive_wire_index.keys()
             )
-            flow_rule_by_wire_group = wire_group.generate_bcast_rule_by_wire_group(
-                bcast_wire, out_ports
+        if use_mode == 'all' or use_mode == 'shared':
+            # shared mode wire by wire-group
+            units.extend(
+                ('wire-group', name) for name in self.wire_mgr.wire_group_index.keys()
             )
-            # save rules
-            self._merge_flow_rule(flow_rule, flow_rule_by_wire_group)
+        return units
+
+    def generate_unit_fragment(self, kind, name):
+        if kind == 'exclusive-wire':
+            with patch_profile.span('generation.exclusive-wire'):
+                flow_rule_fragment = self.wire_mgr.exclusive_wire_index[name].generate_flow_rule()
+                self._count_flow_rule(name, flow_rule_fragment)
+        else:
+            with patch_profile.span('generation.wire-group'):
+                flow_rule_fragment = self._generate_wire_group_flow_rule(
+                    self.wire_mgr.wire_group_index[name]
+                )
+        return flow_rule_fragment
 
-    def generate_flow_rule(self, use_mode='all'):
+    def iter_flow_rule(self, use_mode='all', jobs=1):
+        """
+        generate flow rules wire by wire (exclusive mode wire)
+        and wire-group by wire-group (shared mode wire).
+        :param jobs: number of worker processes (>1: parallel generation)
+        :return: iterator of flow rule fragment ({dispatcher: [rules]})
+        """
         # at first, map physical port information to logical wire
-        self._map_wire_and_port()
+        if not self.wire_mapped:
+            self.map_wire_and_port()
+        units = self._generation_units(use_mode)
+        if jobs > 1 and len(units) > 1:
+            for flow_rule_fragment in self._iter_flow_rule_parallel(units, jobs):
+                yield flow_rule_fragment
+            return
+        for kind, name in units:
+            yield self.generate_unit_fragment(kind, name)
+
+    def _iter_flow_rule_parallel(self, units, jobs):
+        """
+        fork worker processes after wires are mapped (workers share node/wire
+        managers copy-on-write) and receive fragments in order of units:
+        merged flow rules are same as serial generation.
+        """
+        global _worker_generator
+        _worker_generator = self
+        pool = multiprocessing.Pool(min(jobs, len(units)))
+        try:
+            chunk_size = max(1, len(units) // (jobs * 4))
+            fragments = pool.imap(_generate_unit_fragment, units, chunk_size)
+            for (kind, name), portable_fragment in itertools.izip(units, fragments):
+                flow_rule_fragment = _rebuild_fragment(portable_fragment)
+                # counters of worker processes are lost: count by wire/wire-group
+                self._count_flow_rule(name, flow_rule_fragment)
+                yield flow_rule_fragment
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+            _worker_generator = None
+
+    def generate_flow_rule(self, use_mode='all', jobs=1):
         flow_rule = {}
-        if use_mode == 'all' or use_mode == 'exclusive':
-            self._generate_exclusive_mode_flow_rule(flow_rule)
-        if use_mode == 'all' or use_mode == 'shared':
-            self._generate_shared_mode_flow_rule(flow_rule)
+        for flow_rule_fragment in self.iter_flow_rule(use_mode, jobs):
+            self._merge_flow_rule(flow_rule, flow_rule_fragment)
         return flow_rule
 
+    def optimize_flow_rule(self, use_mode='all', jobs=1):
+        """
+        generate flow rules and optimize them by generation unit (wire/wire-group).
+        :return: optimized flow rule and optimizer (has saved entry counts)
+        """
+        flow_rule_fragments = list(self.iter_flow_rule(use_mode, jobs))
+        with patch_profile.span('optimization'):
+            optimizer = patch_flowopt.FlowRuleOptimizer(self.node_mgr, self.wire_mgr.ofp_version)
+            return optimizer.optimize(flow_rule_fragments), optimizer
+
     @staticmethod
     def _merge_flow_rule(rule, wire_rule):
         for key, value in wire_rule.items():
@@ -0,0 +1,181 @@
+import json
+import collections
+
+
+class FlowRuleOptimizer(object):
+    """
+    Reduce flow table entries of generated flow rules.
+    Input is fragments ({dispatcher: [rules]}) of generation units
+    (an exclusive wire or a wire-group, see FlowRuleGenerator.iter_flow_rule).
+    1. collapse transit rules on inter-switch hops in a unit:
+       when all rules of the unit for an inter-switch inport of a dispatcher
+       only output to same inter-switch port (no vlan/mpls action) and
+       differ only by eth_src/eth_dst/vlan_vid match,
+       they are replaced by one rule that keeps match fields common to them.
+       (traffic of the unit into inter-switch port is already filtered at edge switches)
+       When other units have rules on the inport, rules are collapsed only if
+       a kept match field distinguishes the collapsed rule from all of them.
+    2. merge identical rules (same dpid, match and actions).
+    """
+    TRANSIT_MATCH_KEYS = ('eth_src', 'eth_dst', 'vlan_vid')
+
+    def __init__(self, node_mgr, ofp_version="OpenFlow10"):
+        self.ofp_version = ofp_version
+        self.port_index = {}  # (dpid, port number): port object
+        for dispatcher in node_mgr.dispatcher_index.values():
+            for port in dispatcher.port_index.values():
+                self.port_index[(dispatcher.datapath_id, port.number)] = port
+        self.merged_count = 0
+        self.collapsed_count = 0
+        self.rule_counts = (0, 0)  # REST rules (before, after)
+        self.switch_entry_counts = (0, 0)  # flow entries in switches (before, after)
+
+    def saved_entries(self):
+        """ number of REST rules removed by optimization """
+        return self.merged_count + self.collapsed_count
+
+    def report(self):
+        return ("optimized flow rules: %d -> %d REST rules, %d -> %d switch flow entries"
+                " (merged:%d, collapsed:%d)") % (
+            self.rule_counts[0], self.rule_counts[1],
+            self.switch_entry_counts[0], self.switch_entry_counts[1],
+            self.merged_count, self.collapsed_count
+        )
+
+    def optimize(self, flow_rule_fragments):
+        """
+        :param flow_rule_fragments: list of flow rule fragment of each generation unit
+        :return: optimized flow rule ({dispatcher: [rules]})
+        """
+        # (dispatcher, inport): [(unit index, rule)]
+        inport_rules = collections.defaultdict(list)
+        for unit_index, flow_rule_fragment in enumerate(flow_rule_fragments):
+            for dispatcher_name, rules in flow_rule_fragment.items():
+                for rule in rules:
+                    inport_rules[(dispatcher_name, rule.get('inport'))].append(
+                        (unit_index, rule)
+                    )
+
+        collapsed_flow_rule = {}
+        for unit_index, flow_rule_fragment in enumerate(flow_rule_fragments):
+            for dispatcher_name, rules in flow_rule_fragment.items():
+                collapsed_flow_rule.setdefault(dispatcher_name, []).extend(
+                    self._collapse_transit_rules(
+                        dispatcher_name, unit_index, rules, inport_rules
+                    )
+                )
+
+        optimized_flow_rule = {}
+        for dispatcher_name, rules in collapsed_flow_rule.items():
+            optimized_flow_rule[dispatcher_name] = self._merge_identical_rules(rules)
+
+        before_count = sum(count_flow_rule_entries(f) for f in flow_rule_fragments)
+        self.rule_counts = (before_count, count_flow_rule_entries(optimized_flow_rule))
+        self.switch_entry_counts = (
+            sum(count_switch_entries(f, self.ofp_version) for f in flow_rule_fragments),
+            count_switch_entries(optimized_flow_rule, self.ofp_version)
+        )
+        return optimized_flow_rule
+
+    def _merge_identical_rules(self, rules):
+        merged_rules = []
+        rule_strs = set()
+        for rule in rules:
+            rule_str = json.dumps(rule, sort_keys=True)
+            if rule_str in rule_strs:
+                self.merged_count += 1
+            else:
+                rule_strs.add(rule_str)
+                merged_rules.append(rule)
+        return merged_rules
+
+    def _is_inter_switch_port(self, dpid, port_number):
+        port = self.port_index.get((dpid, port_number))
+        return port is not None and port.is_inter_switch_port()
+
+    def _is_transit_rule(self, rule):
+        dpid = rule.get('dpid')
+        for key in rule.keys():
+            if key in ('dpid', 'inport', 'outport', 'priority'):
+                continue
+            if key not in self.TRANSIT_MATCH_KEYS:
+                return False  # has other match or action
+        return ('outport' in rule
+                and self._is_inter_switch_port(dpid, rule.get('inport'))
+                and self._is_inter_switch_port(dpid, rule.get('outport')))
+
+    def _common_match(self, rules):
+        """ transit match fields that have same value in all rules """
+        common_match = {}
+        for key in self.TRANSIT_MATCH_KEYS:
+            values = set(rule.get(key) for rule in rules)
+            if len(values) == 1 and key in rules[0]:
+                common_match[key] = rules[0][key]
+        return common_match
+
+    @staticmethod
+    def _is_distinguished(common_match, other_rules):
+        """ a packet matched by common_match is not matched by any of other_rules """
+        for key, value in common_match.items():
+            if all(key in rule and rule[key] != value for rule in other_rules):
+                return True
+        return False
+
+    def _collapse_transit_rules(self, dispatcher_name, unit_index, rules, inport_rules):
+        # inport: [rule] of the unit, keep order of rules
+        unit_inport_rules = collections.OrderedDict()
+        for rule in rules:
+            unit_inport_rules.setdefault(rule.get('inport'), []).append(rule)
+
+        collapsed_matches = {}  # inport: common match of collapsed rules
+        for inport, rules_by_inport in unit_inport_rules.items():
+            outports = set(rule.get('outport') for rule in rules_by_inport)
+            if not (len(rules_by_inport) > 1 and len(outports) == 1
+                    and all(self._is_transit_rule(rule) for rule in rules_by_inport)):
+                continue
+            common_match = self._common_match(rules_by_inport)
+            other_rules = [
+                rule for index, rule in inport_rules[(dispatcher_name, inport)]
+                if index != unit_index
+            ]
+            if other_rules and not self._is_distinguished(common_match, other_rules):
+                continue  # collapsed rule would match traffic of other units
+            collapsed_matches[inport] = common_match
+
+        collapsed_rules = []
+        for rule in rules:
+            inport = rule.get('inport')
+            if inport not in collapsed_matches:
+                collapsed_rules.append(rule)
+            elif inport in unit_inport_rules:
+                rules_by_inport = unit_inport_rules.pop(inport)
+                collapsed_rule = {
+                    'dpid': rule.get('dpid'),
+                    'inport': inport,
+                    'outport': rule.get('outport'),
+                    'priority': max(r.get('priority') for r in rules_by_inport)
+                }
+                collapsed_rule.update(collapsed_matches[inport])
+                collapsed_rules.append(collapsed_rule)
+                self.collapsed_count += len(rules_by_inport) - 1
+        return collapsed_rules
+
+
+def count_flow_rule_entries(flow_rule):
+    """ number of REST rules (flow and group requests) """
+    return sum(len(rules) for rules in flow_rule.values())
+
+
+def count_switch_entries(flow_rule, ofp_version="OpenFlow10"):
+    """
+    number of flow entries installed in switches by the flow rule:
+    group requests are not flow entries and an OpenFlow13 rule with pop_vlan
+    is installed as two entries by eth_type (ARP/IP, see FlowRuleOF13.action_pop_vlan).
+    """
+    count = 0
+    for rules in flow_rule.values():
+        for rule in rules:
+            if 'buckets' in rule:
+                continue  # group table entry
+            count += 2 if ofp_version == "OpenFlow13" and 'pop_vlan' in rule else 1
+    return count
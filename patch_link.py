@@ -1,7 +1,14 @@
+import collections
+import patch_name
+import patch_error
+
+
 class NodeLinkElement(object):
+    __slots__ = ('node', 'port', 'port_entity', 'node_entity')
+
     def __init__(self, node_name, port_name):
-        self.node = node_name
-        self.port = port_name
+        self.node = patch_name.intern_name(node_name)
+        self.port = patch_name.intern_name(port_name)
         self.port_entity = None  # NodePort object
         self.node_entity = None
 
@@ -13,11 +20,20 @@ class NodeLinkElement(object):
 
 
 class NodeLink(object):
-    def __init__(self, endpoint1, endpoint2):
+    __slots__ = ('endpoint1', 'endpoint2', 'cost')
+
+    def __init__(self, endpoint1, endpoint2, cost=1):
         self.endpoint1 = endpoint1
         self.endpoint2 = endpoint2
-        self.in_elm = endpoint1  # alias
-        self.out_elm = endpoint2  # alias
+        self.cost = cost  # used by path computation
+
+    @property
+    def in_elm(self):
+        return self.endpoint1  # alias
+
+    @property
+    def out_elm(self):
+        return self.endpoint2  # alias
 
     def counterpart(self, link_elm):
         if link_elm == self.endpoint1:
@@ -43,25 +59,70 @@ class NodeLink(object):
 
 class NodeLinkManager(object):
     def __init__(self, link_data):
-        self.link_data = link_data  # link list data
         self.links = []
-        self._setup_links()
+        self.endpoint_index = {}  # (node, port): (link, counterpart link element)
+        self._setup_links(link_data)
 
-    def _setup_links(self):
-        for link in self.link_data:
+    def __getstate__(self):
+        # pickled (topology cache) index keeps order of endpoints:
+        # dict rebuilt by unpickling may iterate in other order
+        state = dict(self.__dict__)
+        state['endpoint_index'] = collections.OrderedDict(self.endpoint_index.iteritems())
+        return state
+
+    def _setup_links(self, link_data):
+        for link in link_data:
             endpoint1 = NodeLinkElement(*link[0])
             endpoint2 = NodeLinkElement(*link[1])
-            self.links.append(NodeLink(endpoint1, endpoint2))
+            node_link = NodeLink(endpoint1, endpoint2, self._link_cost(link))
+            self._setup_endpoint_index(node_link, endpoint1, endpoint2)
+            self._setup_endpoint_index(node_link, endpoint2, endpoint1)
+            self.links.append(node_link)
+
+    @staticmethod
+    def _link_cost(link):
+        # optional 3rd element of link: link attributes, e.g. {"cost": 10}
+        if len(link) < 3:
+            return 1
+        try:
+            cost = link[2]['cost']
+        except (KeyError, TypeError):
+            msg = "Link:%s has invalid attributes (must be {\"cost\": N})" % link
+            raise patch_error.PatchDefinitionError(msg)
+        if not isinstance(cost, (int, long)) or cost < 1:
+            msg = "Link:%s has invalid cost:%s" % (link, cost)
+            raise patch_error.PatchDefinitionError(msg)
+        return cost
+
+    def _setup_endpoint_index(self, link, endpoint, counterpart):
+        key = (endpoint.node, endpoint.port)
+        if key not in self.endpoint_index:
+            self.endpoint_index[key] = (link, counterpart)
+            return
+        # a (trunk) port can be linked to vlan sub-interfaces of one node,
+        # keep the first link as same as defined order in link-list
+        indexed_counterpart = self.endpoint_index[key][1]
+        if (indexed_counterpart.node != counterpart.node
+                or indexed_counterpart == counterpart):
+            msg = "Node,Port=%s,%s is linked to both %s and %s" % (
+                endpoint.node, endpoint.port, indexed_counterpart, counterpart
+            )
+            raise patch_error.PatchDefinitionError(msg)
 
     def find_link(self, link_elm):
-        for link in self.links:
-            if link.has_endpoint(link_elm):
-                return link
-        return None
+        return self.find_link_by_name(link_elm.node, link_elm.port)
 
     def find_link_by_name(self, node_name, port_name):
-        link_elm = NodeLinkElement(node_name, port_name)
-        return self.find_link(link_elm)
+        entry = self.endpoint_index.get((node_name, port_name))
+        if entry:
+            return entry[0]
+        return None
+
+    def counterpart_by_name(self, node_name, port_name):
+        entry = self.endpoint_index.get((node_name, port_name))
+        if entry:
+            return entry[1]
+        return None
 
     def dump(self):
         for link in self.links:
@@ -0,0 +1,8 @@
+# Interning table of node/port names.
+# Same name string is shared by node, port and link objects
+# instead of keeping a copy parsed from each place in json.
+_name_table = {}
+
+
+def intern_name(name):
+    return _name_table.setdefault(name, name)
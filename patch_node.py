@@ -1,5 +1,6 @@
 import json
 import collections
+import patch_name
 import patch_port
 import patch_link
 import patch_error
@@ -7,12 +8,15 @@ import patch_error
 
 # Node class
 class TestEnvNode(object):
+    __slots__ = ('name', 'port_index', 'port_data_index')
+    role = None
+    datapath_id = 0  # default
+
     def __init__(self, node_name, node_data):
-        self.name = node_name
-        self.data = node_data  # dictionary
+        self.name = patch_name.intern_name(node_name)
         self.port_index = {}
-        self.datapath_id = 0
-        self.role = None
+        # raw port data, kept until ports are typed by NodeManager
+        self.port_data_index = node_data['port-index']
         # setup port index: dictionary of port object
         self._setup_port_index()
 
@@ -24,9 +28,15 @@ class TestEnvNode(object):
             return self.port_index[port_name]
         return None
 
+    def port_data_by_name(self, port_name):
+        return self.port_data_index[port_name]
+
+    def release_port_data(self):
+        self.port_data_index = None
+
     def _setup_port_index(self):
-        port_index = self.data['port-index']
-        for port_name, port_data in port_index.items():
+        for port_name, port_data in self.port_data_index.items():
+            port_name = patch_name.intern_name(port_name)
             self.port_index[port_name] = patch_port.NodePort(port_name, port_data)
 
     def __str__(self):
@@ -39,65 +49,69 @@ class TestEnvNode(object):
 
 
 class TestHost(TestEnvNode):
-    def __init__(self, node_name, node_data):
-        super(TestHost, self).__init__(node_name, node_data)
-        self.role = 'test-host'
+    __slots__ = ()
+    role = 'test-host'
 
 
 class DUTHost(TestEnvNode):
-    def __init__(self, node_name, node_data):
-        super(DUTHost, self).__init__(node_name, node_data)
-        self.role = 'dut-host'
+    __slots__ = ()
+    role = 'dut-host'
 
 
 class Dispatcher(TestEnvNode):
+    __slots__ = ('datapath_id',)
+    role = "switch"
+
     def __init__(self, node_name, node_data):
         super(Dispatcher, self).__init__(node_name, node_data)
-        self.role = "switch"
         self.datapath_id = node_data['datapath-id']
 
 
 # Node Manager
 class NodeManager(object):
     def __init__(self, node_data):
-        self.node_data = node_data
         # use OrderedDict to keep order defined in config file
         # (also, must use OrderedDict as node_data)
         self.dispatcher_index = collections.OrderedDict()
         self.test_host_index = collections.OrderedDict()
         self.dut_host_index = collections.OrderedDict()
-        self.linkmgr = patch_link.NodeLinkManager(self.node_data['link-list'])
-        self._setup_dispatchers()
-        self._setup_test_hosts()
-        self._setup_dut_hosts()
+        self.linkmgr = patch_link.NodeLinkManager(node_data['link-list'])
+        self._setup_dispatchers(node_data)
+        self._setup_test_hosts(node_data)
+        self._setup_dut_hosts(node_data)
         self._setup_node_port()
+        # raw json data is not necessary after all ports are typed
+        self._release_port_data()
 
-    def _setup_dispatchers(self):
+    def _setup_dispatchers(self, node_data):
         try:
-            dispatcher_data = self.node_data['dispatchers']
+            dispatcher_data = node_data['dispatchers']
         except KeyError:
             msg = "Could not find 'dispatcher' data in node info"
             raise patch_error.PatchDefinitionError(msg)
         for di_name, di_data in dispatcher_data.items():
-            self.dispatcher_index[di_name] = Dispatcher(di_name, di_data)
+            node = Dispatcher(di_name, di_data)
+            self.dispatcher_index[node.name] = node
 
-    def _setup_test_hosts(self):
+    def _setup_test_hosts(self, node_data):
         try:
-            test_hosts_data = self.node_data['test-hosts']
+            test_hosts_data = node_data['test-hosts']
         except KeyError:
             msg = "Could not find 'test-hosts' data in node info"
             raise patch_error.PatchDefinitionError(msg)
         for th_name, th_data in test_hosts_data.items():
-            self.test_host_index[th_name] = TestHost(th_name, th_data)
+            node = TestHost(th_name, th_data)
+            self.test_host_index[node.name] = node
 
-    def _setup_dut_hosts(self):
+    def _setup_dut_hosts(self, node_data):
         try:
-            dut_hosts_data = self.node_data['dut-hosts']
+            dut_hosts_data = node_data['dut-hosts']
         except KeyError:
             msg = "Could not find 'dut-hosts' data in node info"
             raise patch_error.PatchDefinitionError(msg)
         for dut_name, dut_data in dut_hosts_data.items():
-            self.dut_host_index[dut_name] = DUTHost(dut_name, dut_data)
+            node = DUTHost(dut_name, dut_data)
+            self.dut_host_index[node.name] = node
 
     @staticmethod
     def __do_each_node_port(node_index, func):
@@ -109,9 +123,8 @@ class NodeManager(object):
                 func(node, node_name, port_name)
 
     def __counterpart_node_role(self, node_name, port_name):
-        link = self.linkmgr.find_link_by_name(node_name, port_name)
-        if link:
-            counterpart_port = link.counterpart_by_name(node_name, port_name)
+        counterpart_port = self.linkmgr.counterpart_by_name(node_name, port_name)
+        if counterpart_port:
             counterpart_node = self.node_by_name(counterpart_port.node)
             return counterpart_node.role
         else:
@@ -120,7 +133,7 @@ class NodeManager(object):
 
     def __create_test_host_port(self, host, host_name, port_name):
         cp_role = self.__counterpart_node_role(host_name, port_name)
-        port_data = host.port_index[port_name].data
+        port_data = host.port_data_by_name(port_name)
         if cp_role == 'switch':
             host.port_index[port_name]\
                 = patch_port.TestHostPort(port_name, port_data)
@@ -130,7 +143,7 @@ class NodeManager(object):
 
     def __create_dut_host_port(self, host, host_name, port_name):
         cp_role = self.__counterpart_node_role(host_name, port_name)
-        port_data = host.port_index[port_name].data
+        port_data = host.port_data_by_name(port_name)
         if cp_role == 'switch':
             host.port_index[port_name]\
                 = patch_port.DUTHostPort(port_name, port_data)
@@ -141,7 +154,7 @@ class NodeManager(object):
     def __create_dispatcher_port(self, dispatcher, dispatcher_name, port_name):
         cp_role = self.__counterpart_node_role(dispatcher_name, port_name)
         # print "// switch:%s, port:%s, role:%s" % (dispatcher_name, port_name, cp_role)
-        port_data = dispatcher.port_index[port_name].data
+        port_data = dispatcher.port_data_by_name(port_name)
         if cp_role == 'test-host':
             dispatcher.port_index[port_name]\
                 = patch_port.HostEdgePort(port_name, port_data)
@@ -163,6 +176,11 @@ class NodeManager(object):
         self.__do_each_node_port(
             self.dispatcher_index, self.__create_dispatcher_port)
 
+    def _release_port_data(self):
+        for node_index in [self.test_host_index, self.dut_host_index, self.dispatcher_index]:
+            for node in node_index.values():
+                node.release_port_data()
+
     def dump_dispatchers(self):
         """ for debug """
         for dispatcher in self.dispatcher_index.values():
@@ -1,10 +1,14 @@
 import logging
 import json
+import time
+import functools
+import collections
 from webob import Response
+from ryu import cfg
 from ryu.base import app_manager
 from ryu.controller import ofp_event
 from ryu.controller import dpset
-# from ryu.controller.handler import MAIN_DISPATCHER
+from ryu.controller.handler import MAIN_DISPATCHER
 from ryu.controller.handler import CONFIG_DISPATCHER
 from ryu.controller.handler import set_ev_cls
 from ryu.ofproto import ofproto_v1_0
@@ -14,8 +18,14 @@ from ryu.lib import ofctl_v1_0
 from ryu.lib import ofctl_v1_2
 from ryu.lib import ofctl_v1_3
 from ryu.app.wsgi import ControllerBase, WSGIApplication, route
+import patch_ofc_decoder
 import patch_ofc_flowbuilder
+import patch_ofc_flowstore
+import patch_ofc_intentdb
+import patch_ofc_reconciler
+import patch_ofc_sender
 import patch_ofc_error
+import patch_profile
 
 '''
 "L1patch" OpenFlow controller based on "OFPatchPanel".
@@ -26,6 +36,29 @@ https://github.com/nmasao/OFPatchPanel-SDNHackathon2014
 
 patch_instance_name = 'patch_app'
 LOG = logging.getLogger('ryu.app.patch.patch_rest')
+JOB_WAIT_TIMEOUT = 10  # sec, for request with ?wait=true
+
+CONF = cfg.CONF
+CONF.register_opts([
+    cfg.StrOpt('patch-db', default='patch_flows.db',
+               help='SQLite file to keep requested patch flows (empty: in memory only)')
+])
+
+
+def record_latency(name):
+    """
+    decorator for PatchController: record request latency into histogram of PatchPanel
+    """
+    def _record_latency(controller_method):
+        @functools.wraps(controller_method)
+        def _wrapper(self, req, **kwargs):
+            start_time = time.time()
+            try:
+                return controller_method(self, req, **kwargs)
+            finally:
+                self.patch_app.record_latency(name, time.time() - start_time)
+        return _wrapper
+    return _record_latency
 
 
 class PatchPanel(app_manager.RyuApp):
@@ -43,7 +76,49 @@ class PatchPanel(app_manager.RyuApp):
         self.dpset = kwargs['dpset']
         wsgi = kwargs['wsgi']
         wsgi.register(PatchController, {patch_instance_name: self})
-        self.patch_flows = []  # list of dict(flow)
+        self.patch_flows = patch_ofc_flowstore.PatchFlowStore()
+        # (dpid, group_id): group request (OF1.2-, broadcast of wire-group)
+        self.patch_groups = collections.OrderedDict()
+        # changes of patch_flows/groups in current request, saved by _save_patch_flows()
+        self.patch_flow_changes = []
+        self.intent_db = None
+        if CONF.patch_db:
+            self._load_patch_flows(CONF.patch_db)
+        # name (REST route or ofctl call): latency histogram
+        self.latency_histograms = collections.OrderedDict()
+        # flow rule templates cached by (ofp version, request shape)
+        self.flow_builder = patch_ofc_flowbuilder.CompiledFlowRuleBuilder()
+        # per-datapath outbound flow-mod queues
+        self.sender = patch_ofc_sender.PatchFlowSender(self)
+        # restore flows into (re)connected datapath and audit flow tables
+        self.reconciler = patch_ofc_reconciler.PatchFlowReconciler(self)
+        self.reconciler.start_audit()
+
+    def record_latency(self, name, seconds):
+        if name not in self.latency_histograms:
+            self.latency_histograms[name] = patch_profile.LatencyHistogram()
+        self.latency_histograms[name].record(seconds)
+
+    def _load_patch_flows(self, db_file_name):
+        self.intent_db = patch_ofc_intentdb.PatchIntentDB(db_file_name)
+        # groups at first: flows that refer a group reserve its outports
+        for req_group in self.intent_db.load_groups():
+            self.patch_groups[(req_group.get('dpid'), req_group.get('group_id'))] = req_group
+            self.patch_flows.set_group(req_group)
+        for flow in self.intent_db.load():
+            self.patch_flows.add(flow)
+        LOG.info("Loaded %d patch flows and %d groups from %s",
+                 len(self.patch_flows), len(self.patch_groups), db_file_name)
+
+    def _save_patch_flows(self):
+        # write changes of a request at once
+        changes, self.patch_flow_changes = self.patch_flow_changes, []
+        if self.intent_db is None:
+            return
+        try:
+            self.intent_db.apply(changes)
+        except patch_ofc_error.PatchOfcError as err:
+            LOG.error(err.message)
 
     @set_ev_cls(ofp_event.EventOFPSwitchFeatures, CONFIG_DISPATCHER)
     def switch_features_handler(self, ev):
@@ -65,55 +140,322 @@ class PatchPanel(app_manager.RyuApp):
             msg = "DPID:%s, Cannot set default deny flow rule." % datapath.id
             raise patch_ofc_error.PatchOfcError(msg)
 
-    def add_patch_flow(self, req_flow):
-        self._mod_patch_flow(req_flow, 'put')
+    @set_ev_cls(dpset.EventDP, dpset.DPSET_EV_DISPATCHER)
+    def datapath_handler(self, ev):
+        if ev.enter:
+            # default deny rule is already set: reconcile flows in table
+            try:
+                group_job = self._restore_patch_groups(ev.dp)
+                self.reconciler.start_reconciliation(ev.dp, group_job)
+            except patch_ofc_error.PatchOfcError as err:
+                LOG.error(err.message)
+        else:
+            self.sender.datapath_left(ev.dp)
+            self.reconciler.datapath_left(ev.dp)
+
+    @set_ev_cls(ofp_event.EventOFPBarrierReply, MAIN_DISPATCHER)
+    def barrier_reply_handler(self, ev):
+        self.sender.barrier_reply(ev.msg)
+
+    @set_ev_cls(ofp_event.EventOFPErrorMsg, MAIN_DISPATCHER)
+    def error_msg_handler(self, ev):
+        self.sender.error_reply(ev.msg)
+
+    @set_ev_cls(ofp_event.EventOFPFlowStatsReply, MAIN_DISPATCHER)
+    def flow_stats_reply_handler(self, ev):
+        self.reconciler.flow_stats_reply(ev.msg)
+
+    @set_ev_cls(ofp_event.EventOFPAggregateStatsReply, MAIN_DISPATCHER)
+    def aggregate_stats_reply_handler(self, ev):
+        self.reconciler.aggregate_stats_reply(ev.msg)
+
+    def add_patch_flow(self, flow_req, wait=False):
+        return self._mod_patch_flow(flow_req, 'put', wait)
+
+    def delete_patch_flow(self, flow_req, wait=False):
+        return self._mod_patch_flow(flow_req, 'delete', wait)
+
+    def add_patch_flows(self, flow_reqs_dic, wait=False):
+        return self._mod_patch_flows(flow_reqs_dic, 'put', wait)
+
+    def delete_patch_flows(self, flow_reqs_dic, wait=False):
+        return self._mod_patch_flows(flow_reqs_dic, 'delete', wait)
+
+    def add_patch_group(self, req_group, wait=False):
+        return self._mod_patch_group(req_group, 'put', wait)
 
-    def delete_patch_flow(self, req_flow):
-        self._mod_patch_flow(req_flow, 'delete')
+    def delete_patch_group(self, req_group, wait=False):
+        return self._mod_patch_group(req_group, 'delete', wait)
+
+    def _mod_patch_group(self, req_group, command, wait=False):
+        """
+        put (add or modify) / delete a group:
+        change of wire-group members is one group-mod.
+        """
+        if command not in ['delete', 'put']:
+            LOG.error("Unknown command: %s" % command)
+            return Response(status=501)
+        if not isinstance(req_group, dict):
+            LOG.error("Invalid group request: %s" % req_group)
+            return Response(status=400)
+
+        dpid = req_group.get('dpid')
+        dp = self.dpset.get(dpid)
+        if dp is None:
+            LOG.error("Cannot find datapath-id:%s" % dpid)
+            return Response(status=400)
+
+        group_key = (dpid, req_group.get('group_id'))
+        try:
+            group = patch_ofc_flowbuilder.GroupEntryBuilder(dp, req_group).build_group()
+            dp_command = self._get_group_command(dp, command, group_key in self.patch_groups)
+        except (patch_ofc_error.PatchOfcRestError,
+                patch_ofc_error.PatchOfcError) as err:
+            LOG.error(err.message)
+            return Response(status=400)
+        if command == 'put':
+            # outports of buckets are used by flows that refer the group
+            try:
+                self.patch_flows.check_group_conflict(req_group)
+            except patch_ofc_error.PatchOfcConflictError as err:
+                LOG.info(err.message)
+                return self._conflict_response(err.to_dict())
+            self.patch_groups[group_key] = req_group
+            self.patch_flows.set_group(req_group)
+            self.patch_flow_changes.append(('put', req_group))
+        else:
+            old_group = self.patch_groups.pop(group_key, None)
+            if old_group is not None:
+                self.patch_flows.remove_group(old_group)
+                self.patch_flow_changes.append(('delete', old_group))
+        self._save_patch_flows()
+        LOG.debug("%s, dpid:%d, group:%s", command.upper(), dpid, json.dumps(group))
+        job = self.sender.new_job()
+        self.sender.submit(job, dp, [(group, dp_command)])
+        job.close()
+        return self._job_response(job, None, wait, queued_status=200)
 
-    def _mod_patch_flow(self, req_flow, command):
+    @staticmethod
+    def _get_group_command(dp, command, exists):
+        if command == 'delete':
+            return dp.ofproto.OFPGC_DELETE
+        elif command == 'put':
+            return dp.ofproto.OFPGC_MODIFY if exists else dp.ofproto.OFPGC_ADD
+        else:
+            msg = "Unknown command: %s" % command
+            raise patch_ofc_error.PatchOfcError(msg)
+
+    def _restore_patch_groups(self, dp):
+        """
+        queue group-mods of stored groups of dp: DELETE and ADD,
+        switch may keep the group (ADD fails) or not (MODIFY fails).
+        flows that refer a deleted group are removed by switch:
+        reconciliation pushes them after this job is finished.
+        :return: job or None (no stored group)
+        """
+        group_mods = []
+        for (dpid, group_id), req_group in self.patch_groups.items():
+            if dpid != dp.id:
+                continue
+            group = patch_ofc_flowbuilder.GroupEntryBuilder(dp, req_group).build_group()
+            group_mods.append((group, dp.ofproto.OFPGC_DELETE))
+            group_mods.append((group, dp.ofproto.OFPGC_ADD))
+        if not group_mods:
+            return None
+        job = self.sender.new_job()
+        self.sender.submit(job, dp, group_mods)
+        job.close()
+        return job
+
+    def _mod_patch_flow(self, flow_req, command, wait=False):
+        """ :param flow_req: PatchFlowRequest (decoded request) """
         # check command
         if command not in ['delete', 'put']:
             LOG.error("Unknown command: %s" % command)
             return Response(status=501)
 
         # Check before send flow-mod
-        dpid = req_flow.get('dpid')
+        req_flow = flow_req.flow
+        dpid = flow_req.dpid
         dp = self.dpset.get(dpid)
         if dp is None:
             LOG.error("Cannot find datapath-id:%s" % dpid)
             return Response(status=400)
 
-        # TODO: resource overwrap-check for exclusive mode wire
-        # for flow in self.patch_flows:
-        #     if dpid == flow['dpid'] and inport == flow['inport']:
-        #         LOG.info('Requested inport is already used (dpid:%s, inport:%d)', dpid, inport)
-        #         return Response(status=400)
+        # resource overwrap-check for exclusive mode wire
+        if command == 'put':
+            try:
+                self.patch_flows.check_conflict(req_flow)
+            except patch_ofc_error.PatchOfcConflictError as err:
+                LOG.info(err.message)
+                return self._conflict_response(err.to_dict())
 
         try:
-            flow_rules = patch_ofc_flowbuilder.FlowRuleBuilder(dp, req_flow).build_flow()
-            for flow_rule in flow_rules:
-                print "--------------------------"
-                print "%s, dpid:%d (ofp_ver:%d)" % (
-                    command.upper(), dpid, dp.ofproto.OFP_VERSION
-                )
-                print json.dumps(req_flow)
-                print json.dumps(flow_rule)
-                self._mod_patch_flow_entry(
-                    dp, flow_rule, self._get_datapath_command(dp, command)
-                )
-                self._post_mod_patch_flow(req_flow, command)
-                print "--------------------------"
-            cors_headers = {'Access-Control-Allow-Origin': '*'}
+            flow_mods = self._build_patch_flow_mods(dp, flow_req, command)
+            self._post_mod_patch_flow(req_flow, command, len(flow_mods))
             # Notice: Any request will accepted (status=200)
             # if the request can send flow-mod to OFS
             # (When the request does not have invalid dpid, invalid ofp-version.)
             # Does not matter whether the request is match/correct.
-            return Response(status=200, headers=cors_headers)
+            job = self.sender.new_job()
+            self.sender.submit(job, dp, flow_mods)
+            job.close()
         except (patch_ofc_error.PatchOfcRestError,
                 patch_ofc_error.PatchOfcError) as err:
             LOG.error(err.message)
             return Response(status=501)
+        finally:
+            self._save_patch_flows()
+        return self._job_response(job, None, wait, queued_status=200)
+
+    def _job_response(self, job, body, wait, status=None, queued_status=202):
+        """
+        response of flow-mod job, status:
+        200 (confirmed by barrier, no error reply), 502 (failed) or
+        202 (waited but not confirmed yet). queued_status if not waited:
+        single flow/group API keeps 200 (accepted), bulk API answers 202.
+        """
+        if wait:
+            job.wait(JOB_WAIT_TIMEOUT)
+        if status is None:
+            if job.is_finished():
+                status = 200 if job.status == 'done' else 502
+            elif wait:
+                status = 202
+            else:
+                status = queued_status
+        headers = {
+            'Access-Control-Allow-Origin': '*',
+            'Location': '/patch/job/%d' % job.id
+        }
+        if body is None:
+            body = json.dumps(job.to_dict())
+        return Response(content_type='application/json',
+                        body=body, status=status, headers=headers)
+
+    def _mod_patch_flows(self, flow_reqs_dic, command, wait=False):
+        """
+        queue flow-mods of whole flow rule document ({dispatcher: [rules]})
+        grouped by datapath: each group is sent as a batch closed by a barrier.
+        :param flow_reqs_dic: {dispatcher: [PatchFlowRequest]} (decoded document)
+        """
+        # check command
+        if command not in ['delete', 'put']:
+            LOG.error("Unknown command: %s" % command)
+            return Response(status=501)
+
+        # results keep same structure as request: {dispatcher: [result]}
+        results = {}
+        # dpid: [(dispatcher_name, index, flow_req)], keep request order
+        dpid_flows = collections.OrderedDict()
+        for dispatcher_name, flow_reqs in flow_reqs_dic.items():
+            results[dispatcher_name] = [None] * len(flow_reqs)
+            for index, flow_req in enumerate(flow_reqs):
+                dpid_flows.setdefault(flow_req.dpid, []).append(
+                    (dispatcher_name, index, flow_req)
+                )
+
+        # pre-validate whole document before any flow-mod is sent
+        if command == 'put':
+            if self._check_patch_flows_conflict(dpid_flows, results):
+                return self._conflict_response(results)
+
+        all_succeeded = True
+        job = self.sender.new_job()
+        for dpid, flows in dpid_flows.items():
+            dp = self.dpset.get(dpid)
+            flow_mods = []
+            for dispatcher_name, index, flow_req in flows:
+                # queued: confirmed when the job is finished
+                result = {'dpid': dpid, 'status': 202}
+                if dp is None:
+                    result.update({
+                        'status': 400,
+                        'message': "Cannot find datapath-id:%s" % dpid
+                    })
+                else:
+                    try:
+                        flow_req_mods = self._build_patch_flow_mods(dp, flow_req, command)
+                        self._post_mod_patch_flow(flow_req.flow, command, len(flow_req_mods))
+                        flow_mods.extend(flow_req_mods)
+                    except (patch_ofc_error.PatchOfcRestError,
+                            patch_ofc_error.PatchOfcError) as err:
+                        LOG.error(err.message)
+                        result.update({'status': 501, 'message': err.message})
+                if result['status'] != 202:
+                    all_succeeded = False
+                results[dispatcher_name][index] = result
+            if dp is not None:
+                # one batch (and barrier) per datapath
+                self.sender.submit(job, dp, flow_mods)
+        job.close()
+        self._save_patch_flows()
+
+        if wait:
+            job.wait(JOB_WAIT_TIMEOUT)
+        if job.is_finished():
+            self._confirm_patch_flows_results(results, job)
+        return self._job_response(
+            job, json.dumps(results), False, None if all_succeeded else 400
+        )
+
+    @staticmethod
+    def _confirm_patch_flows_results(results, job):
+        """ queued rules (202) are done (200) or failed (502) with the job """
+        for dispatcher_results in results.values():
+            for result in dispatcher_results:
+                if result['status'] != 202:
+                    continue
+                if job.status == 'done':
+                    result['status'] = 200
+                else:
+                    result.update({
+                        'status': 502,
+                        'message': "Flow-mods of job %d failed" % job.id
+                    })
+
+    def _check_patch_flows_conflict(self, dpid_flows, results):
+        """
+        :return: True if there are conflicts (results are filled by each rule)
+        """
+        all_flows = [flow_req.flow for flows in dpid_flows.values()
+                     for dispatcher_name, index, flow_req in flows]
+        conflicts = dict(
+            (id(req_flow), err)
+            for req_flow, err in self.patch_flows.check_conflicts(all_flows)
+        )
+        if not conflicts:
+            return False
+        for dpid, flows in dpid_flows.items():
+            for dispatcher_name, index, flow_req in flows:
+                if id(flow_req.flow) in conflicts:
+                    err = conflicts[id(flow_req.flow)]
+                    LOG.info(err.message)
+                    result = {'dpid': dpid, 'status': 409,
+                              'message': err.message, 'conflict': err.to_dict()}
+                else:
+                    result = {'dpid': dpid, 'status': 424,
+                              'message': "Not sent: conflict in flow document"}
+                results[dispatcher_name][index] = result
+        return True
+
+    @staticmethod
+    def _conflict_response(body):
+        cors_headers = {'Access-Control-Allow-Origin': '*'}
+        return Response(content_type='application/json',
+                        body=json.dumps(body), status=409,
+                        headers=cors_headers)
+
+    def _build_patch_flow_mods(self, dp, flow_req, command):
+        """ :return: list of (flow_rule, datapath command) to send by sender """
+        flow_rules = self.flow_builder.build_flow(dp, flow_req)
+        dp_command = self._get_datapath_command(dp, command)
+        if LOG.isEnabledFor(logging.DEBUG):
+            for flow_rule in flow_rules:
+                LOG.debug("%s, dpid:%d (ofp_ver:%d), request:%s, flow:%s",
+                          command.upper(), dp.id, dp.ofproto.OFP_VERSION,
+                          json.dumps(flow_req.flow), json.dumps(flow_rule))
+        return [(flow_rule, dp_command) for flow_rule in flow_rules]
 
     @staticmethod
     def _get_datapath_command(dp, command):
@@ -125,32 +467,49 @@ class PatchPanel(app_manager.RyuApp):
             msg = "Unknown command: %s" % command
             raise patch_ofc_error.PatchOfcError(msg)
 
-    def _post_mod_patch_flow(self, req_flow, command):
+    def _post_mod_patch_flow(self, req_flow, command, entry_count):
+        """ :param entry_count: number of flow entries (flow-mods) of the request """
         if command == 'delete':
-            self._delete_from_patch_flows(req_flow)
+            self.patch_flows.remove(req_flow)
+            self.reconciler.flow_removed(req_flow)
         elif command == 'put':
-            self.patch_flows.append(req_flow)
+            self.patch_flows.add(req_flow)
+            self.reconciler.flow_stored(req_flow, entry_count)
         else:
             msg = "Unknown command: %s" % command
             raise patch_ofc_error.PatchOfcError(msg)
+        self.patch_flow_changes.append((command, req_flow))
 
-    def _delete_from_patch_flows(self, req_flow):
-        # check each flows
-        req_flow_str = json.dumps(req_flow)
-        found_flow = None
-        for flow in self.patch_flows:
-            # TODO: now, use simplified/strict compare...
-            # difficult to compare recursively complex dict/list data.
-            # To compare it more simply, stringify these data...
-            # (json.dumps default: dictionary sorted.
-            flow_str = json.dumps(flow)
-            if req_flow_str == flow_str:
-                found_flow = flow
-                break
-        if found_flow:
-            self.patch_flows.remove(found_flow)
+    def _mod_patch_entry(self, dp, entry, command):
+        """ send flow-mod or group-mod (queued by sender) """
+        if isinstance(entry, patch_ofc_reconciler.StaleFlowEntry):
+            return self.reconciler.delete_flow_entry(dp, entry, command)
+        if patch_ofc_flowstore.is_group_entry(entry):
+            return self._mod_patch_group_entry(dp, entry, command)
+        return self._mod_patch_flow_entry(dp, entry, command)
+
+    def _mod_patch_group_entry(self, dp, group, command):
+        start_time = time.time()
+        try:
+            if dp.ofproto.OFP_VERSION == ofproto_v1_2.OFP_VERSION:
+                ofctl_v1_2.mod_group_entry(dp, group, command)
+            elif dp.ofproto.OFP_VERSION == ofproto_v1_3.OFP_VERSION:
+                ofctl_v1_3.mod_group_entry(dp, group, command)
+            else:
+                msg = "Unsupported OFP version for group: %s" % dp.ofproto.OFP_VERSION
+                raise patch_ofc_error.PatchOfcError(msg)
+            return True
+        finally:
+            self.record_latency('ofctl.mod_group_entry', time.time() - start_time)
 
     def _mod_patch_flow_entry(self, dp, flow_rule, command):
+        start_time = time.time()
+        try:
+            return self._mod_flow_entry_by_version(dp, flow_rule, command)
+        finally:
+            self.record_latency('ofctl.mod_flow_entry', time.time() - start_time)
+
+    def _mod_flow_entry_by_version(self, dp, flow_rule, command):
         if dp.ofproto.OFP_VERSION in self.OFP_VERSIONS:
             if dp.ofproto.OFP_VERSION == ofproto_v1_0.OFP_VERSION:
                 ofctl_v1_0.mod_flow_entry(dp, flow_rule, command)
@@ -163,8 +522,40 @@ class PatchPanel(app_manager.RyuApp):
             msg = "Unsupported OFP version: %s" % dp.ofproto.OFP_VERSION
             raise patch_ofc_error.PatchOfcError(msg)
 
-    def get_patch_flows(self):
-        body = json.dumps(self.patch_flows)
+    def get_patch_flows(self, dpid=None, port=None):
+        body = json.dumps(self.patch_flows.list_flows(dpid, port))
+        return Response(content_type='application/json',
+                        body=body, status=200)
+
+    def get_patch_groups(self, dpid=None):
+        body = json.dumps([
+            req_group for (group_dpid, group_id), req_group in self.patch_groups.items()
+            if dpid is None or group_dpid == dpid
+        ])
+        return Response(content_type='application/json',
+                        body=body, status=200)
+
+    def get_patch_job(self, job_id):
+        job = self.sender.job_by_id(job_id)
+        if job is None:
+            return Response(status=404)
+        return Response(content_type='application/json',
+                        body=json.dumps(job.to_dict()), status=200)
+
+    def get_patch_stats(self):
+        stats = collections.OrderedDict()
+        for name, histogram in self.latency_histograms.items():
+            stats[name] = histogram.summary()
+        body = json.dumps({
+            'latency': stats,
+            'flows': len(self.patch_flows),
+            'groups': len(self.patch_groups),
+            'flow-templates': {
+                'cached': len(self.flow_builder.templates),
+                'hit': self.flow_builder.hit_count,
+                'miss': self.flow_builder.miss_count
+            }
+        })
         return Response(content_type='application/json',
                         body=body, status=200)
 
@@ -174,35 +565,142 @@ class PatchController(ControllerBase):
         super(PatchController, self).__init__(req, link, data, **config)
         self.patch_app = data[patch_instance_name]
 
+    @staticmethod
+    def _wait_requested(req):
+        # ?wait=true: wait for barrier reply of flow-mods
+        return req.GET.get('wait', 'false').lower() in ('true', '1', 'yes')
+
+    @staticmethod
+    def _decode_error_response(err):
+        cors_headers = {'Access-Control-Allow-Origin': '*'}
+        return Response(content_type='application/json',
+                        body=json.dumps(err.to_dict()), status=400,
+                        headers=cors_headers)
+
     @route('patch', '/patch/flow', methods=['PUT'])
+    @record_latency('PUT /patch/flow')
     def add_patch_flow(self, req, **kwargs):
         LOG.debug("start add_patch_flow")
         patch = self.patch_app
         try:
-            flow = eval(req.body)
-        except SyntaxError:
-            LOG.debug('invalid syntax %s', req.body)
-            return Response(status=400)
+            flow = patch_ofc_decoder.decode_flow(req.body)
+        except patch_ofc_error.PatchOfcDecodeError as err:
+            LOG.debug('invalid request %s: %s', req.body, err.message)
+            return self._decode_error_response(err)
 
-        result = patch.add_patch_flow(flow)
+        result = patch.add_patch_flow(flow, self._wait_requested(req))
         return result
 
     @route('patch', '/patch/flow', methods=['DELETE'])
+    @record_latency('DELETE /patch/flow')
     def delete_patch_flow(self, req, **kwargs):
         patch = self.patch_app
         try:
-            flow = eval(req.body)
-        except SyntaxError:
-            LOG.debug('invalid syntax %s', req.body)
-            return Response(status=400)
+            flow = patch_ofc_decoder.decode_flow(req.body)
+        except patch_ofc_error.PatchOfcDecodeError as err:
+            LOG.debug('invalid request %s: %s', req.body, err.message)
+            return self._decode_error_response(err)
 
-        result = patch.delete_patch_flow(flow)
+        result = patch.delete_patch_flow(flow, self._wait_requested(req))
+        return result
+
+    @route('patch', '/patch/flows', methods=['PUT'])
+    @record_latency('PUT /patch/flows')
+    def add_patch_flows(self, req, **kwargs):
+        patch = self.patch_app
+        try:
+            flows = patch_ofc_decoder.decode_flow_document(req.body)
+        except patch_ofc_error.PatchOfcDecodeError as err:
+            LOG.debug('invalid request: %s', err.message)
+            return self._decode_error_response(err)
+
+        result = patch.add_patch_flows(flows, self._wait_requested(req))
+        return result
+
+    @route('patch', '/patch/flows', methods=['DELETE'])
+    @record_latency('DELETE /patch/flows')
+    def delete_patch_flows(self, req, **kwargs):
+        patch = self.patch_app
+        try:
+            flows = patch_ofc_decoder.decode_flow_document(req.body)
+        except patch_ofc_error.PatchOfcDecodeError as err:
+            LOG.debug('invalid request: %s', err.message)
+            return self._decode_error_response(err)
+
+        result = patch.delete_patch_flows(flows, self._wait_requested(req))
         return result
 
     @route('patch', '/patch/flow', methods=['GET'])
+    @record_latency('GET /patch/flow')
     def get_patch_flows(self, req, **kwargs):
         patch = self.patch_app
-        result = patch.get_patch_flows()
+        # optional filter: /patch/flow?dpid=N&port=M
+        try:
+            dpid = req.GET.get('dpid')
+            dpid = int(dpid) if dpid is not None else None
+            port = req.GET.get('port')
+            port = int(port) if port is not None else None
+        except ValueError:
+            LOG.debug('invalid query %s', req.query_string)
+            return Response(status=400)
+
+        result = patch.get_patch_flows(dpid, port)
+        return result
+
+    @route('patch', '/patch/group', methods=['PUT'])
+    @record_latency('PUT /patch/group')
+    def add_patch_group(self, req, **kwargs):
+        patch = self.patch_app
+        try:
+            group = patch_ofc_decoder.decode_group(req.body)
+        except patch_ofc_error.PatchOfcDecodeError as err:
+            LOG.debug('invalid request %s: %s', req.body, err.message)
+            return self._decode_error_response(err)
+
+        result = patch.add_patch_group(group, self._wait_requested(req))
+        return result
+
+    @route('patch', '/patch/group', methods=['DELETE'])
+    @record_latency('DELETE /patch/group')
+    def delete_patch_group(self, req, **kwargs):
+        patch = self.patch_app
+        try:
+            group = patch_ofc_decoder.decode_group(req.body)
+        except patch_ofc_error.PatchOfcDecodeError as err:
+            LOG.debug('invalid request %s: %s', req.body, err.message)
+            return self._decode_error_response(err)
+
+        result = patch.delete_patch_group(group, self._wait_requested(req))
+        return result
+
+    @route('patch', '/patch/group', methods=['GET'])
+    @record_latency('GET /patch/group')
+    def get_patch_groups(self, req, **kwargs):
+        patch = self.patch_app
+        # optional filter: /patch/group?dpid=N
+        try:
+            dpid = req.GET.get('dpid')
+            dpid = int(dpid) if dpid is not None else None
+        except ValueError:
+            LOG.debug('invalid query %s', req.query_string)
+            return Response(status=400)
+
+        result = patch.get_patch_groups(dpid)
+        return result
+
+    @route('patch', '/patch/job/{job_id}', methods=['GET'],
+           requirements={'job_id': r'[0-9]+'})
+    @record_latency('GET /patch/job')
+    def get_patch_job(self, req, **kwargs):
+        patch = self.patch_app
+        result = patch.get_patch_job(int(kwargs['job_id']))
+        return result
+
+    @route('patch', '/patch/stats', methods=['GET'])
+    @record_latency('GET /patch/stats')
+    def get_patch_stats(self, req, **kwargs):
+        patch = self.patch_app
+        result = patch.get_patch_stats()
         return result
 
     @route('patch', '/patch/flow', methods=['OPTIONS'])
@@ -213,3 +711,21 @@ class PatchController(ControllerBase):
             'Access-Control-Allow-Headers': 'Content-Type, Origin'
         }
         return Response(status=200, headers=cors_headers)
+
+    @route('patch', '/patch/group', methods=['OPTIONS'])
+    def opts_patch_groups(self, req, **kwargs):
+        cors_headers = {
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Methods': 'PUT, GET, DELETE, OPTIONS',
+            'Access-Control-Allow-Headers': 'Content-Type, Origin'
+        }
+        return Response(status=200, headers=cors_headers)
+
+    @route('patch', '/patch/flows', methods=['OPTIONS'])
+    def opts_patch_bulk_flows(self, req, **kwargs):
+        cors_headers = {
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Methods': 'PUT, DELETE, OPTIONS',
+            'Access-Control-Allow-Headers': 'Content-Type, Origin'
+        }
+        return Response(status=200, headers=cors_headers)
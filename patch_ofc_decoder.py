@@ -0,0 +1,249 @@
+import re
+import json
+import patch_ofc_error
+
+MAC_ADDRESS = re.compile(r"^[0-9a-fA-F]{2}(:[0-9a-fA-F]{2}){5}$")
+FLAG_VALUES = {True: True, False: False, 'true': True, 'false': False}
+
+
+INTEGER_TYPES = (int, long)
+
+
+def _check_integer(key, value, max_value):
+    # bool is subclass of int: reject it explicitly by type()
+    if type(value) not in INTEGER_TYPES or not 0 <= value <= max_value:
+        raise ValueError("'%s' must be integer (0-%d)" % (key, max_value))
+    return value
+
+
+def _check_ports(key, value, max_value):
+    if type(value) is not list or not value:
+        raise ValueError("'%s' must be non-empty list of port" % key)
+    for port in value:
+        _check_integer(key, port, max_value)
+    return value
+
+
+def _check_mac_address(key, value, max_value):
+    if not isinstance(value, basestring) or not MAC_ADDRESS.match(value):
+        raise ValueError("'%s' must be MAC address (xx:xx:xx:xx:xx:xx)" % key)
+    return value
+
+
+def _check_flag(key, value, max_value):
+    # true/false or "true"/"false" (string is used by run_l1patch.py)
+    try:
+        return FLAG_VALUES[value]
+    except (KeyError, TypeError):
+        raise ValueError("'%s' must be true or false" % key)
+
+
+# key of REST flow request: (check function, max value)
+FLOW_SCHEMA = (
+    ('dpid', _check_integer, 0xffffffffffffffff),
+    ('priority', _check_integer, 0xffff),
+    ('inport', _check_integer, 0xffffffff),
+    ('eth_src', _check_mac_address, None),
+    ('eth_dst', _check_mac_address, None),
+    ('vlan_vid', _check_integer, 0x1fff),
+    ('mpls_label', _check_integer, 0xfffff),
+    ('push_vlan', _check_integer, 0xfff),
+    ('pop_vlan', _check_flag, None),
+    ('set_vlan', _check_integer, 0xfff),
+    ('push_mpls', _check_integer, 0xfffff),
+    ('pop_mpls', _check_flag, None),
+    ('outports', _check_ports, 0xffffffff),
+    ('outport', _check_integer, 0xffffffff),
+    ('group_id', _check_integer, 0xffffff00)
+)
+FLOW_CHECKS = dict((key, (check, max_value)) for key, check, max_value in FLOW_SCHEMA)
+# integer keys are checked inline (most of keys in flow rule document)
+FLOW_INTEGER_KEYS = dict(
+    (key, max_value) for key, check, max_value in FLOW_SCHEMA if check is _check_integer
+)
+
+
+GROUP_TYPES = ('ALL', 'SELECT', 'INDIRECT', 'FF')
+
+
+def _check_group_type(key, value, max_value):
+    if value not in GROUP_TYPES:
+        raise ValueError("'%s' must be one of %s" % (key, ", ".join(GROUP_TYPES)))
+    return value
+
+
+def _check_buckets(key, value, max_value):
+    if type(value) is not list or not value:
+        raise ValueError("'%s' must be non-empty list of bucket" % key)
+    for bucket in value:
+        if type(bucket) is not dict or bucket.keys() != ['outport']:
+            raise ValueError("bucket of '%s' must be {\"outport\": port}" % key)
+        _check_integer('outport', bucket['outport'], max_value)
+    return value
+
+
+# key of REST group request: (check function, max value)
+GROUP_SCHEMA = (
+    ('dpid', _check_integer, 0xffffffffffffffff),
+    ('group_id', _check_integer, 0xffffff00),
+    ('type', _check_group_type, None),
+    ('buckets', _check_buckets, 0xffffffff)
+)
+GROUP_CHECKS = dict((key, (check, max_value)) for key, check, max_value in GROUP_SCHEMA)
+
+
+class PatchFlowRequest(object):
+    """
+    Typed record of REST flow request (validated by FLOW_SCHEMA).
+    - attributes: value of each key of FLOW_SCHEMA (None if not requested)
+    - keys: requested keys that have (true) value
+    - flow: requested flow (dict) to store, make cookie and respond
+    """
+    dpid = None
+    priority = None
+    inport = None
+    eth_src = None
+    eth_dst = None
+    vlan_vid = None
+    mpls_label = None
+    push_vlan = None
+    pop_vlan = None
+    set_vlan = None
+    push_mpls = None
+    pop_mpls = None
+    outports = None
+    outport = None
+    group_id = None
+
+    def __init__(self, flow=None):
+        self.keys = frozenset()
+        self.flow = flow
+
+    @classmethod
+    def from_flow(cls, flow):
+        """ validate flow (dict) by FLOW_SCHEMA """
+        if type(flow) is not dict:
+            raise patch_ofc_error.PatchOfcRestError("Flow request must be json object.")
+        values = dict(flow)
+        keys = []
+        try:
+            for key, value in flow.iteritems():
+                max_value = FLOW_INTEGER_KEYS.get(key)
+                if max_value is not None and type(value) in INTEGER_TYPES \
+                        and 0 <= value <= max_value:
+                    pass  # fast path
+                elif key not in FLOW_CHECKS:
+                    msg = "Flow request has unknown key: %s" % key
+                    raise patch_ofc_error.PatchOfcRestError(msg)
+                elif value is None:
+                    continue
+                else:
+                    check, max_value = FLOW_CHECKS[key]
+                    value = values[key] = check(key, value, max_value)
+                if value:
+                    keys.append(key)
+        except ValueError as err:
+            raise patch_ofc_error.PatchOfcRestError("Flow request: %s" % err)
+        if values.get('dpid') is None or values.get('inport') is None:
+            msg = "Flow request must have 'dpid' and 'inport'."
+            raise patch_ofc_error.PatchOfcRestError(msg)
+        if values.get('outport') is None and values.get('outports') is None \
+                and values.get('group_id') is None:
+            msg = "Flow request must have 'outport', 'outports' or 'group_id'."
+            raise patch_ofc_error.PatchOfcRestError(msg)
+        # fill attributes at once (keys not requested are None by class attributes)
+        values['keys'] = frozenset(keys)
+        values['flow'] = flow
+        record = cls.__new__(cls)
+        record.__dict__ = values
+        return record
+
+    def __repr__(self):
+        return "PatchFlowRequest(%s)" % json.dumps(self.flow, sort_keys=True)
+
+
+def _load_json(body):
+    try:
+        return json.loads(body)
+    except ValueError as err:
+        raise patch_ofc_error.PatchOfcDecodeError("Invalid json: %s" % err)
+
+
+def decode_flow(body):
+    """
+    decode request body of single flow (PUT/DELETE /patch/flow)
+    :return: PatchFlowRequest
+    """
+    try:
+        return PatchFlowRequest.from_flow(_load_json(body))
+    except patch_ofc_error.PatchOfcDecodeError:
+        raise
+    except patch_ofc_error.PatchOfcRestError as err:
+        raise patch_ofc_error.PatchOfcDecodeError(err.message)
+
+
+def decode_group(body):
+    """
+    decode request body of group (PUT/DELETE /patch/group)
+    :return: group request (dict) validated by GROUP_SCHEMA
+    """
+    group = _load_json(body)
+    if type(group) is not dict:
+        raise patch_ofc_error.PatchOfcDecodeError("Group request must be json object.")
+    try:
+        for key, value in group.iteritems():
+            if key not in GROUP_CHECKS:
+                msg = "Group request has unknown key: %s" % key
+                raise patch_ofc_error.PatchOfcDecodeError(msg)
+            check, max_value = GROUP_CHECKS[key]
+            check(key, value, max_value)
+    except ValueError as err:
+        raise patch_ofc_error.PatchOfcDecodeError("Group request: %s" % err)
+    if any(key not in group for key in ('dpid', 'group_id', 'buckets')):
+        msg = "Group request must have 'dpid', 'group_id' and 'buckets'."
+        raise patch_ofc_error.PatchOfcDecodeError(msg)
+    return group
+
+
+def decode_flow_document(body):
+    """
+    decode request body of flow rule document ({dispatcher: [flows]}),
+    all flows are validated before any flow-mod is sent.
+    :return: {dispatcher: [PatchFlowRequest]}
+    """
+    document = _load_json(body)
+    if type(document) is not dict or not all(
+            type(flows) is list for flows in document.itervalues()):
+        msg = "Flow rule document must be {dispatcher: [rules]}"
+        raise patch_ofc_error.PatchOfcDecodeError(msg)
+
+    from_flow = PatchFlowRequest.from_flow
+    decoded = {}
+    errors = []  # (dispatcher, index, message)
+    for dispatcher_name, flows in document.iteritems():
+        records = decoded[dispatcher_name] = []
+        for index, flow in enumerate(flows):
+            try:
+                records.append(from_flow(flow))
+            except patch_ofc_error.PatchOfcRestError as err:
+                records.append(None)
+                errors.append((dispatcher_name, index, err.message))
+    if errors:
+        raise patch_ofc_error.PatchOfcDecodeError(
+            "Invalid flow in flow rule document", _document_results(document, errors)
+        )
+    return decoded
+
+
+def _document_results(document, errors):
+    # same structure as results of bulk request: {dispatcher: [result]}
+    results = {}
+    for dispatcher_name, flows in document.iteritems():
+        results[dispatcher_name] = [
+            {'dpid': flow.get('dpid') if type(flow) is dict else None,
+             'status': 424, 'message': "Not sent: invalid flow in flow document"}
+            for flow in flows
+        ]
+    for dispatcher_name, index, message in errors:
+        results[dispatcher_name][index].update({'status': 400, 'message': message})
+    return results
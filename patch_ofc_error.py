@@ -4,3 +4,32 @@ class PatchOfcError(Exception):
 
 class PatchOfcRestError(PatchOfcError):
     pass
+
+
+class PatchOfcConflictError(PatchOfcError):
+    def __init__(self, message, dpid, port, direction, holder):
+        super(PatchOfcConflictError, self).__init__(message)
+        self.dpid = dpid
+        self.port = port
+        self.direction = direction  # 'inport' or 'outport'
+        self.holder = holder  # flow that holds the port
+
+    def to_dict(self):
+        return {
+            'message': self.message,
+            'dpid': self.dpid,
+            'port': self.port,
+            'direction': self.direction,
+            'holder': self.holder
+        }
+
+
+class PatchOfcDecodeError(PatchOfcRestError):
+    def __init__(self, message, results=None):
+        super(PatchOfcDecodeError, self).__init__(message)
+        self.results = results  # {dispatcher: [result]} for flow rule document
+
+    def to_dict(self):
+        if self.results is not None:
+            return self.results
+        return {'message': self.message}
@@ -1,12 +1,18 @@
+import collections
 from ryu.ofproto import ofproto_v1_0
 from ryu.ofproto import ofproto_v1_2
 from ryu.ofproto import ofproto_v1_3
 import patch_ofc_flowrule
+import patch_ofc_flowstore
+import patch_ofc_decoder
 import patch_ofc_error
 
 
 class FlowRuleBuilder(object):
     def __init__(self, dp, req_flow):
+        # req_flow: PatchFlowRequest (or flow dict, e.g. stored flow)
+        if not isinstance(req_flow, patch_ofc_decoder.PatchFlowRequest):
+            req_flow = patch_ofc_decoder.PatchFlowRequest.from_flow(req_flow)
         self.req_flow = req_flow
         self.datapath = dp
         self._setup_flow_rule()
@@ -36,13 +42,18 @@ class FlowRuleBuilder(object):
             raise patch_ofc_error.PatchOfcError(msg)
 
     def _check_flow_property(self):
-        priority = self.req_flow.get('priority')
+        priority = self.req_flow.priority
         if priority:
             self.flow_rule.update_priority(priority)
+        # identify flow entries of the request in switch (for reconciliation)
+        self.flow_rule.update_cookie(self._flow_cookie())
+
+    def _flow_cookie(self):
+        return patch_ofc_flowstore.flow_cookie(self.req_flow.flow)
 
     def _check_inport_conditions(self):
         # MUST option
-        inport = self.req_flow.get('inport')
+        inport = self.req_flow.inport
         if inport:
             self.flow_rule.update_match_inport(inport)
         else:
@@ -50,56 +61,245 @@ class FlowRuleBuilder(object):
             raise patch_ofc_error.PatchOfcRestError(msg)
 
     def _check_ether_conditions(self):
-        eth_src = self.req_flow.get('eth_src')
+        eth_src = self.req_flow.eth_src
         if eth_src:
             self.flow_rule.update_match_eth_src(eth_src)
 
-        eth_dst = self.req_flow.get('eth_dst')
+        eth_dst = self.req_flow.eth_dst
         if eth_dst:
             self.flow_rule.update_match_eth_dst(eth_dst)
 
     def _check_vlan_conditions(self):
-        vlan_vid = self.req_flow.get('vlan_vid')
+        vlan_vid = self.req_flow.vlan_vid
         if vlan_vid:
             self.flow_rule.update_match_vlan_vid(vlan_vid)
 
     def _check_mpls_conditions(self):
-        mpls_label = self.req_flow.get('mpls_label')
+        mpls_label = self.req_flow.mpls_label
         if mpls_label:
             self.flow_rule.update_match_mpls_label(mpls_label)
 
     def _check_vlan_actions(self):
-        push_vlan = self.req_flow.get('push_vlan')
+        push_vlan = self.req_flow.push_vlan
         if push_vlan:
             self.flow_rule.action_push_vlan(push_vlan)
-        pop_vlan = self.req_flow.get('pop_vlan')
+        pop_vlan = self.req_flow.pop_vlan
         if pop_vlan:
             self.flow_rule.action_pop_vlan()
-        set_vlan = self.req_flow.get('set_vlan')
+        set_vlan = self.req_flow.set_vlan
         if set_vlan:
             self.flow_rule.action_set_vlan_vid(set_vlan)
 
     def _check_mpls_actions(self):
-        push_mpls = self.req_flow.get('push_mpls')
+        push_mpls = self.req_flow.push_mpls
         if push_mpls:
             self.flow_rule.action_push_mpls(push_mpls)
-        pop_mpls = self.req_flow.get('pop_mpls')
+        pop_mpls = self.req_flow.pop_mpls
         if pop_mpls:
             self.flow_rule.action_pop_mpls()
 
     def _check_outport_actions(self):
         # MUST one of them
-        outports = self.req_flow.get('outports')
-        outport = self.req_flow.get('outport')
+        outports = self.req_flow.outports
+        outport = self.req_flow.outport
+        group_id = self.req_flow.group_id
         if outports:
             for port in outports:
                 self.flow_rule.action_output(port)
         elif outport:
             self.flow_rule.action_output(outport)
+        elif group_id:
+            self._check_group_action(group_id)
         else:
             msg = "REST request does not include any outport(s) action."
             raise patch_ofc_error.PatchOfcRestError(msg)
 
+    def _check_group_action(self, group_id):
+        if self.datapath.ofproto.OFP_VERSION == ofproto_v1_0.OFP_VERSION:
+            msg = "REST request has 'group_id' but datapath does not support group."
+            raise patch_ofc_error.PatchOfcRestError(msg)
+        self.flow_rule.action_group(group_id)
+
+
+class GroupEntryBuilder(object):
+    """
+    build group entry (for ofctl mod_group_entry) from REST group request:
+    {'dpid': N, 'group_id': N, 'type': 'ALL', 'buckets': [{'outport': N}, ...]}
+    """
+    GROUP_TYPES = ('ALL', 'SELECT', 'INDIRECT', 'FF')
+
+    def __init__(self, dp, req_group):
+        self.req_group = req_group
+        self.datapath = dp
+
+    def build_group(self):
+        if self.datapath.ofproto.OFP_VERSION == ofproto_v1_0.OFP_VERSION:
+            msg = "Group is not supported by OpenFlow1.0 datapath."
+            raise patch_ofc_error.PatchOfcRestError(msg)
+        group_id = self.req_group.get('group_id')
+        if not isinstance(group_id, (int, long)):
+            msg = "REST request does not include 'group_id' key."
+            raise patch_ofc_error.PatchOfcRestError(msg)
+        group_type = self.req_group.get('type', 'ALL')
+        if group_type not in self.GROUP_TYPES:
+            msg = "REST request has unknown group type: %s" % group_type
+            raise patch_ofc_error.PatchOfcRestError(msg)
+        return {
+            'type': group_type,
+            'group_id': group_id,
+            'buckets': self._check_buckets()
+        }
+
+    def _check_buckets(self):
+        req_buckets = self.req_group.get('buckets')
+        if not isinstance(req_buckets, list) or not req_buckets:
+            msg = "REST request does not include any bucket."
+            raise patch_ofc_error.PatchOfcRestError(msg)
+        buckets = []
+        for req_bucket in req_buckets:
+            if not isinstance(req_bucket, dict) or not req_bucket.get('outport'):
+                msg = "REST request has bucket without 'outport' key."
+                raise patch_ofc_error.PatchOfcRestError(msg)
+            buckets.append({
+                'actions': [{'type': 'OUTPUT', 'port': req_bucket['outport']}]
+            })
+        return buckets
+
+
+class _Slot(object):
+    """
+    placeholder of request value in flow rule template.
+    supports addition by constant (e.g. 0x1000 + vlan_vid of OF1.3 SET_FIELD).
+    """
+    __slots__ = ('key', 'index', 'offset')
+
+    def __init__(self, key, index=None, offset=0):
+        self.key = key  # None: cookie
+        self.index = index  # index of list value (outports)
+        self.offset = offset
+
+    def __add__(self, other):
+        return _Slot(self.key, self.index, self.offset + other)
+
+    __radd__ = __add__
+
+    def value(self, req_flow, cookie):
+        if self.key is None:
+            value = cookie
+        else:
+            value = getattr(req_flow, self.key)
+            if self.index is not None:
+                value = value[self.index]
+        if self.offset:
+            value += self.offset
+        return value
+
+
+class _TemplateFlowRuleBuilder(FlowRuleBuilder):
+    """ FlowRuleBuilder that runs with placeholder request """
+    def _flow_cookie(self):
+        return _Slot(None)
+
+
+def _template_filler(template):
+    """
+    :return: function(req_flow, cookie) that makes new object
+        of template (dict/list/constant set by FlowRule) filled by values of request
+    """
+    if isinstance(template, _Slot):
+        return template.value
+    elif isinstance(template, dict):
+        return _dict_filler(template)
+    elif isinstance(template, list):
+        fillers = [_template_filler(value) for value in template]
+        return lambda req_flow, cookie: [fill(req_flow, cookie) for fill in fillers]
+    return lambda req_flow, cookie: template  # constant (int or str)
+
+
+def _dict_filler(template):
+    # copy constants at once, set attribute of request without function call
+    constants = {}
+    cookie_keys = []
+    attr_items = []  # (key, attribute of request)
+    filler_items = []  # (key, filler): other slots, dict and list
+    for key, value in template.items():
+        if isinstance(value, _Slot) and value.index is None and not value.offset:
+            if value.key is None:
+                cookie_keys.append(key)
+            else:
+                attr_items.append((key, value.key))
+        elif isinstance(value, (_Slot, dict, list)):
+            filler_items.append((key, _template_filler(value)))
+        else:
+            constants[key] = value
+
+    def fill(req_flow, cookie):
+        obj = constants.copy()
+        for key in cookie_keys:
+            obj[key] = cookie
+        for key, attr in attr_items:
+            obj[key] = getattr(req_flow, attr)
+        for key, filler in filler_items:
+            obj[key] = filler(req_flow, cookie)
+        return obj
+    return fill
+
+
+class CompiledFlowRuleBuilder(object):
+    """
+    Build flow rules by template compiled from shape of request (PatchFlowRequest):
+    (ofp version, keys that have value, number of outports).
+    Template is made by FlowRuleBuilder with placeholder request once,
+    compiled to a filler function and cached (LRU),
+    then flows of same shape are built only by filling values.
+    """
+    CACHE_SIZE = 256
+
+    def __init__(self):
+        self.templates = collections.OrderedDict()  # shape: compiled template
+        self.hit_count = 0
+        self.miss_count = 0
+
+    @staticmethod
+    def _shape(dp, req_flow):
+        # keys that have value (frozenset) are set by decoder
+        outports = req_flow.outports
+        return dp.ofproto.OFP_VERSION, req_flow.keys, len(outports) if outports else 0
+
+    @staticmethod
+    def _compile(dp, shape):
+        ofp_version, keys, outport_count = shape
+        placeholder = patch_ofc_decoder.PatchFlowRequest()
+        for key in keys:
+            setattr(placeholder, key, _Slot(key))
+        if outport_count:
+            placeholder.outports = [
+                _Slot('outports', index) for index in xrange(outport_count)
+            ]
+        template = _TemplateFlowRuleBuilder(dp, placeholder).build_flow()
+        return _template_filler(template)
+
+    def _template(self, dp, shape):
+        template = self.templates.pop(shape, None)
+        if template is not None:
+            self.hit_count += 1
+        else:
+            self.miss_count += 1
+            template = self._compile(dp, shape)
+            if len(self.templates) >= self.CACHE_SIZE:
+                self.templates.popitem(last=False)  # least recently used
+        self.templates[shape] = template
+        return template
+
+    def build_flow(self, dp, req_flow):
+        """ :param req_flow: PatchFlowRequest """
+        template = self._template(dp, self._shape(dp, req_flow))
+        return template(req_flow, patch_ofc_flowstore.flow_cookie(req_flow.flow))
+
+    def build_flows(self, dp, req_flows):
+        """ :return: list of flow rules of each request """
+        return [self.build_flow(dp, req_flow) for req_flow in req_flows]
+
 
 class DummyReq(object):
     def __init__(self):
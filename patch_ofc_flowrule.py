@@ -62,6 +62,11 @@ class FlowRule(object):
             'priority': priority
         })
 
+    def update_cookie(self, cookie):
+        self._update_flow_property({
+            'cookie': cookie
+        })
+
     # match conditions
 
     def update_match_inport(self, inport):
@@ -202,6 +207,14 @@ class FlowRuleOF13(FlowRuleOF10):
             'value': mpls_label
         })
 
+    def action_group(self, group_id):
+        # OF1.2-
+        # used for broadcast by group ONLY for L1patch
+        self._append_with_same_action({
+            'type': 'GROUP',
+            'group_id': group_id
+        })
+
     def action_pop_mpls(self):
         # OF1.3
         # used for broadcast match ONLY for L1patch
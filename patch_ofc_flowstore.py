@@ -0,0 +1,338 @@
+import json
+import hashlib
+import collections
+import patch_ofc_error
+
+# keys of REST flow request that are not match conditions
+FLOW_ACTION_KEYS = (
+    'outport', 'outports',
+    'push_vlan', 'pop_vlan', 'set_vlan',
+    'push_mpls', 'pop_mpls', 'group_id'
+)
+
+
+# priority of exclusive mode wire rule (see patch_wire.ExclusiveWire)
+EXCLUSIVE_PRIORITY = 65535
+
+
+def _hashable(value):
+    if isinstance(value, list):
+        return tuple(_hashable(v) for v in value)
+    elif isinstance(value, dict):
+        return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+    return value
+
+
+def flow_match_key(flow):
+    """
+    canonical (hashable) key of REST flow request:
+    (dpid, inport, priority, (match conditions))
+    """
+    match = tuple(sorted(
+        (key, _hashable(value)) for key, value in flow.items()
+        if key not in FLOW_ACTION_KEYS
+        and key not in ('dpid', 'inport', 'priority')
+    ))
+    return flow.get('dpid'), flow.get('inport'), flow.get('priority'), match
+
+
+def is_group_entry(entry):
+    """ group request (ALL-type group of wire-group) in flow rule document """
+    return 'buckets' in entry
+
+
+def entry_key(entry):
+    """ key of flow rule document entry: group id for group, match key for flow """
+    if is_group_entry(entry):
+        return 'group', entry.get('dpid'), entry.get('group_id')
+    return flow_match_key(entry)
+
+
+def flow_cookie(flow):
+    """
+    cookie of flow entries made from REST flow request (match and actions),
+    63bit and not 0 (0 is used by default deny rule).
+    """
+    digest = hashlib.sha1(json.dumps(flow, sort_keys=True)).hexdigest()
+    return (int(digest[:16], 16) >> 1) or 1
+
+
+def flow_ports(flow):
+    ports = [flow.get('inport'), flow.get('outport')]
+    ports.extend(flow.get('outports') or [])
+    return [port for port in ports if port is not None]
+
+
+def flow_outports(flow, group_ports=None):
+    """ :param group_ports: {(dpid, group_id): [outport]} for flow that has group_id """
+    ports = [flow.get('outport')]
+    ports.extend(flow.get('outports') or [])
+    if group_ports and flow.get('group_id') is not None:
+        ports.extend(group_ports.get((flow.get('dpid'), flow.get('group_id')), []))
+    return [port for port in ports if port is not None]
+
+
+def group_outports(group):
+    """ outports of buckets of group request """
+    return [bucket.get('outport') for bucket in group.get('buckets') or []
+            if isinstance(bucket, dict) and bucket.get('outport') is not None]
+
+
+def is_exclusive_flow(flow):
+    return flow.get('priority') == EXCLUSIVE_PRIORITY
+
+
+def same_flow_actions(flow1, flow2):
+    return all(
+        _hashable(flow1.get(key)) == _hashable(flow2.get(key))
+        for key in FLOW_ACTION_KEYS
+    )
+
+
+class PatchResourceUsage(object):
+    """ users of a (dpid, port) in one direction """
+    __slots__ = ('users', 'exclusive_key')
+
+    def __init__(self):
+        self.users = collections.OrderedDict()  # match key: flow
+        self.exclusive_key = None  # match key of exclusive flow
+
+    def other_user(self, key, flow):
+        """ first user except own flow (same match key and same actions) """
+        for user_key, user_flow in self.users.iteritems():
+            if user_key != key or not same_flow_actions(user_flow, flow):
+                return user_key, user_flow
+        return None, None
+
+
+class PatchResourceIndex(object):
+    """
+    Reservation index of ports by (dpid, inport) and (dpid, outport).
+    Exclusive mode wire rule (match inport only) holds its inport/outport:
+    other rules cannot use the port in same direction, and vice versa.
+    Exclusive rule that has same match but other actions is other wire:
+    it must be deleted before put (it is not replaced).
+    Outports of rule that has group_id are outports of buckets of the group.
+    """
+    def __init__(self):
+        self.inports = {}  # (dpid, port): PatchResourceUsage
+        self.outports = {}  # (dpid, port): PatchResourceUsage
+        self.group_ports = {}  # (dpid, group_id): [outport of buckets]
+
+    def _resources(self, flow):
+        dpid = flow.get('dpid')
+        resources = []
+        if flow.get('inport') is not None:
+            resources.append((self.inports, (dpid, flow.get('inport')), 'inport'))
+        for port in flow_outports(flow, self.group_ports):
+            resources.append((self.outports, (dpid, port), 'outport'))
+        return resources
+
+    def check(self, flow, key=None):
+        """ raise PatchOfcConflictError if flow conflicts with reserved port """
+        key = key or flow_match_key(flow)
+        exclusive = is_exclusive_flow(flow)
+        for index, resource, direction in self._resources(flow):
+            usage = index.get(resource)
+            if usage is None:
+                continue
+            if exclusive:
+                holder_key, holder = usage.other_user(key, flow)
+            elif usage.exclusive_key is not None and usage.exclusive_key != key:
+                holder_key, holder = usage.exclusive_key, usage.users[usage.exclusive_key]
+            else:
+                holder_key, holder = None, None
+            if holder is not None:
+                msg = "dpid:%s, %s:%s is already used by %s" % (
+                    resource[0], direction, resource[1],
+                    "exclusive wire" if usage.exclusive_key == holder_key else "other wire"
+                )
+                raise patch_ofc_error.PatchOfcConflictError(
+                    msg, resource[0], resource[1], direction, holder
+                )
+
+    def add(self, key, flow):
+        exclusive = is_exclusive_flow(flow)
+        for index, resource, direction in self._resources(flow):
+            usage = index.get(resource)
+            if usage is None:
+                usage = index[resource] = PatchResourceUsage()
+            usage.users[key] = flow
+            if exclusive:
+                usage.exclusive_key = key
+
+    def remove(self, key, flow):
+        for index, resource, direction in self._resources(flow):
+            usage = index.get(resource)
+            if usage is None:
+                continue
+            usage.users.pop(key, None)
+            if usage.exclusive_key == key:
+                usage.exclusive_key = None
+            if not usage.users:
+                del index[resource]
+
+
+class PatchFlowStore(object):
+    """
+    Store of requested flows indexed by match key,
+    with secondary index by dpid and by (dpid, port).
+    Secondary index uses OrderedDict as ordered set to keep request order.
+    """
+    def __init__(self):
+        self.flows = collections.OrderedDict()  # match key: flow
+        self.dpid_index = {}  # dpid: ordered set of match key
+        self.port_index = {}  # (dpid, port): ordered set of match key
+        self.resources = PatchResourceIndex()
+
+    def __len__(self):
+        return len(self.flows)
+
+    def __iter__(self):
+        return iter(self.flows.values())
+
+    def __contains__(self, flow):
+        return flow_match_key(flow) in self.flows
+
+    def add(self, flow):
+        """ add flow, replace flow that has same match key """
+        key = flow_match_key(flow)
+        old_flow = self.flows.get(key)
+        if old_flow is not None:
+            self._unindex(key, old_flow)
+        self.flows[key] = flow
+        self._index(key, flow)
+        return old_flow
+
+    def remove(self, flow):
+        """ remove flow that has same match key, return removed flow """
+        key = flow_match_key(flow)
+        old_flow = self.flows.pop(key, None)
+        if old_flow is not None:
+            self._unindex(key, old_flow)
+        return old_flow
+
+    def check_conflict(self, flow):
+        """ raise PatchOfcConflictError if flow conflicts with stored flows """
+        self.resources.check(flow)
+
+    def check_conflicts(self, flows):
+        """
+        pre-validate flows (a whole flow document) against stored flows
+        and flows in itself, without changing the store.
+        :return: list of (flow, PatchOfcConflictError)
+        """
+        conflicts = []
+        undo_log = []  # (key, added flow, replaced flow)
+        pending = {}  # match key: flow reserved temporarily
+        try:
+            for flow in flows:
+                key = flow_match_key(flow)
+                try:
+                    self.resources.check(flow, key)
+                except patch_ofc_error.PatchOfcConflictError as err:
+                    conflicts.append((flow, err))
+                    continue
+                # reserve temporarily to check following flows
+                old_flow = pending[key] if key in pending else self.flows.get(key)
+                if old_flow is not None:
+                    self.resources.remove(key, old_flow)
+                self.resources.add(key, flow)
+                undo_log.append((key, flow, old_flow))
+                pending[key] = flow
+        finally:
+            for key, added_flow, replaced_flow in reversed(undo_log):
+                self.resources.remove(key, added_flow)
+                if replaced_flow is not None:
+                    self.resources.add(key, replaced_flow)
+        return conflicts
+
+    def flows_by_group(self, dpid, group_id):
+        return [flow for flow in self.flows_by_dpid(dpid)
+                if flow.get('group_id') == group_id]
+
+    def check_group_conflict(self, group):
+        """
+        raise PatchOfcConflictError if flows that refer the group
+        conflict with stored flows by (changed) outports of the group.
+        """
+        group_key = (group.get('dpid'), group.get('group_id'))
+        flows = self.flows_by_group(*group_key)
+        if not flows:
+            return
+        old_ports = self._set_group_ports(group_key, group_outports(group), flows)
+        try:
+            for flow in flows:
+                self.resources.check(flow)
+        finally:
+            self._set_group_ports(group_key, old_ports, flows)
+
+    def set_group(self, group):
+        """ add/replace group: flows that refer it reserve outports of buckets """
+        group_key = (group.get('dpid'), group.get('group_id'))
+        self._set_group_ports(
+            group_key, group_outports(group), self.flows_by_group(*group_key)
+        )
+
+    def remove_group(self, group):
+        group_key = (group.get('dpid'), group.get('group_id'))
+        self._set_group_ports(group_key, None, self.flows_by_group(*group_key))
+
+    def _set_group_ports(self, group_key, ports, flows):
+        """ :return: old outports of group (None: unknown group) """
+        for flow in flows:
+            self.resources.remove(flow_match_key(flow), flow)
+        old_ports = self.resources.group_ports.pop(group_key, None)
+        if ports is not None:
+            self.resources.group_ports[group_key] = ports
+        for flow in flows:
+            self.resources.add(flow_match_key(flow), flow)
+        return old_ports
+
+    def lookup(self, flow):
+        return self.flows.get(flow_match_key(flow))
+
+    def flows_by_dpid(self, dpid):
+        keys = self.dpid_index.get(dpid, {})
+        return [self.flows[key] for key in keys]
+
+    def flows_by_port(self, dpid, port):
+        keys = self.port_index.get((dpid, port), {})
+        return [self.flows[key] for key in keys]
+
+    def list_flows(self, dpid=None, port=None):
+        if dpid is not None and port is not None:
+            return self.flows_by_port(dpid, port)
+        elif dpid is not None:
+            return self.flows_by_dpid(dpid)
+        elif port is not None:
+            flows = []
+            for each_dpid in self.dpid_index.keys():
+                flows.extend(self.flows_by_port(each_dpid, port))
+            return flows
+        return self.flows.values()
+
+    def _index(self, key, flow):
+        dpid = flow.get('dpid')
+        self.dpid_index.setdefault(dpid, collections.OrderedDict())[key] = None
+        self.resources.add(key, flow)
+        for port in flow_ports(flow):
+            self.port_index.setdefault(
+                (dpid, port), collections.OrderedDict()
+            )[key] = None
+
+    def _unindex(self, key, flow):
+        dpid = flow.get('dpid')
+        self._discard(self.dpid_index, dpid, key)
+        self.resources.remove(key, flow)
+        for port in flow_ports(flow):
+            self._discard(self.port_index, (dpid, port), key)
+
+    @staticmethod
+    def _discard(index, index_key, key):
+        keys = index.get(index_key)
+        if keys is None:
+            return
+        keys.pop(key, None)
+        if not keys:
+            del index[index_key]
@@ -0,0 +1,94 @@
+import json
+import sqlite3
+import patch_ofc_flowstore
+import patch_ofc_error
+
+
+class PatchIntentDB(object):
+    """
+    Persistent store of requested flows and groups (intent) of PatchPanel.
+    SQLite in WAL mode: changes of a REST request are written
+    by one transaction, and flows/groups are loaded at startup
+    to rebuild in-memory index (PatchFlowStore) and groups.
+    """
+    def __init__(self, file_name):
+        self.file_name = file_name
+        try:
+            # greenthreads of ryu run in one OS thread
+            self.conn = sqlite3.connect(file_name, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            with self.conn:
+                self.conn.execute(
+                    "CREATE TABLE IF NOT EXISTS patch_flows ("
+                    " match_key TEXT PRIMARY KEY,"
+                    " flow TEXT NOT NULL)"
+                )
+                self.conn.execute(
+                    "CREATE TABLE IF NOT EXISTS patch_groups ("
+                    " group_key TEXT PRIMARY KEY,"
+                    " req_group TEXT NOT NULL)"
+                )
+        except sqlite3.Error as err:
+            msg = "Cannot open intent db: %s (%s)" % (file_name, err)
+            raise patch_ofc_error.PatchOfcError(msg)
+
+    @staticmethod
+    def _match_key(flow):
+        return json.dumps(patch_ofc_flowstore.flow_match_key(flow))
+
+    @staticmethod
+    def _group_key(req_group):
+        return json.dumps(patch_ofc_flowstore.entry_key(req_group))
+
+    def load(self):
+        """ :return: list of flows (in order of request) """
+        cursor = self.conn.execute("SELECT flow FROM patch_flows ORDER BY rowid")
+        return [json.loads(row[0]) for row in cursor]
+
+    def load_groups(self):
+        """ :return: list of group requests (in order of request) """
+        cursor = self.conn.execute("SELECT req_group FROM patch_groups ORDER BY rowid")
+        return [json.loads(row[0]) for row in cursor]
+
+    def apply(self, changes):
+        """
+        write changes of a request by one transaction
+        :param changes: list of (command, flow or group request),
+            command: 'put' or 'delete'
+        """
+        if not changes:
+            return
+        try:
+            with self.conn:
+                for command, flow in changes:
+                    if patch_ofc_flowstore.is_group_entry(flow):
+                        self._apply_group(command, flow)
+                    elif command == 'put':
+                        self.conn.execute(
+                            "INSERT OR REPLACE INTO patch_flows (match_key, flow) VALUES (?, ?)",
+                            (self._match_key(flow), json.dumps(flow, sort_keys=True))
+                        )
+                    elif command == 'delete':
+                        self.conn.execute(
+                            "DELETE FROM patch_flows WHERE match_key = ?",
+                            (self._match_key(flow),)
+                        )
+        except sqlite3.Error as err:
+            msg = "Cannot write intent db: %s (%s)" % (self.file_name, err)
+            raise patch_ofc_error.PatchOfcError(msg)
+
+    def _apply_group(self, command, req_group):
+        if command == 'put':
+            self.conn.execute(
+                "INSERT OR REPLACE INTO patch_groups (group_key, req_group) VALUES (?, ?)",
+                (self._group_key(req_group), json.dumps(req_group, sort_keys=True))
+            )
+        elif command == 'delete':
+            self.conn.execute(
+                "DELETE FROM patch_groups WHERE group_key = ?",
+                (self._group_key(req_group),)
+            )
+
+    def close(self):
+        self.conn.close()
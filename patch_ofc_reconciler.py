@@ -0,0 +1,306 @@
+import json
+import logging
+import collections
+from ryu.lib import hub
+from ryu.ofproto import ofproto_v1_0
+from ryu.ofproto import ofproto_v1_2
+from ryu.ofproto import ofproto_v1_3
+import patch_ofc_decoder
+import patch_ofc_flowstore
+import patch_ofc_error
+
+LOG = logging.getLogger('ryu.app.patch.patch_reconciler')
+
+# flow entry in table that is not made from stored flows (sent by sender as a delete)
+StaleFlowEntry = collections.namedtuple('StaleFlowEntry', ['cookie', 'priority', 'match'])
+
+
+class PatchFlowStatsCollector(object):
+    """ flow entries (stats) of a datapath collected from multipart replies """
+    def __init__(self, xid):
+        self.xid = xid
+        self.cookie_counts = collections.Counter()  # cookie: number of entries
+        self.entries = []  # (cookie, priority, match) of patch flow entries
+
+    def add(self, stats):
+        for stat in stats:
+            if stat.cookie == 0:
+                continue  # default deny rule or flows not made by PatchPanel
+            self.cookie_counts[stat.cookie] += 1
+            self.entries.append((stat.cookie, stat.priority, stat.match))
+
+
+class PatchFlowReconciler(object):
+    """
+    Reconcile flow table of datapath with stored flows (intent) of PatchPanel.
+    - Flow entries made by PatchPanel have cookie of its request
+      (patch_ofc_flowstore.flow_cookie: hash of match and actions).
+    - When a datapath connects (after its groups are restored), request flow stats, and
+      push missing entries / delete stale entries (cookie unknown)
+      as a job of PatchFlowSender (queued after flow-mods of REST requests).
+    - Periodic audit compares flow count by aggregate stats (low cost)
+      and requests flow stats if it differs (and every FULL_AUDIT_CYCLE audits).
+      Expected flow count of reconciled datapath is kept up to date by store changes
+      (flow_stored/flow_removed): flow entries are built only to reconcile.
+    """
+    AUDIT_INTERVAL = 30  # sec
+    FULL_AUDIT_CYCLE = 10
+    JOB_WAIT_TIMEOUT = 30  # sec, for group restoration and reconciliation job
+
+    def __init__(self, patch_app):
+        self.patch_app = patch_app
+        self.flow_stats = {}  # dpid: PatchFlowStatsCollector (in progress)
+        self.aggregate_xids = {}  # dpid: xid of aggregate stats request
+        # dpid: {match key: number of flow entries of stored flow} (reconciled datapath)
+        self.entry_counts = {}
+        self.expected_counts = {}  # dpid: number of flow entries of stored flows
+        self.audit_count = 0
+        self.audit_thread = None
+
+    def start_audit(self):
+        self.audit_thread = hub.spawn(self._audit_loop)
+
+    def _audit_loop(self):
+        while True:
+            hub.sleep(self.AUDIT_INTERVAL)
+            self.audit_count += 1
+            full_audit = self.audit_count % self.FULL_AUDIT_CYCLE == 0
+            for dpid, dp in self.patch_app.dpset.get_all():
+                try:
+                    if full_audit:
+                        self.request_flow_stats(dp)
+                    else:
+                        self.request_aggregate_stats(dp)
+                except patch_ofc_error.PatchOfcError as err:
+                    LOG.error(err.message)
+
+    def start_reconciliation(self, dp, group_job=None):
+        """ request flow stats of dp after group_job (restoration of groups) is finished """
+        if group_job is None:
+            self.request_flow_stats(dp)
+        else:
+            hub.spawn(self._reconcile_after_job, dp, group_job)
+
+    def _reconcile_after_job(self, dp, group_job):
+        if not group_job.wait(self.JOB_WAIT_TIMEOUT):
+            LOG.warning("dpid:%s, groups are not restored in %d sec",
+                        dp.id, self.JOB_WAIT_TIMEOUT)
+        elif group_job.status != 'done':
+            LOG.error("dpid:%s, cannot restore groups: %s",
+                      dp.id, json.dumps(group_job.to_dict()))
+        try:
+            self.request_flow_stats(dp)
+        except patch_ofc_error.PatchOfcError as err:
+            LOG.error(err.message)
+
+    def datapath_left(self, dp):
+        self.flow_stats.pop(dp.id, None)
+        self.aggregate_xids.pop(dp.id, None)
+        self.entry_counts.pop(dp.id, None)
+        self.expected_counts.pop(dp.id, None)
+
+    # expected flow count
+
+    def flow_stored(self, req_flow, entry_count):
+        """ stored flow (put) is sent as entry_count flow entries """
+        self._set_entry_count(req_flow, entry_count)
+
+    def flow_removed(self, req_flow):
+        self._set_entry_count(req_flow, 0)
+
+    def _set_entry_count(self, req_flow, entry_count):
+        dpid = req_flow.get('dpid')
+        counts = self.entry_counts.get(dpid)
+        if counts is None:
+            return  # not reconciled yet: counted by reconciliation
+        key = patch_ofc_flowstore.flow_match_key(req_flow)
+        self.expected_counts[dpid] -= counts.pop(key, 0)
+        if entry_count:
+            counts[key] = entry_count
+            self.expected_counts[dpid] += entry_count
+
+    def _reset_entry_counts(self, dp, expected):
+        """ :param expected: {cookie: (req_flow, [flow entry])} of stored flows of dp """
+        counts = dict(
+            (patch_ofc_flowstore.flow_match_key(req_flow), len(flow_rules))
+            for req_flow, flow_rules in expected.values()
+        )
+        self.entry_counts[dp.id] = counts
+        self.expected_counts[dp.id] = sum(counts.values())
+
+    # flow stats
+
+    @staticmethod
+    def _flow_stats_request(dp):
+        ofproto = dp.ofproto
+        parser = dp.ofproto_parser
+        match = parser.OFPMatch()
+        if ofproto.OFP_VERSION == ofproto_v1_0.OFP_VERSION:
+            return parser.OFPFlowStatsRequest(
+                dp, 0, match, 0xff, ofproto.OFPP_NONE
+            )
+        elif ofproto.OFP_VERSION == ofproto_v1_2.OFP_VERSION:
+            return parser.OFPFlowStatsRequest(
+                dp, ofproto.OFPTT_ALL, ofproto.OFPP_ANY, ofproto.OFPG_ANY,
+                0, 0, match
+            )
+        elif ofproto.OFP_VERSION == ofproto_v1_3.OFP_VERSION:
+            return parser.OFPFlowStatsRequest(
+                dp, 0, ofproto.OFPTT_ALL, ofproto.OFPP_ANY, ofproto.OFPG_ANY,
+                0, 0, match
+            )
+        msg = "Unsupported OFP version: %s" % ofproto.OFP_VERSION
+        raise patch_ofc_error.PatchOfcError(msg)
+
+    @staticmethod
+    def _has_more_reply(msg):
+        ofproto = msg.datapath.ofproto
+        if ofproto.OFP_VERSION == ofproto_v1_0.OFP_VERSION:
+            return bool(msg.flags & ofproto.OFPSF_REPLY_MORE)
+        elif ofproto.OFP_VERSION == ofproto_v1_2.OFP_VERSION:
+            return bool(msg.flags & ofproto.OFPSF_REPLY_MORE)
+        return bool(msg.flags & ofproto.OFPMPF_REPLY_MORE)
+
+    def request_flow_stats(self, dp):
+        if dp.id in self.flow_stats:
+            return  # already in progress
+        req = self._flow_stats_request(dp)
+        dp.set_xid(req)
+        self.flow_stats[dp.id] = PatchFlowStatsCollector(req.xid)
+        LOG.info("dpid:%s, request flow stats to reconcile", dp.id)
+        dp.send_msg(req)
+
+    def flow_stats_reply(self, msg):
+        dp = msg.datapath
+        collector = self.flow_stats.get(dp.id)
+        if collector is None or collector.xid != msg.xid:
+            return  # not requested by reconciler
+        collector.add(msg.body)
+        if self._has_more_reply(msg):
+            return
+        del self.flow_stats[dp.id]
+        self.reconcile(dp, collector)
+
+    # aggregate stats (audit)
+
+    @staticmethod
+    def _aggregate_stats_request(dp):
+        ofproto = dp.ofproto
+        parser = dp.ofproto_parser
+        match = parser.OFPMatch()
+        if ofproto.OFP_VERSION == ofproto_v1_0.OFP_VERSION:
+            return parser.OFPAggregateStatsRequest(
+                dp, 0, match, 0xff, ofproto.OFPP_NONE
+            )
+        elif ofproto.OFP_VERSION == ofproto_v1_2.OFP_VERSION:
+            return parser.OFPAggregateStatsRequest(
+                dp, ofproto.OFPTT_ALL, ofproto.OFPP_ANY, ofproto.OFPG_ANY,
+                0, 0, match
+            )
+        elif ofproto.OFP_VERSION == ofproto_v1_3.OFP_VERSION:
+            return parser.OFPAggregateStatsRequest(
+                dp, 0, ofproto.OFPTT_ALL, ofproto.OFPP_ANY, ofproto.OFPG_ANY,
+                0, 0, match
+            )
+        msg = "Unsupported OFP version: %s" % ofproto.OFP_VERSION
+        raise patch_ofc_error.PatchOfcError(msg)
+
+    def request_aggregate_stats(self, dp):
+        if dp.id in self.flow_stats:
+            return  # full reconciliation is in progress
+        req = self._aggregate_stats_request(dp)
+        dp.set_xid(req)
+        self.aggregate_xids[dp.id] = req.xid
+        dp.send_msg(req)
+
+    def aggregate_stats_reply(self, msg):
+        dp = msg.datapath
+        if self.aggregate_xids.get(dp.id) != msg.xid:
+            return
+        del self.aggregate_xids[dp.id]
+        if dp.id not in self.expected_counts:
+            LOG.info("dpid:%s, not reconciled yet, start reconciliation", dp.id)
+            self.request_flow_stats(dp)
+            return
+        # OF1.0: list of stats, OF1.2-: stats
+        stats = msg.body[0] if isinstance(msg.body, list) else msg.body
+        # +1: default deny rule
+        expected_count = self.expected_counts[dp.id] + 1
+        if stats.flow_count != expected_count:
+            LOG.info("dpid:%s, flow count:%d (expected:%d), start reconciliation",
+                     dp.id, stats.flow_count, expected_count)
+            self.request_flow_stats(dp)
+
+    # reconciliation
+
+    def _expected_entries(self, dp):
+        """ :return: {cookie: (req_flow, [flow entry])} of stored flows of dp """
+        expected = {}
+        for req_flow in self.patch_app.patch_flows.flows_by_dpid(dp.id):
+            try:
+                flow_req = patch_ofc_decoder.PatchFlowRequest.from_flow(req_flow)
+                flow_rules = self.patch_app.flow_builder.build_flow(dp, flow_req)
+            except patch_ofc_error.PatchOfcError as err:
+                LOG.error("dpid:%s, cannot build stored flow: %s", dp.id, err.message)
+                continue
+            expected[patch_ofc_flowstore.flow_cookie(req_flow)] = (req_flow, flow_rules)
+        return expected
+
+    def reconcile(self, dp, collector):
+        expected = self._expected_entries(dp)
+        self._reset_entry_counts(dp, expected)
+        flow_mods = []
+        # stale: entries that has unknown cookie
+        for cookie, priority, match in collector.entries:
+            if cookie not in expected:
+                flow_mods.append(
+                    (StaleFlowEntry(cookie, priority, match), dp.ofproto.OFPFC_DELETE_STRICT)
+                )
+        delete_count = len(flow_mods)
+        # missing: entries of stored flow that are not (or partially) in table
+        add_command = dp.ofproto.OFPFC_ADD
+        for cookie, (req_flow, flow_rules) in expected.items():
+            if collector.cookie_counts[cookie] < len(flow_rules):
+                flow_mods.extend((flow_rule, add_command) for flow_rule in flow_rules)
+        LOG.info("dpid:%s, reconcile: %d entries in table, push:%d, delete:%d",
+                 dp.id, sum(collector.cookie_counts.values()),
+                 len(flow_mods) - delete_count, delete_count)
+        if not flow_mods:
+            return None
+        job = self.patch_app.sender.new_job()
+        self.patch_app.sender.submit(job, dp, flow_mods)
+        job.close()
+        hub.spawn(self._wait_reconciliation, dp, job)
+        return job
+
+    def _wait_reconciliation(self, dp, job):
+        if not job.wait(self.JOB_WAIT_TIMEOUT):
+            LOG.warning("dpid:%s, reconciliation is not confirmed in %d sec: %s",
+                        dp.id, self.JOB_WAIT_TIMEOUT, json.dumps(job.to_dict()))
+        elif job.status != 'done':
+            LOG.error("dpid:%s, reconciliation failed: %s", dp.id, json.dumps(job.to_dict()))
+        else:
+            LOG.info("dpid:%s, reconciled: %s", dp.id, json.dumps(job.to_dict()))
+
+    @staticmethod
+    def delete_flow_entry(dp, entry, command):
+        """ send flow-mod to delete StaleFlowEntry (queued by sender) """
+        ofproto = dp.ofproto
+        parser = dp.ofproto_parser
+        if ofproto.OFP_VERSION == ofproto_v1_0.OFP_VERSION:
+            flow_mod = parser.OFPFlowMod(
+                datapath=dp, match=entry.match, cookie=entry.cookie,
+                command=command, idle_timeout=0, hard_timeout=0,
+                priority=entry.priority, buffer_id=0xffffffff,
+                out_port=ofproto.OFPP_NONE, flags=0, actions=[]
+            )
+        else:
+            flow_mod = parser.OFPFlowMod(
+                datapath=dp, cookie=entry.cookie, cookie_mask=0xffffffffffffffff,
+                table_id=ofproto.OFPTT_ALL, command=command,
+                idle_timeout=0, hard_timeout=0, priority=entry.priority,
+                buffer_id=ofproto.OFP_NO_BUFFER, out_port=ofproto.OFPP_ANY,
+                out_group=ofproto.OFPG_ANY, flags=0, match=entry.match, instructions=[]
+            )
+        dp.send_msg(flow_mod)
+        return True
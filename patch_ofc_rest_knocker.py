@@ -6,41 +6,177 @@ import logging
 import logging.config
 import re
 import argparse
+import socket
+import threading
+import Queue
 import patch_ofc_error
+import patch_ofc_flowstore
+import patch_profile
 
+# group entries (run_l1patch.py --group-table) are sent to group API
+GROUP_API_PATH = "/patch/group"
 
-class L1PatchFlowThrower:
-    def __init__(self, base_url, port):
+
+class L1PatchFlowThrower(object):
+    def __init__(self, base_url, port, stream=False):
         self.base_url = base_url
         self.port = port
-        self._read_flow_rules_from_stdin()
-        self.rest_svr = httplib2.Http(".cache")
+        self.stream = stream
+        self.flow_rules_dic = {}
+        if not self.stream:
+            self._read_flow_rules_from_stdin()
+        self.rest_svr = httplib2.Http()
         logging.config.fileConfig('logger.conf')
         self.logger = logging.getLogger(__name__)
 
     def _read_flow_rules_from_stdin(self):
-        self.flow_rules_dic = json.load(sys.stdin, encoding='utf-8')
+        with patch_profile.span('stdin.parse'):
+            self.flow_rules_dic = json.load(sys.stdin, encoding='utf-8')
+
+    @staticmethod
+    def _iter_flow_rules_from_stdin():
+        # newline-delimited json (run_l1patch.py --stream)
+        # use readline() to process each line as soon as it is written.
+        for line in iter(sys.stdin.readline, ''):
+            if line.strip():
+                with patch_profile.span('stdin.parse'):
+                    flow_rules_dic = json.loads(line, encoding='utf-8')
+                yield flow_rules_dic
+
+    def _iter_flow_rules_dic(self):
+        if self.stream:
+            return self._iter_flow_rules_from_stdin()
+        return iter([self.flow_rules_dic])
+
+    @staticmethod
+    def _group_entries_first(method):
+        # group must exist while flows refer to it:
+        # put groups before flows, delete groups after flows.
+        return str(method).upper() == 'PUT'
+
+    def _iter_flow_rules(self, method='put'):
+        group_order = [True, False] if self._group_entries_first(method) else [False, True]
+        for flow_rules_dic in self._iter_flow_rules_dic():
+            for is_group in group_order:
+                for dispatcher_name, flow_rules in flow_rules_dic.items():
+                    for flow_rule in flow_rules:
+                        if patch_ofc_flowstore.is_group_entry(flow_rule) == is_group:
+                            yield dispatcher_name, flow_rule
+
+    def _api_urls(self, path):
+        """ :return: url of flow API and url of group API (with same query) """
+        base_url = "http://" + self.base_url + ":" + str(self.port)
+        query = path[path.index('?'):] if '?' in path else ""
+        return base_url + path, base_url + GROUP_API_PATH + query
+
+    @staticmethod
+    def _entry_url(urls, flow_rule):
+        url, group_url = urls
+        return group_url if patch_ofc_flowstore.is_group_entry(flow_rule) else url
 
     def dump(self):
         print json.dumps(self.flow_rules_dic, indent=2)
 
     def put_all_flow_rules(self, path, method):
-        url = "http://" + self.base_url + ":" + str(self.port) + path
-        self.logger.info("Set API URL: %s" % url)
-        for dispatcher_name, flow_rules in self.flow_rules_dic.items():
-            for flow_rule in flow_rules:
-                self._put_flow_rule(url, dispatcher_name, method, flow_rule)
+        urls = self._api_urls(path)
+        self.logger.info("Set API URL: %s" % urls[0])
+        for dispatcher_name, flow_rule in self._iter_flow_rules(method):
+            self._put_flow_rule(
+                self._entry_url(urls, flow_rule), dispatcher_name, method, flow_rule
+            )
 
-    def _put_flow_rule(self, api_url, dispatcher_name, method, rule):
+    def apply_flow_rules_delta(self, path, bulk=False):
+        """
+        apply delta flow rules ({'delete': {...}, 'put': {...}})
+        made by run_l1patch_diff.py: delete stale rules at first.
+        """
+        delta = self.flow_rules_dic
+        put_func = self.put_all_flow_rules_bulk if bulk else self.put_all_flow_rules
+        try:
+            for method in ['delete', 'put']:
+                self.flow_rules_dic = delta.get(method, {})
+                if self.flow_rules_dic:
+                    put_func(path, method)
+        finally:
+            self.flow_rules_dic = delta
+
+    def put_all_flow_rules_bulk(self, path, method):
+        """
+        send flow rules by one request (for each line in stream mode),
+        OFC groups them by datapath and closes each group with a barrier.
+        group entries are sent one by one to group API.
+        """
+        urls = self._api_urls(path)
+        self.logger.info("Set API URL: %s" % urls[0])
+        method = self._check_method(method)
+        for flow_rules_dic in self._iter_flow_rules_dic():
+            group_entries = []
+            flow_rules_only_dic = {}
+            for dispatcher_name, flow_rules in flow_rules_dic.items():
+                for flow_rule in flow_rules:
+                    if patch_ofc_flowstore.is_group_entry(flow_rule):
+                        group_entries.append((dispatcher_name, flow_rule))
+                    else:
+                        flow_rules_only_dic.setdefault(dispatcher_name, []).append(flow_rule)
+            if self._group_entries_first(method):
+                self._put_group_entries(urls[1], method, group_entries)
+            if flow_rules_only_dic:
+                self._put_flow_rules_dic(urls[0], method, flow_rules_only_dic)
+            if not self._group_entries_first(method):
+                self._put_group_entries(urls[1], method, group_entries)
+
+    def _put_group_entries(self, group_url, method, group_entries):
+        for dispatcher_name, group_entry in group_entries:
+            self._put_flow_rule(group_url, dispatcher_name, method, group_entry)
+
+    def _put_flow_rules_dic(self, url, method, flow_rules_dic):
+        with patch_profile.span('http.request.bulk'):
+            response, content = self.rest_svr.request(
+                url, method, json.dumps(flow_rules_dic)
+            )
+        patch_profile.count('http-status', response["status"])
+        for dispatcher_name, flow_rules in flow_rules_dic.items():
+            patch_profile.count('rules-per-dpid', dispatcher_name, len(flow_rules))
+        log_level = logging.INFO
+        if not re.match(r"2\d\d", response["status"]):
+            log_level = logging.ERROR
+        self.logger.log(log_level, "Send %s: bulk flow rules", method)
+        self.logger.log(log_level, "Response: %s", response)
+        try:
+            results = json.loads(content)
+        except ValueError:
+            self.logger.log(log_level, "Content: %s", content)
+            return
+        # report each rule result
+        for dispatcher_name, flow_rules in flow_rules_dic.items():
+            for flow_rule, result in zip(flow_rules, results.get(dispatcher_name, [])):
+                rule_log_level = logging.INFO
+                if not 200 <= result.get('status', 0) < 300:
+                    rule_log_level = logging.ERROR
+                self.logger.log(
+                    rule_log_level,
+                    "Result: node:%s, rule:%s, result:%s",
+                    dispatcher_name, json.dumps(flow_rule), json.dumps(result)
+                )
+
+    @staticmethod
+    def _check_method(method):
         method = str(method).upper()
         if not (method == 'PUT' or method == 'DELETE'):
             msg = "Unknown method:%s to send OpenFlow Controller" % method
             raise patch_ofc_error.PatchOfcRestError(msg)
+        return method
 
-        time.sleep(0.1)
-        response, content = self.rest_svr.request(
-            api_url, method, json.dumps(rule)
-        )
+    def _put_flow_rule(self, api_url, dispatcher_name, method, rule):
+        method = self._check_method(method)
+
+        # no pacing: next rule is sent after response of the previous one
+        with patch_profile.span('http.request'):
+            response, content = self.rest_svr.request(
+                api_url, method, json.dumps(rule)
+            )
+        patch_profile.count('http-status', response["status"])
+        patch_profile.count('rules-per-dpid', dispatcher_name)
         log_level = logging.INFO
         if not re.match(r"2\d\d", response["status"]):
             log_level = logging.ERROR
@@ -53,6 +189,158 @@ class L1PatchFlowThrower:
         self.logger.log(log_level, "Response: %s", response)
         self.logger.log(log_level, "Content: %s", content)
 
+
+class AdaptiveTokenBucket(object):
+    """
+    Token bucket rate limiter shared by sender threads.
+    Rate is decreased multiplicatively when controller responds 5xx
+    or slower than target latency, and increased additively otherwise (AIMD).
+    """
+    def __init__(self, rate, burst=None,
+                 min_rate=1.0, max_rate=1000.0, target_latency=0.2):
+        self.rate = float(rate)
+        self.burst = float(burst) if burst else max(1.0, self.rate)
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate)
+        self.target_latency = target_latency
+        self.tokens = self.burst
+        self.last_time = time.time()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.time()
+        self.tokens = min(
+            self.burst, self.tokens + (now - self.last_time) * self.rate
+        )
+        self.last_time = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def feedback(self, latency, status):
+        with self.lock:
+            if status >= 500:
+                self.rate = max(self.min_rate, self.rate / 2.0)
+            elif latency > self.target_latency:
+                self.rate = max(self.min_rate, self.rate * 0.8)
+            else:
+                self.rate = min(self.max_rate, self.rate + 1.0)
+
+
+class L1PatchConcurrentFlowThrower(L1PatchFlowThrower):
+    """
+    Send flow rules by bounded worker pool.
+    Each worker has its own keep-alive connection (httplib2.Http is not thread-safe)
+    and all rules of a dispatcher are sent by one worker to keep their order.
+    """
+    QUEUE_SIZE = 1024
+
+    def __init__(self, base_url, port, max_inflight, rate, stream=False):
+        super(L1PatchConcurrentFlowThrower, self).__init__(base_url, port, stream)
+        self.max_inflight = max_inflight
+        self.bucket = AdaptiveTokenBucket(rate)
+        self.worker_queues = []
+        self.dispatcher_worker_index = {}  # dispatcher name: worker queue index
+        self.failed_count = 0
+        self.count_lock = threading.Lock()
+
+    def put_all_flow_rules(self, path, method):
+        urls = self._api_urls(path)
+        self.logger.info("Set API URL: %s (max inflight:%d)" % (urls[0], self.max_inflight))
+        method = self._check_method(method)
+
+        self.failed_count = 0
+        workers = self._start_workers(urls, method)
+        try:
+            for dispatcher_name, flow_rule in self._iter_flow_rules(method):
+                self._dispatch(dispatcher_name, flow_rule)
+        finally:
+            self._stop_workers(workers)
+
+        if self.failed_count > 0:
+            self.logger.error("Failed to send %d rule(s)", self.failed_count)
+
+    def _start_workers(self, urls, method):
+        self.worker_queues = []
+        self.dispatcher_worker_index = {}
+        workers = []
+        for _ in xrange(self.max_inflight):
+            queue = Queue.Queue(self.QUEUE_SIZE)
+            worker = threading.Thread(
+                target=self._run_worker, args=(queue, urls, method)
+            )
+            worker.daemon = True
+            worker.start()
+            self.worker_queues.append(queue)
+            workers.append(worker)
+        return workers
+
+    def _stop_workers(self, workers):
+        for queue in self.worker_queues:
+            queue.put(None)  # sentinel
+        for worker in workers:
+            worker.join()
+
+    def _dispatch(self, dispatcher_name, flow_rule):
+        # pin dispatcher to a worker to keep rule order of the dispatcher
+        if dispatcher_name not in self.dispatcher_worker_index:
+            self.dispatcher_worker_index[dispatcher_name] =\
+                len(self.dispatcher_worker_index) % len(self.worker_queues)
+        queue = self.worker_queues[self.dispatcher_worker_index[dispatcher_name]]
+        queue.put((dispatcher_name, flow_rule))
+
+    def _run_worker(self, queue, urls, method):
+        rest_svr = httplib2.Http()  # connection is kept alive in worker
+        while True:
+            item = queue.get()
+            if item is None:
+                break
+            try:
+                self._send_rule(rest_svr, urls, method, *item)
+            except Exception:
+                # unexpected error of a rule (response, encoding...) is a failure of the rule:
+                # worker must keep consuming its queue until sentinel
+                self.logger.exception("Cannot send rule: node:%s", item[0])
+                with self.count_lock:
+                    self.failed_count += 1
+
+    def _send_rule(self, rest_svr, urls, method, dispatcher_name, flow_rule):
+        with patch_profile.span('rate-limit.wait'):
+            self.bucket.acquire()
+        start_time = time.time()
+        try:
+            with patch_profile.span('http.request'):
+                response, content = rest_svr.request(
+                    self._entry_url(urls, flow_rule), method, json.dumps(flow_rule)
+                )
+            status = int(response["status"])
+        except (socket.error, httplib2.HttpLib2Error) as err:
+            response, content = None, str(err)
+            status = 599  # treat as server error to slow down
+        self.bucket.feedback(time.time() - start_time, status)
+        patch_profile.count('http-status', str(status))
+        patch_profile.count('rules-per-dpid', dispatcher_name)
+
+        log_level = logging.INFO
+        if not 200 <= status < 300:
+            log_level = logging.ERROR
+            with self.count_lock:
+                self.failed_count += 1
+        self.logger.log(
+            log_level,
+            "Send %s: node:%s, rule:%s",
+            method, dispatcher_name, json.dumps(flow_rule)
+        )
+        self.logger.log(log_level, "Response: %s", response)
+        self.logger.log(log_level, "Content: %s", content)
+
 if __name__ == '__main__':
     # parse options
     arg_parser = argparse.ArgumentParser(
@@ -60,11 +348,64 @@ if __name__ == '__main__':
     )
     arg_parser.add_argument(
         '-m', '--method',
-        required=True, nargs=1, choices=["put", "delete"]
+        required=True, nargs=1, choices=["put", "delete", "apply"],
+        help="apply: send delta flow rules made by run_l1patch_diff.py"
+    )
+    arg_parser.add_argument(
+        '-b', '--bulk',
+        action="store_true", default=False,
+        help="Send all flow rules by one request (bulk API)"
+    )
+    arg_parser.add_argument(
+        '--max-inflight',
+        type=int, default=1, metavar='N',
+        help="Number of concurrent requests (default:1, send serially)"
+    )
+    arg_parser.add_argument(
+        '--rate',
+        type=float, default=50.0, metavar='RPS',
+        help="Initial request rate [rules/sec] of concurrent sender (default:50)"
+    )
+    arg_parser.add_argument(
+        '-s', '--stream',
+        action="store_true", default=False,
+        help="Read newline-delimited json (run_l1patch.py --stream) and send it incrementally"
+    )
+    arg_parser.add_argument(
+        '-w', '--wait',
+        action="store_true", default=False,
+        help="Wait until flow-mods are confirmed by barrier in OFC (default: return when queued)"
+    )
+    arg_parser.add_argument(
+        '--timing',
+        type=str, metavar='FILE',
+        help="Write json timing summary (spans and counters) to FILE at exit ('-': stderr)"
+    )
+    arg_parser.add_argument(
+        '--profile',
+        type=str, metavar='FILE',
+        help="Write cProfile stats (main thread) to FILE at exit"
     )
     args = arg_parser.parse_args()
+    if args.stream and args.method[0] == 'apply':
+        arg_parser.error("delta flow rules cannot be read as stream")
+    if args.timing or args.profile:
+        patch_profile.enable_instrument(args.timing, args.profile)
 
     # run
-    flow_builder = L1PatchFlowThrower("localhost", 8080)
+    if args.max_inflight > 1:
+        flow_builder = L1PatchConcurrentFlowThrower(
+            "localhost", 8080, args.max_inflight, args.rate, args.stream
+        )
+    else:
+        flow_builder = L1PatchFlowThrower("localhost", 8080, args.stream)
     # flow_builder.dump()
-    flow_builder.put_all_flow_rules("/patch/flow", args.method[0])
+    api_path = "/patch/flows" if args.bulk else "/patch/flow"
+    if args.wait:
+        api_path += "?wait=true"
+    if args.method[0] == 'apply':
+        flow_builder.apply_flow_rules_delta(api_path, args.bulk)
+    elif args.bulk:
+        flow_builder.put_all_flow_rules_bulk(api_path, args.method[0])
+    else:
+        flow_builder.put_all_flow_rules(api_path, args.method[0])
@@ -0,0 +1,211 @@
+import time
+import logging
+import itertools
+import collections
+from ryu.lib import hub
+import patch_ofc_error
+
+LOG = logging.getLogger('ryu.app.patch.patch_sender')
+MAX_XID = 0xffffffff
+
+
+def _xid_in_range(xid, first_xid, last_xid):
+    # xid of datapath wraps around at MAX_XID
+    return (xid - first_xid) & MAX_XID <= (last_xid - first_xid) & MAX_XID
+
+
+class PatchFlowJob(object):
+    """
+    flow-mods of a REST request.
+    completed when barrier replies of all batches including them are received.
+    status is 'failed' if a flow-mod could not be sent
+    or the switch replied error (OFPErrorMsg) to it before the barrier reply.
+    """
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = 'queued'  # queued -> done/failed
+        self.pending = 0  # number of (datapath, flow-mods) not confirmed
+        self.flow_mod_count = 0
+        self.errors = []
+        self.closed = False
+        self.created_time = time.time()
+        self.finished_time = None
+        self.event = hub.Event()
+
+    def add_pending(self, flow_mod_count):
+        self.pending += 1
+        self.flow_mod_count += flow_mod_count
+
+    def confirm(self, error=None):
+        if error:
+            self.errors.append(error)
+        self.pending -= 1
+        self._check_finished()
+
+    def add_error(self, error):
+        """ error of a flow-mod: job fails when it is finished """
+        self.errors.append(error)
+
+    def close(self):
+        """ all flow-mods are submitted """
+        self.closed = True
+        self._check_finished()
+
+    def _check_finished(self):
+        if self.closed and self.pending <= 0 and self.finished_time is None:
+            self.status = 'failed' if self.errors else 'done'
+            self.finished_time = time.time()
+            self.event.set()
+
+    def is_finished(self):
+        return self.finished_time is not None
+
+    def wait(self, timeout):
+        self.event.wait(timeout)
+        return self.is_finished()
+
+    def to_dict(self):
+        return {
+            'job': self.id,
+            'status': self.status,
+            'flow-mods': self.flow_mod_count,
+            'pending': self.pending,
+            'errors': self.errors,
+            'elapsed': (self.finished_time or time.time()) - self.created_time
+        }
+
+
+class PatchFlowSender(object):
+    """
+    Per-datapath outbound queue of flow-mods drained by green thread.
+    Queued flow-mods (of several requests) are coalesced up to BATCH_SIZE,
+    sent back to back and closed by a barrier request.
+    Jobs of the batch are confirmed by the barrier reply.
+    Flow-mods of a job are sent with consecutive xids of the datapath:
+    error reply (OFPErrorMsg) before the barrier reply is correlated to the job by xid.
+    """
+    BATCH_SIZE = 256  # flow-mods
+    JOB_HISTORY = 1024
+
+    def __init__(self, patch_app):
+        self.patch_app = patch_app
+        # dpid: hub.Queue of (job, [(flow_rule / group / StaleFlowEntry, command)])
+        self.queues = {}
+        self.threads = {}  # dpid: green thread
+        self.jobs = collections.OrderedDict()  # job id: PatchFlowJob
+        self.barrier_jobs = {}  # (dpid, barrier xid): [(job, first xid, last xid)]
+        self.job_ids = itertools.count(1)
+
+    def new_job(self):
+        job = PatchFlowJob(next(self.job_ids))
+        self.jobs[job.id] = job
+        # forget old finished jobs
+        while len(self.jobs) > self.JOB_HISTORY:
+            oldest_id = next(iter(self.jobs))
+            if not self.jobs[oldest_id].is_finished():
+                break
+            del self.jobs[oldest_id]
+        return job
+
+    def job_by_id(self, job_id):
+        return self.jobs.get(job_id)
+
+    def submit(self, job, dp, flow_mods):
+        """ :param flow_mods: list of (flow_rule / group / StaleFlowEntry, datapath command) """
+        if not flow_mods:
+            return
+        if dp.id not in self.queues:
+            self.queues[dp.id] = hub.Queue()
+            self.threads[dp.id] = hub.spawn(self._drain, dp, self.queues[dp.id])
+        job.add_pending(len(flow_mods))
+        self.queues[dp.id].put((job, flow_mods))
+
+    def _next_batch(self, queue):
+        # block until first entry, then coalesce queued entries
+        entries = [queue.get()]
+        flow_mod_count = len(entries[0][1]) if entries[0] else 0
+        while entries[-1] is not None and flow_mod_count < self.BATCH_SIZE:
+            try:
+                entry = queue.get_nowait()
+            except hub.QueueEmpty:
+                break
+            entries.append(entry)
+            if entry is not None:
+                flow_mod_count += len(entry[1])
+        return entries
+
+    def _drain(self, dp, queue):
+        while True:
+            entries = self._next_batch(queue)
+            stopped = entries[-1] is None  # sentinel: datapath left
+            entries = [entry for entry in entries if entry is not None]
+            if entries:
+                self._send_batch(dp, entries)
+            if stopped:
+                break
+
+    def _send_batch(self, dp, entries):
+        sent_jobs = []  # (job, first xid, last xid)
+        for job, flow_mods in entries:
+            # flow-mods (sent by ofctl) get next xids of datapath
+            first_xid = (dp.xid + 1) & MAX_XID
+            try:
+                for entry, command in flow_mods:
+                    self.patch_app._mod_patch_entry(dp, entry, command)
+                sent_jobs.append((job, first_xid, dp.xid))
+            except patch_ofc_error.PatchOfcError as err:
+                LOG.error(err.message)
+                job.confirm("dpid:%s, %s" % (dp.id, err.message))
+            except Exception as err:
+                # malformed rule/group: fail the job, drain thread must keep running
+                LOG.exception("dpid:%s, cannot send flow-mod", dp.id)
+                job.confirm("dpid:%s, cannot send flow-mod: %s" % (dp.id, err))
+        if not sent_jobs:
+            return
+        barrier_request = dp.ofproto_parser.OFPBarrierRequest(dp)
+        dp.set_xid(barrier_request)
+        self.barrier_jobs[(dp.id, barrier_request.xid)] = sent_jobs
+        dp.send_msg(barrier_request)
+        LOG.debug("dpid:%s, sent %d flow-mods of %d job(s), barrier xid:%d",
+                  dp.id, sum(len(entry[1]) for entry in entries),
+                  len(sent_jobs), barrier_request.xid)
+
+    def barrier_reply(self, msg):
+        sent_jobs = self.barrier_jobs.pop((msg.datapath.id, msg.xid), None)
+        if sent_jobs is None:
+            return  # barrier not sent by sender
+        for job, first_xid, last_xid in sent_jobs:
+            job.confirm()
+
+    def error_reply(self, msg):
+        """ OFPErrorMsg: fail the job whose flow-mod (xid) is rejected by switch """
+        for (dpid, barrier_xid), sent_jobs in self.barrier_jobs.items():
+            if dpid != msg.datapath.id:
+                continue
+            for job, first_xid, last_xid in sent_jobs:
+                if _xid_in_range(msg.xid, first_xid, last_xid):
+                    error = "dpid:%s, xid:%d, rejected by switch (type:%d, code:%d)" % (
+                        dpid, msg.xid, msg.type, msg.code
+                    )
+                    LOG.error(error)
+                    job.add_error(error)
+                    return True
+        return False
+
+    def datapath_left(self, dp):
+        queue = self.queues.pop(dp.id, None)
+        if queue is not None:
+            self.threads.pop(dp.id, None)
+            # fail jobs not sent
+            while True:
+                try:
+                    entry = queue.get_nowait()
+                except hub.QueueEmpty:
+                    break
+                job = entry[0]
+                job.confirm("dpid:%s, datapath left before flow-mods are sent" % dp.id)
+            queue.put(None)  # stop drain thread
+        # fail jobs waiting barrier reply
+        for key in [key for key in self.barrier_jobs if key[0] == dp.id]:
+            for job, first_xid, last_xid in self.barrier_jobs.pop(key):
+                job.confirm("dpid:%s, datapath left before barrier reply" % dp.id)
@@ -0,0 +1,176 @@
+import json
+import heapq
+import itertools
+import collections
+import patch_link
+import patch_error
+
+
+class PathComputer(object):
+    """
+    Compute path of wire (hops between host-edge and dut-edge dispatcher)
+    on link graph of NodeLinkManager.
+    - Path of each wire is searched by Dijkstra over available links,
+      weight of link is its cost (3rd element of link in link-list, default 1)
+      plus its load (number of wires through the link), so wires are balanced
+      on parallel inter-switch links and take a detour if shortest links are used.
+    - Link used by exclusive mode wire is reserved:
+      exclusive wire rule matches inport only, it cannot share the link.
+    - Load of links is counted only when whole path of the wire is found.
+    """
+    def __init__(self, node_mgr):
+        self.node_mgr = node_mgr
+        self.linkmgr = node_mgr.linkmgr
+        # switch: [(port, neighbor switch, neighbor port, link)]
+        self.adjacency = collections.OrderedDict()
+        self.link_load = {}  # link: number of wires
+        self.reserved_links = {}  # link: exclusive wire name
+        self._setup_adjacency()
+
+    def _setup_adjacency(self):
+        for switch_name, dispatcher in self.node_mgr.dispatcher_index.items():
+            self.adjacency[switch_name] = []
+            for port_name, port in dispatcher.port_index.items():
+                if not port.is_inter_switch_port():
+                    continue
+                link = self.linkmgr.find_link_by_name(switch_name, port_name)
+                counterpart = self.linkmgr.counterpart_by_name(switch_name, port_name)
+                self.adjacency[switch_name].append(
+                    (port_name, counterpart.node, counterpart.port, link)
+                )
+
+    def _edge_elm(self, wire, host_elm):
+        edge_elm = self.linkmgr.counterpart_by_name(host_elm.node, host_elm.port)
+        if edge_elm is None or not self.node_mgr.has_dispatcher(edge_elm.node):
+            msg = "Wire:%s, Node,Port=%s,%s does not connect dispatcher" % (
+                wire.name, host_elm.node, host_elm.port
+            )
+            raise patch_error.PatchDefinitionError(msg)
+        return edge_elm
+
+    def _available(self, link, exclusive):
+        if link in self.reserved_links:
+            return False
+        # exclusive wire needs link that is not used by any other wire
+        return not exclusive or self.link_load.get(link, 0) == 0
+
+    def _use_link(self, wire, link):
+        self.link_load[link] = self.link_load.get(link, 0) + 1
+        if wire.is_exclusive():
+            self.reserved_links[link] = wire.name
+
+    def register_path(self, wire):
+        """ count load of links used by (defined) path of wire """
+        for elm, next_elm in zip(wire.path, wire.path[1:]):
+            if elm.node != next_elm.node:
+                link = self.linkmgr.find_link_by_name(elm.node, elm.port)
+                if link is not None:
+                    self._use_link(wire, link)
+
+    def _search_hops(self, src_switch, dst_switch, exclusive):
+        """
+        Dijkstra over available links, weight: cost + load of link.
+        :return: list of adjacency entry from src_switch to dst_switch
+          or None if there is no available path
+        """
+        weights = {src_switch: 0}
+        previous = {src_switch: None}  # switch: (previous switch, adjacency entry)
+        order = itertools.count()  # same weight: first found (defined order of ports)
+        queue = [(0, next(order), src_switch)]
+        while queue:
+            weight, _, switch_name = heapq.heappop(queue)
+            if switch_name == dst_switch:
+                break
+            if weight > weights[switch_name]:
+                continue
+            for hop in self.adjacency[switch_name]:
+                port, neighbor, neighbor_port, link = hop
+                if not self._available(link, exclusive):
+                    continue
+                neighbor_weight = weight + link.cost + self.link_load.get(link, 0)
+                if neighbor_weight < weights.get(neighbor, neighbor_weight + 1):
+                    weights[neighbor] = neighbor_weight
+                    previous[neighbor] = (switch_name, hop)
+                    heapq.heappush(queue, (neighbor_weight, next(order), neighbor))
+        if dst_switch not in previous:
+            return None
+        hops = []
+        switch_name = dst_switch
+        while previous[switch_name] is not None:
+            switch_name, hop = previous[switch_name]
+            hops.append(hop)
+        hops.reverse()
+        return hops
+
+    def compute_path(self, wire):
+        """
+        :return: path of wire: list of NodeLinkElement
+          [host-edge, (out, in) for each inter-switch hop..., dut-edge]
+        """
+        host_edge = self._edge_elm(wire, wire.test_host_elm)
+        dut_edge = self._edge_elm(wire, wire.dut_host_elm)
+        hops = self._search_hops(host_edge.node, dut_edge.node, wire.is_exclusive())
+        if hops is None:
+            msg = "Wire:%s, no available path from %s to %s" % (
+                wire.name, host_edge.node, dut_edge.node
+            )
+            raise patch_error.PatchDefinitionError(msg)
+        path = [patch_link.NodeLinkElement(host_edge.node, host_edge.port)]
+        switch_name = host_edge.node
+        for port, neighbor, neighbor_port, link in hops:
+            self._use_link(wire, link)
+            path.append(patch_link.NodeLinkElement(switch_name, port))
+            path.append(patch_link.NodeLinkElement(neighbor, neighbor_port))
+            switch_name = neighbor
+        path.append(patch_link.NodeLinkElement(dut_edge.node, dut_edge.port))
+        return path
+
+    def fill_wire_paths(self, wire_mgr):
+        """
+        set path of wires that does not have path in wire info.
+        defined paths are counted at first, then compute paths
+        of exclusive wires (reserve links) and shared wires (in order of name).
+        """
+        wires = [wire_mgr.wire_index[name] for name in sorted(wire_mgr.wire_index.keys())]
+        for wire in wires:
+            if wire.has_path():
+                self.register_path(wire)
+        for wire in wires:
+            if not wire.has_path() and wire.is_exclusive():
+                wire.set_path(self.compute_path(wire))
+        for wire in wires:
+            if not wire.has_path():
+                wire.set_path(self.compute_path(wire))
+
+    def dump_link_load(self):
+        """ for debug """
+        for link in self.linkmgr.links:
+            if link in self.link_load:
+                print "  %s: %d wire(s)%s" % (
+                    link, self.link_load[link],
+                    " (reserved by %s)" % self.reserved_links[link]
+                    if link in self.reserved_links else ""
+                )
+
+
+if __name__ == '__main__':
+    import patch_node
+    import patch_wire_group
+
+    node_data_file = open('nodeinfo_topo2.json', 'r')
+    node_data = json.load(node_data_file)
+    node_data_file.close()
+    wire_data_file = open('wireinfo_topo2.json', 'r')
+    wire_data = json.load(wire_data_file)
+    wire_data_file.close()
+    # compute all paths
+    for wire_data_by_name in wire_data['wire-index'].values():
+        wire_data_by_name.pop('path', None)
+
+    node_mgr = patch_node.NodeManager(node_data)
+    wire_mgr = patch_wire_group.WireManager(wire_data)
+    path_computer = PathComputer(node_mgr)
+    path_computer.fill_wire_paths(wire_mgr)
+    wire_mgr.dump_wires()
+    print "# link load"
+    path_computer.dump_link_load()
@@ -0,0 +1,196 @@
+import json
+import collections
+import patch_link
+import patch_error
+
+
+class LinkUsage(object):
+    """
+    Capacity budgets and usage of an inter-switch link.
+    budgets are smaller one of both end ports (None: unlimited).
+    """
+    __slots__ = ('link', 'bandwidth', 'max_wires', 'wires', 'used_bandwidth', 'exclusive_wire')
+
+    def __init__(self, link, port1, port2):
+        self.link = link
+        self.bandwidth = self._min_budget(port1.bandwidth, port2.bandwidth)
+        self.max_wires = self._min_budget(port1.max_wires, port2.max_wires)
+        self.wires = []  # name of wires through the link
+        self.used_bandwidth = 0
+        self.exclusive_wire = None
+
+    @staticmethod
+    def _min_budget(budget1, budget2):
+        budgets = [budget for budget in (budget1, budget2) if budget is not None]
+        return min(budgets) if budgets else None
+
+    def can_accept(self, wire):
+        if self.exclusive_wire is not None:
+            return False
+        if wire.is_exclusive():
+            # L1 (exclusive) wire uses whole link
+            return len(self.wires) == 0
+        if self.max_wires is not None and len(self.wires) + 1 > self.max_wires:
+            return False
+        if self.bandwidth is not None and self.used_bandwidth + wire.bandwidth > self.bandwidth:
+            return False
+        return True
+
+    def accept(self, wire):
+        self.wires.append(wire.name)
+        if wire.is_exclusive():
+            self.exclusive_wire = wire.name
+            self.used_bandwidth = self.bandwidth or 0
+        else:
+            self.used_bandwidth += wire.bandwidth
+
+    def utilization(self):
+        """ ratio of most used budget (number of wires if no budget) """
+        if self.exclusive_wire is not None:
+            return 1.0
+        ratios = [0.0]
+        if self.max_wires:
+            ratios.append(float(len(self.wires)) / self.max_wires)
+        if self.bandwidth:
+            ratios.append(float(self.used_bandwidth) / self.bandwidth)
+        return max(ratios)
+
+    def to_dict(self):
+        return collections.OrderedDict([
+            ('link', [[self.link.endpoint1.node, self.link.endpoint1.port],
+                      [self.link.endpoint2.node, self.link.endpoint2.port]]),
+            ('wires', len(self.wires)),
+            ('max-wires', self.max_wires),
+            ('bandwidth', self.used_bandwidth),
+            ('max-bandwidth', self.bandwidth),
+            ('exclusive-wire', self.exclusive_wire),
+            ('utilization', self.utilization())
+        ])
+
+
+class WirePlacementOptimizer(object):
+    """
+    Account wires on inter-switch links with capacity budgets of InterSwitchPort
+    ('bandwidth' [Mbps] and 'max-wires' in port data of node info).
+    - check: reject wire definitions that oversubscribe a link.
+    - rebalance: move each inter-switch hop of wire path
+      to the least utilized link of parallel links (same pair of dispatchers).
+    Must be used before mapping wires and ports (setup_wire_entity).
+    """
+    def __init__(self, node_mgr):
+        self.node_mgr = node_mgr
+        self.linkmgr = node_mgr.linkmgr
+        self.usage = collections.OrderedDict()  # link: LinkUsage, in order of link-list
+        self.parallel_links = {}  # (switch, switch): [link]
+        self.moved_hops = 0
+        self._setup_usage()
+
+    def _inter_switch_port(self, link_elm):
+        port = self.node_mgr.dispatcher_port_by_name(link_elm.node, link_elm.port)
+        if port is not None and port.is_inter_switch_port():
+            return port
+        return None
+
+    def _setup_usage(self):
+        for link in self.linkmgr.links:
+            port1 = self._inter_switch_port(link.endpoint1)
+            port2 = self._inter_switch_port(link.endpoint2)
+            if port1 is None or port2 is None:
+                continue  # edge link
+            self.usage[link] = LinkUsage(link, port1, port2)
+            for switch_pair in [(link.endpoint1.node, link.endpoint2.node),
+                                (link.endpoint2.node, link.endpoint1.node)]:
+                self.parallel_links.setdefault(switch_pair, []).append(link)
+
+    def _select_link(self, wire, link, out_switch, in_switch, rebalance):
+        if not rebalance:
+            return link
+        candidates = [
+            parallel_link for parallel_link in self.parallel_links[(out_switch, in_switch)]
+            if self.usage[parallel_link].can_accept(wire)
+        ]
+        if not candidates:
+            return link  # oversubscribed: rejected by place_hop()
+        # least utilized link, keep defined link if same utilization
+        return min(candidates, key=lambda candidate: (
+            self.usage[candidate].utilization(),
+            len(self.usage[candidate].wires),
+            candidate is not link
+        ))
+
+    def _place_hop(self, wire, out_elm, in_elm, rebalance):
+        """ :return: (out_elm, in_elm) of placed link """
+        link = self.linkmgr.find_link_by_name(out_elm.node, out_elm.port)
+        if link not in self.usage:
+            return out_elm, in_elm  # not inter-switch link
+        link = self._select_link(wire, link, out_elm.node, in_elm.node, rebalance)
+        usage = self.usage[link]
+        if not usage.can_accept(wire):
+            msg = "Wire:%s oversubscribes %s (wires:%d/%s, bandwidth:%s+%s/%s%s)" % (
+                wire.name, link, len(usage.wires), usage.max_wires,
+                usage.used_bandwidth, wire.bandwidth, usage.bandwidth,
+                ", used by exclusive wire:%s" % usage.exclusive_wire
+                if usage.exclusive_wire else ""
+            )
+            raise patch_error.PatchDefinitionError(msg)
+        usage.accept(wire)
+        if link.endpoint1.node == out_elm.node:
+            out_link_elm, in_link_elm = link.endpoint1, link.endpoint2
+        else:
+            out_link_elm, in_link_elm = link.endpoint2, link.endpoint1
+        if out_link_elm == out_elm:
+            return out_elm, in_elm  # not moved
+        self.moved_hops += 1
+        return (patch_link.NodeLinkElement(out_link_elm.node, out_link_elm.port),
+                patch_link.NodeLinkElement(in_link_elm.node, in_link_elm.port))
+
+    def _place_wire(self, wire, rebalance):
+        path = list(wire.path)
+        for i in xrange(len(path) - 1):
+            if path[i].node != path[i + 1].node:
+                path[i], path[i + 1] = self._place_hop(wire, path[i], path[i + 1], rebalance)
+        wire.set_path(path)
+
+    def place(self, wire_mgr, rebalance=True):
+        """
+        account (and rebalance) wires: exclusive wires at first
+        because they need whole link, then shared wires (in order of name).
+        """
+        wires = [wire_mgr.wire_index[name] for name in sorted(wire_mgr.wire_index.keys())]
+        for wire in wires:
+            if wire.is_exclusive():
+                self._place_wire(wire, rebalance)
+        for wire in wires:
+            if not wire.is_exclusive():
+                self._place_wire(wire, rebalance)
+
+    def utilization(self):
+        return [usage.to_dict() for usage in self.usage.values()]
+
+    def report(self):
+        lines = ["link utilization (moved hops:%d)" % self.moved_hops]
+        for usage in self.usage.values():
+            lines.append("  %s: wires:%d/%s, bandwidth:%s/%s, utilization:%.2f%s" % (
+                usage.link, len(usage.wires), usage.max_wires or '-',
+                usage.used_bandwidth, usage.bandwidth or '-', usage.utilization(),
+                " (exclusive:%s)" % usage.exclusive_wire if usage.exclusive_wire else ""
+            ))
+        return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    import patch_node
+    import patch_wire_group
+
+    node_data_file = open('nodeinfo_topo2.json', 'r')
+    node_data = json.load(node_data_file)
+    node_data_file.close()
+    wire_data_file = open('wireinfo_topo2.json', 'r')
+    wire_data = json.load(wire_data_file)
+    wire_data_file.close()
+
+    node_mgr = patch_node.NodeManager(node_data)
+    wire_mgr = patch_wire_group.WireManager(wire_data)
+    placement = WirePlacementOptimizer(node_mgr)
+    placement.place(wire_mgr)
+    print placement.report()
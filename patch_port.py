@@ -1,16 +1,19 @@
-import json
+import patch_name
 
 
 class NodePort(object):
+    # Ports are kept for each port in physical inventory:
+    # use __slots__ and class attribute (role) to reduce memory per port.
+    __slots__ = ('name', 'number')
+    role = None
+
     def __init__(self, port_name, port_data):
-        self.name = port_name
-        self.data = port_data
+        self.name = patch_name.intern_name(port_name)
         self.number = 0  # default
-        self.role = None
 
     def __str__(self):
-        return "Port:{ name:%s, role:%s, data:%s }" % (
-            self.name, self.role, json.dumps(self.data)
+        return "Port:{ name:%s, role:%s, number:%d }" % (
+            self.name, self.role, self.number
         )
 
     @staticmethod
@@ -35,15 +38,16 @@ class NodePort(object):
 
 
 class DispatcherPort(NodePort):
+    __slots__ = ()
+
     def __init__(self, port_name, port_data):
         super(DispatcherPort, self).__init__(port_name, port_data)
         self.number = port_data['number']
 
 
 class DUTEdgePort(DispatcherPort):
-    def __init__(self, port_name, port_data):
-        super(DUTEdgePort, self).__init__(port_name, port_data)
-        self.role = 'dut-edge'
+    __slots__ = ()
+    role = 'dut-edge'
 
     @staticmethod
     def is_dut_edge_port():
@@ -51,9 +55,8 @@ class DUTEdgePort(DispatcherPort):
 
 
 class HostEdgePort(DispatcherPort):
-    def __init__(self, port_name, port_data):
-        super(HostEdgePort, self).__init__(port_name, port_data)
-        self.role = 'host-edge'
+    __slots__ = ()
+    role = 'host-edge'
 
     @staticmethod
     def is_host_edge_port():
@@ -61,9 +64,20 @@ class HostEdgePort(DispatcherPort):
 
 
 class InterSwitchPort(DispatcherPort):
+    # capacity budgets (optional, None: unlimited)
+    # bandwidth [Mbps] and number of wires through the port
+    __slots__ = ('bandwidth', 'max_wires')
+    role = 'inter-switch'
+
     def __init__(self, port_name, port_data):
         super(InterSwitchPort, self).__init__(port_name, port_data)
-        self.role = 'inter-switch'
+        self.bandwidth = port_data.get('bandwidth')
+        self.max_wires = port_data.get('max-wires')
+
+    def __str__(self):
+        return "Port:{ name:%s, role:%s, number:%d, bandwidth:%s, max-wires:%s }" % (
+            self.name, self.role, self.number, self.bandwidth, self.max_wires
+        )
 
     @staticmethod
     def is_inter_switch_port():
@@ -71,17 +85,19 @@ class InterSwitchPort(DispatcherPort):
 
 
 class HostPort(NodePort):
-    def __init__(self, port_name, port_data):
-        super(HostPort, self).__init__(port_name, port_data)
-        self.role = 'host'
-        self.vlan_id = 0  # default
-        self.vlan_tagged = False  # default
+    __slots__ = ()
+    role = 'host'
+    vlan_id = 0  # default
+    vlan_tagged = False  # default
 
     def has_vlan(self):
         return self.vlan_tagged
 
 
 class TestHostPort(HostPort):
+    __slots__ = ('mac_addr', 'ip_addr', 'gateway')
+    role = 'test-host'
+
     def __init__(self, port_name, port_data):
         super(TestHostPort, self).__init__(port_name, port_data)
         self.mac_addr = port_data['mac-addr']
@@ -91,7 +107,11 @@ class TestHostPort(HostPort):
             self.gateway = port_data['gateway']
         except KeyError:
             self.gateway = None
-        self.role = 'test-host'
+
+    def __str__(self):
+        return "Port:{ name:%s, role:%s, mac:%s, ip:%s, gateway:%s }" % (
+            self.name, self.role, self.mac_addr, self.ip_addr, self.gateway
+        )
 
     @staticmethod
     def is_test_host_port():
@@ -99,13 +119,19 @@ class TestHostPort(HostPort):
 
 
 class DUTHostPort(HostPort):
+    __slots__ = ('vlan_id', 'vlan_tagged')
+    role = 'dut-host'
+
     def __init__(self, port_name, port_data):
         super(DUTHostPort, self).__init__(port_name, port_data)
-        if 'vlan-id' in port_data:
-            self.vlan_id = port_data['vlan-id']  # overwrite if exist key
-        if 'vlan-tagged' in port_data:
-            self.vlan_tagged = port_data['vlan-tagged']  # overwrite if exist key
-        self.role = 'dut-host'
+        # overwrite default if exist key
+        self.vlan_id = port_data.get('vlan-id', HostPort.vlan_id)
+        self.vlan_tagged = port_data.get('vlan-tagged', HostPort.vlan_tagged)
+
+    def __str__(self):
+        return "Port:{ name:%s, role:%s, vlan-id:%d, vlan-tagged:%s }" % (
+            self.name, self.role, self.vlan_id, self.vlan_tagged
+        )
 
     def has_vlan(self):
         return self.vlan_tagged and 0 < self.vlan_id < 4096
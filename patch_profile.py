@@ -0,0 +1,138 @@
+import sys
+import json
+import time
+import bisect
+import atexit
+import cProfile
+import threading
+import contextlib
+import collections
+
+
+class Instrument(object):
+    """
+    Named spans (wall/cpu time, aggregated by name) and counters (name: {key: count}).
+    """
+    def __init__(self):
+        self.spans = collections.OrderedDict()  # name: [count, wall, cpu]
+        self.counters = collections.OrderedDict()  # name: {key: value}
+        self.lock = threading.Lock()  # spans are recorded by sender threads
+        self.start_time = time.time()
+
+    @contextlib.contextmanager
+    def span(self, name):
+        wall_start = time.time()
+        cpu_start = time.clock()  # process cpu time
+        try:
+            yield
+        finally:
+            wall = time.time() - wall_start
+            cpu = time.clock() - cpu_start
+            with self.lock:
+                span = self.spans.setdefault(name, [0, 0.0, 0.0])
+                span[0] += 1
+                span[1] += wall
+                span[2] += cpu
+
+    def count(self, name, key, value=1):
+        with self.lock:
+            counter = self.counters.setdefault(name, {})
+            counter[key] = counter.get(key, 0) + value
+
+    def summary(self):
+        spans = collections.OrderedDict()
+        for name, (count, wall, cpu) in self.spans.items():
+            spans[name] = {'count': count, 'wall': wall, 'cpu': cpu}
+        return collections.OrderedDict([
+            ('elapsed', time.time() - self.start_time),
+            ('spans', spans),
+            ('counters', self.counters)
+        ])
+
+    def write_summary(self, file_name):
+        """ write json timing summary, file_name '-' means stderr """
+        if file_name == '-':
+            json.dump(self.summary(), sys.stderr, indent=2)
+            sys.stderr.write("\n")
+        else:
+            with open(file_name, 'w') as summary_file:
+                json.dump(self.summary(), summary_file, indent=2)
+
+
+class NullInstrument(object):
+    """ instrument that does nothing (default) """
+    @contextlib.contextmanager
+    def span(self, name):
+        yield
+
+    def count(self, name, key, value=1):
+        pass
+
+
+class LatencyHistogram(object):
+    """ latency histogram with fixed buckets (upper bound in msec) """
+    BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    def __init__(self):
+        self.bucket_counts = [0] * (len(self.BUCKETS_MS) + 1)  # last: overflow
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        msec = seconds * 1000.0
+        self.bucket_counts[bisect.bisect_left(self.BUCKETS_MS, msec)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def summary(self):
+        buckets = collections.OrderedDict()
+        for upper_ms, count in zip(self.BUCKETS_MS, self.bucket_counts):
+            buckets["le_%dms" % upper_ms] = count
+        buckets["overflow"] = self.bucket_counts[-1]
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'max': self.max,
+            'buckets': buckets
+        }
+
+
+# current instrument: replaced by enable_instrument()
+_instrument = NullInstrument()
+
+
+def get_instrument():
+    return _instrument
+
+
+def enable_instrument(summary_file_name=None, profile_file_name=None):
+    """
+    enable instrument (and cProfile of main thread),
+    timing summary and profile stats are written at exit.
+    """
+    global _instrument
+    if isinstance(_instrument, NullInstrument):
+        _instrument = Instrument()
+    if summary_file_name:
+        atexit.register(_instrument.write_summary, summary_file_name)
+    if profile_file_name:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        atexit.register(_dump_profile, profiler, profile_file_name)
+    return _instrument
+
+
+def _dump_profile(profiler, file_name):
+    profiler.disable()
+    profiler.dump_stats(file_name)
+
+
+def span(name):
+    return _instrument.span(name)
+
+
+def count(name, key, value=1):
+    _instrument.count(name, key, value)
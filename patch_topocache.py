@@ -0,0 +1,128 @@
+import os
+import sys
+import gc
+import hashlib
+import tempfile
+import cPickle
+import contextlib
+import patch_name
+import patch_node
+import patch_link
+import patch_port
+import patch_wire
+import patch_wire_group
+import patch_path
+import patch_flowgen
+import patch_profile
+import patch_error
+
+# modules that define classes of pickled topology (object graph)
+# or make its contents: paths (patch_path), mapping (patch_flowgen) and cache itself
+MODEL_MODULES = (
+    patch_name, patch_node, patch_link, patch_port, patch_wire, patch_wire_group,
+    patch_path, patch_flowgen, sys.modules[__name__]
+)
+
+
+@contextlib.contextmanager
+def _gc_disabled():
+    # objects of topology are not garbage:
+    # skip gc triggered by allocations while (un)pickling object graph
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+class TopologyCache(object):
+    """
+    Compiled topology cache: node/wire managers whose wires are mapped
+    to port entities are pickled (protocol 2) into cache directory.
+    Cache file name is sha1 of contents of nodeinfo/wireinfo files,
+    options of wire manager and source of modules that make topology,
+    so changed inputs (or model) use another cache file.
+    """
+    FILE_SUFFIX = ".topology.pickle"
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def _update_by_file(sha1, file_name):
+        if file_name.endswith(".pyc"):
+            file_name = file_name[:-1]  # source of compiled module
+        try:
+            with open(file_name, 'rb') as input_file:
+                sha1.update(input_file.read())
+        except IOError as err:
+            msg = "Cannot open file to make topology cache key: %s.\n%s" % (file_name, err)
+            raise patch_error.PatchError(msg)
+
+    def cache_key(self, nodeinfo_filename, wireinfo_filename,
+                  ofp_version="OpenFlow10", group_table=False):
+        sha1 = hashlib.sha1()
+        for file_name in (nodeinfo_filename, wireinfo_filename):
+            self._update_by_file(sha1, file_name)
+        sha1.update("%s:%s" % (ofp_version, group_table))
+        for module in MODEL_MODULES:
+            self._update_by_file(sha1, module.__file__)
+        return sha1.hexdigest()
+
+    def cache_file_name(self, key):
+        return os.path.join(self.cache_dir, key + self.FILE_SUFFIX)
+
+    def load(self, key):
+        """ :return: (node manager, wire manager) or None if not cached """
+        file_name = self.cache_file_name(key)
+        if not os.path.exists(file_name):
+            return None
+        try:
+            with open(file_name, 'rb') as cache_file, _gc_disabled():
+                return cPickle.load(cache_file)
+        except (IOError, EOFError, cPickle.UnpicklingError,
+                AttributeError, ImportError, IndexError, KeyError, TypeError, ValueError):
+            return None  # broken cache file: make it again
+
+    def save(self, key, node_mgr, wire_mgr):
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            # write to temporary file and rename it (other runs may read cache)
+            fd, temp_file_name = tempfile.mkstemp(dir=self.cache_dir)
+            try:
+                with os.fdopen(fd, 'wb') as cache_file, _gc_disabled():
+                    cPickle.dump((node_mgr, wire_mgr), cache_file, 2)
+                os.rename(temp_file_name, self.cache_file_name(key))
+            except:
+                os.remove(temp_file_name)
+                raise
+        except (IOError, OSError) as err:
+            msg = "Cannot write topology cache: %s.\n%s" % (self.cache_dir, err)
+            raise patch_error.PatchError(msg)
+
+    def load_generator(self, nodeinfo_filename, wireinfo_filename,
+                       ofp_version="OpenFlow10", group_table=False):
+        """
+        flow rule generator by cached topology,
+        topology is made (and cached) from nodeinfo/wireinfo if not cached.
+        """
+        key = self.cache_key(nodeinfo_filename, wireinfo_filename, ofp_version, group_table)
+        with patch_profile.span('topology-cache.load'):
+            managers = self.load(key)
+        if managers is not None:
+            patch_profile.count('topology-cache', 'hit')
+            flow_rule_generator = patch_flowgen.FlowRuleGenerator.from_managers(*managers)
+            flow_rule_generator.wire_mapped = True
+            return flow_rule_generator
+
+        patch_profile.count('topology-cache', 'miss')
+        flow_rule_generator = patch_flowgen.FlowRuleGenerator(
+            nodeinfo_filename, wireinfo_filename, ofp_version, group_table
+        )
+        flow_rule_generator.map_wire_and_port()
+        with patch_profile.span('topology-cache.save'):
+            self.save(key, flow_rule_generator.node_mgr, flow_rule_generator.wire_mgr)
+        return flow_rule_generator
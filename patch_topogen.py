@@ -0,0 +1,276 @@
+import json
+import collections
+import argparse
+import patch_node
+import patch_wire_group
+import patch_placement
+
+
+class SyntheticTopology(object):
+    """
+    Synthesize node info and wire info data for benchmark.
+    Fabric shapes of dispatchers:
+      - line: s1 - s2 - ... - sN
+      - tree: binary tree, parent of s(i) is s(i/2)
+      - leaf-spine: N/4 spine (at least 1) and others are leaf,
+        all leaves link to all spines.
+    Test hosts and DUTs are connected to edge dispatchers
+    (all in line, leaves in tree and leaf-spine) by round robin.
+    Shared mode wires use links of the fabric. Each exclusive mode wire has
+    dedicated inter-switch links (added along shortest path of the fabric),
+    so generated wires pass placement check (run_l1patch.py --placement check).
+    """
+    FABRIC_SHAPES = ['line', 'tree', 'leaf-spine']
+
+    def __init__(self, dispatchers=4, fabric='line', wires=16,
+                 exclusive_ratio=0.25, wire_group_size=4):
+        if fabric not in self.FABRIC_SHAPES:
+            raise ValueError("Unknown fabric shape: %s" % fabric)
+        self.dispatcher_count = max(1, dispatchers)
+        self.fabric = fabric
+        self.wire_count = wires
+        self.exclusive_count = int(wires * exclusive_ratio)
+        self.wire_group_size = max(1, wire_group_size)
+
+        self.dispatchers = collections.OrderedDict()  # name: dispatcher data
+        self.test_hosts = collections.OrderedDict()
+        self.dut_hosts = collections.OrderedDict()
+        self.link_list = []
+        self.adjacency = collections.OrderedDict()  # switch: [(neighbor, port, neighbor port)]
+        self.wire_index = collections.OrderedDict()
+        self.wire_group_index = collections.OrderedDict()
+        self._edge_count = 0
+
+        self._setup_dispatchers()
+        self._setup_fabric()
+        self._setup_wires()
+
+    def node_data(self):
+        return collections.OrderedDict([
+            ('test-hosts', self.test_hosts),
+            ('dut-hosts', self.dut_hosts),
+            ('dispatchers', self.dispatchers),
+            ('link-list', self.link_list)
+        ])
+
+    def wire_data(self):
+        return collections.OrderedDict([
+            ('wire-index', self.wire_index),
+            ('wire-group-index', self.wire_group_index)
+        ])
+
+    def check_placement(self):
+        """
+        raise PatchDefinitionError if wires oversubscribe inter-switch links
+        (same as run_l1patch.py --placement check)
+        """
+        node_mgr = patch_node.NodeManager(self.node_data())
+        wire_mgr = patch_wire_group.WireManager(self.wire_data())
+        placement = patch_placement.WirePlacementOptimizer(node_mgr)
+        placement.place(wire_mgr, False)
+        return placement
+
+    # dispatchers and fabric
+
+    @staticmethod
+    def _switch_name(index):
+        return "s%d" % index
+
+    def _setup_dispatchers(self):
+        for index in xrange(1, self.dispatcher_count + 1):
+            name = self._switch_name(index)
+            self.dispatchers[name] = collections.OrderedDict([
+                ('datapath-id', index),
+                ('port-index', collections.OrderedDict())
+            ])
+            self.adjacency[name] = []
+
+    def _add_port(self, switch_name):
+        port_index = self.dispatchers[switch_name]['port-index']
+        number = len(port_index) + 1
+        port_name = "%s-eth%d" % (switch_name, number)
+        port_index[port_name] = {'number': number}
+        return port_name
+
+    def _add_inter_switch_link(self, switch1, switch2, dedicated=False):
+        """ :return: hops of the link ([node, port] of switch1 and switch2) """
+        port1 = self._add_port(switch1)
+        port2 = self._add_port(switch2)
+        self.link_list.append([[switch1, port1], [switch2, port2]])
+        if not dedicated:
+            # link of fabric (shortest path search)
+            self.adjacency[switch1].append((switch2, port1, port2))
+            self.adjacency[switch2].append((switch1, port2, port1))
+        return [[switch1, port1], [switch2, port2]]
+
+    def _setup_fabric(self):
+        names = self.dispatchers.keys()
+        if self.fabric == 'line':
+            for switch1, switch2 in zip(names, names[1:]):
+                self._add_inter_switch_link(switch1, switch2)
+            self.edge_switches = names
+        elif self.fabric == 'tree':
+            for index in xrange(2, self.dispatcher_count + 1):
+                self._add_inter_switch_link(
+                    self._switch_name(index / 2), self._switch_name(index)
+                )
+            self.edge_switches = [
+                name for index, name in enumerate(names, 1)
+                if index * 2 > self.dispatcher_count
+            ]
+        else:
+            spine_count = max(1, self.dispatcher_count / 4)
+            spines = names[:spine_count]
+            leaves = names[spine_count:] or spines
+            for leaf in leaves:
+                for spine in spines:
+                    if leaf != spine:
+                        self._add_inter_switch_link(leaf, spine)
+            self.edge_switches = leaves
+
+    def _next_edge_switch(self):
+        switch_name = self.edge_switches[self._edge_count % len(self.edge_switches)]
+        self._edge_count += 1
+        return switch_name
+
+    def _dedicated_path(self, src_switch, dst_switch):
+        """ list of [node, port] through new links along shortest path of fabric """
+        hops = []
+        switches = [src_switch]
+        switches.extend(hop[0] for hop in self._shortest_path(src_switch, dst_switch)[1::2])
+        for switch1, switch2 in zip(switches, switches[1:]):
+            hops.extend(self._add_inter_switch_link(switch1, switch2, dedicated=True))
+        return hops
+
+    def _shortest_path(self, src_switch, dst_switch):
+        """ BFS: list of [node, port] from src_switch to dst_switch (inter-switch ports) """
+        previous = {src_switch: None}
+        queue = collections.deque([src_switch])
+        while queue:
+            switch_name = queue.popleft()
+            if switch_name == dst_switch:
+                break
+            for neighbor, port, neighbor_port in self.adjacency[switch_name]:
+                if neighbor not in previous:
+                    previous[neighbor] = (switch_name, port, neighbor_port)
+                    queue.append(neighbor)
+        hops = []
+        switch_name = dst_switch
+        while previous[switch_name] is not None:
+            prev_switch, port, neighbor_port = previous[switch_name]
+            hops[0:0] = [[prev_switch, port], [switch_name, neighbor_port]]
+            switch_name = prev_switch
+        return hops
+
+    # hosts and wires
+
+    def _add_test_host(self, index):
+        name = "th%d" % index
+        port_name = "%s-eth0" % name
+        self.test_hosts[name] = {
+            'port-index': {
+                port_name: {
+                    'mac-addr': "0a:00:%02x:%02x:%02x:%02x" % (
+                        (index >> 24) & 0xff, (index >> 16) & 0xff,
+                        (index >> 8) & 0xff, index & 0xff
+                    ),
+                    'ip-addr': "10.%d.%d.%d/8" % (
+                        (index >> 16) & 0xff, (index >> 8) & 0xff, index & 0xff
+                    )
+                }
+            }
+        }
+        return self._connect_host(name, port_name)
+
+    def _add_dut_host(self, index, vlan_id=None):
+        name = "dut%d" % index
+        port_name = "%s-eth0" % name
+        port_data = {'vlan-tagged': False}
+        if vlan_id:
+            port_name = "%s.%d" % (port_name, vlan_id)
+            port_data = {'vlan-tagged': True, 'vlan-id': vlan_id}
+        self.dut_hosts[name] = {'port-index': {port_name: port_data}}
+        return self._connect_host(name, port_name)
+
+    def _connect_host(self, host_name, host_port_name):
+        switch_name = self._next_edge_switch()
+        switch_port_name = self._add_port(switch_name)
+        self.link_list.append([[host_name, host_port_name], [switch_name, switch_port_name]])
+        return [host_name, host_port_name], [switch_name, switch_port_name]
+
+    def _add_wire(self, name, mode, test_host, dut_host):
+        test_host_port, host_edge = test_host
+        dut_host_port, dut_edge = dut_host
+        path = [host_edge]
+        if mode == 'exclusive':
+            path.extend(self._dedicated_path(host_edge[0], dut_edge[0]))
+        else:
+            path.extend(self._shortest_path(host_edge[0], dut_edge[0]))
+        path.append(dut_edge)
+        self.wire_index[name] = collections.OrderedDict([
+            ('mode', mode),
+            ('test-host-port', test_host_port),
+            ('dut-host-port', dut_host_port),
+            ('path', path)
+        ])
+
+    def _setup_wires(self):
+        host_count = 0
+        dut_count = 0
+        for index in xrange(1, self.exclusive_count + 1):
+            host_count += 1
+            dut_count += 1
+            self._add_wire(
+                "exc-wire%d" % index, 'exclusive',
+                self._add_test_host(host_count), self._add_dut_host(dut_count)
+            )
+
+        shared_count = self.wire_count - self.exclusive_count
+        group_count = 0
+        dut_host = None
+        wire_names = []
+        for index in xrange(1, shared_count + 1):
+            if (index - 1) % self.wire_group_size == 0:
+                group_count += 1
+                dut_count += 1
+                # vlan-trunk and vlan-access DUT port alternately
+                vlan_id = 100 + group_count if group_count % 2 else None
+                dut_host = self._add_dut_host(dut_count, vlan_id)
+                wire_names = []
+                self.wire_group_index["wiregroup%d" % group_count] = {
+                    'id': 1000 + group_count,
+                    'wires': wire_names
+                }
+            host_count += 1
+            wire_name = "shd-wire%d" % index
+            self._add_wire(wire_name, 'shared', self._add_test_host(host_count), dut_host)
+            wire_names.append(wire_name)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(
+        description="Generate synthetic node info and wire info"
+    )
+    arg_parser.add_argument('-d', '--dispatchers', type=int, default=4)
+    arg_parser.add_argument(
+        '-f', '--fabric', default='line', choices=SyntheticTopology.FABRIC_SHAPES
+    )
+    arg_parser.add_argument('-w', '--wires', type=int, default=16)
+    arg_parser.add_argument('-e', '--exclusive-ratio', type=float, default=0.25)
+    arg_parser.add_argument('-g', '--wire-group-size', type=int, default=4)
+    arg_parser.add_argument(
+        '-o', '--output-prefix',
+        required=True, type=str, metavar='PREFIX',
+        help="Write PREFIX_nodeinfo.json and PREFIX_wireinfo.json"
+    )
+    args = arg_parser.parse_args()
+
+    topology = SyntheticTopology(
+        args.dispatchers, args.fabric, args.wires,
+        args.exclusive_ratio, args.wire_group_size
+    )
+    topology.check_placement()
+    for suffix, data in [('nodeinfo', topology.node_data()),
+                         ('wireinfo', topology.wire_data())]:
+        with open("%s_%s.json" % (args.output_prefix, suffix), 'w') as data_file:
+            json.dump(data, data_file, indent=2)
@@ -1,15 +1,29 @@
+import collections
 import patch_link
 import patch_error
 
+# hop of wire path in a switch, resolved by mapped node/port entities
+WireHop = collections.namedtuple(
+    'WireHop', ['node', 'dpid', 'inport', 'outport', 'in_port', 'out_port']
+)
+# path analysis of wire: (tuple of NodeLink, tuple of WireHop) for each direction
+WirePathCache = collections.namedtuple(
+    'WirePathCache', ['forward_pairs', 'backward_pairs', 'forward_hops', 'backward_hops']
+)
+
 
 class LogicalWire(object):
     def __init__(self, name, wire_data, ofp_version="OpenFlow10"):
         self.name = name
         self.path = []
         self.ofp_version = ofp_version
+        self._path_cache = None  # WirePathCache, made after setup_wire_entity
         try:
             self.mode = wire_data['mode']
-            self._setup_wire_elms(wire_data['path'])
+            # bandwidth demand [Mbps] (optional, used by placement optimizer)
+            self.bandwidth = wire_data.get('bandwidth', 0)
+            # path is optional: computed by PathComputer if not defined
+            self._setup_wire_elms(wire_data.get('path', []))
             # end points of wire
             self.test_host_elm = patch_link.NodeLinkElement(*wire_data['test-host-port'])
             self.dut_host_elm = patch_link.NodeLinkElement(*wire_data['dut-host-port'])
@@ -21,6 +35,18 @@ class LogicalWire(object):
         for path_elm_data in wire_data:
             self.path.append(patch_link.NodeLinkElement(*path_elm_data))
 
+    def has_path(self):
+        return len(self.path) > 0
+
+    def set_path(self, path):
+        """ set path (list of NodeLinkElement) computed by PathComputer """
+        self.path = path
+        self.invalidate_path_cache()
+
+    def invalidate_path_cache(self):
+        """ path or mapped node/port entities are changed """
+        self._path_cache = None
+
     def setup_wire_entity(self, node_mgr):
         """
         map physical info to logical info
@@ -46,6 +72,43 @@ class LogicalWire(object):
             path_elm.port_entity = node_mgr.node_port_by_name(
                 path_elm.node, path_elm.port
             )
+        # entities are (re)mapped: analyze path again at first use
+        self.invalidate_path_cache()
+
+    def path_cache(self):
+        """
+        hop pairs and resolved hops of both directions,
+        computed once after setup_wire_entity (until path/entities are changed).
+        """
+        if self._path_cache is None:
+            host_to_dut_path = self._host_to_dut_path()
+            forward_pairs = tuple(self._forward_path_port_pair(host_to_dut_path))
+            backward_pairs = tuple(self._forward_path_port_pair(
+                list(reversed(host_to_dut_path))
+            ))
+            self._path_cache = WirePathCache(
+                forward_pairs, backward_pairs,
+                self._resolve_hops(forward_pairs), self._resolve_hops(backward_pairs)
+            )
+        return self._path_cache
+
+    @staticmethod
+    def _resolve_hops(path_elm_pairs):
+        hops = []
+        for path_elm_pair in path_elm_pairs:
+            try:
+                hops.append(WireHop(
+                    path_elm_pair.in_elm.node,
+                    path_elm_pair.in_elm.node_entity.datapath_id,
+                    path_elm_pair.in_elm.port_entity.number,
+                    path_elm_pair.out_elm.port_entity.number,
+                    path_elm_pair.in_elm.port_entity,
+                    path_elm_pair.out_elm.port_entity
+                ))
+            except AttributeError:
+                msg = "Node or Port definition missing in path_elm:%s" % path_elm_pair
+                raise patch_error.PatchDefinitionError(msg)
+        return tuple(hops)
 
     def is_exclusive(self):
         return self.mode == 'exclusive'
@@ -68,18 +131,18 @@ class LogicalWire(object):
     def _generate_wire_rule(self, flow_rule, forward=True):
         """" pre-process to generate wire rule """
         if forward:
-            path_elm_pairs = self.host_to_dut_port_pair()
+            hops = self.host_to_dut_hops()
         else:
-            path_elm_pairs = self.dut_to_host_port_pair()
+            hops = self.dut_to_host_hops()
 
         test_host_port = self.test_host_elm.port_entity
         dut_host_port = self.dut_host_elm.port_entity
         self._generate_wire_rule_by_path(
-            forward, flow_rule, path_elm_pairs, test_host_port, dut_host_port)
+            forward, flow_rule, hops, test_host_port, dut_host_port)
 
     def _generate_wire_rule_by_path(
             self, forward,
-            flow_rule, path_elm_pairs, test_host_port, dut_host_port):
+            flow_rule, hops, test_host_port, dut_host_port):
         pass  # abstract
 
     @staticmethod
@@ -104,9 +167,18 @@ class LogicalWire(object):
             flow_rule[node_name] = [rule]
 
     def host_to_dut_port_pair(self):
-        pass  # abstract
+        return self.path_cache().forward_pairs
 
     def dut_to_host_port_pair(self):
+        return self.path_cache().backward_pairs
+
+    def host_to_dut_hops(self):
+        return self.path_cache().forward_hops
+
+    def dut_to_host_hops(self):
+        return self.path_cache().backward_hops
+
+    def _host_to_dut_path(self):
         pass  # abstract
 
     def dump(self):
@@ -120,89 +192,63 @@ class ExclusiveWire(LogicalWire):
     def __init__(self, name, wire_data, ofp_version):
         super(ExclusiveWire, self).__init__(name, wire_data, ofp_version)
 
-    def host_to_dut_port_pair(self):
-        # exclusive wire has no direction
-        return self._forward_path_port_pair(self.path)
-
-    def dut_to_host_port_pair(self):
+    def _host_to_dut_path(self):
         # exclusive wire has no direction
-        return self._forward_path_port_pair(list(reversed(self.path)))
+        return self.path
 
     def _generate_wire_rule_by_path(
             self, forward,
-            flow_rule, path_elm_pairs, test_host_port, dut_host_port):
-        for path_elm_pair in path_elm_pairs:
-            try:
-                rule = {
-                    # 'dpid': path_elm_pair.in_elm.node,
-                    # 'inport': path_elm_pair.in_elm.port,
-                    # 'outport': path_elm_pair.out_elm.port
-                    'dpid': path_elm_pair.in_elm.node_entity.datapath_id,
-                    'inport': path_elm_pair.in_elm.port_entity.number,
-                    'outport': path_elm_pair.out_elm.port_entity.number,
-                    'priority': 65535
-                }
-                # merge
-                self._merge_flow_rule(path_elm_pair.in_elm.node, flow_rule, rule)
-            except AttributeError as err:
-                msg = "Node or Port definition missing in path_elm:%s" % path_elm_pair
-                raise patch_error.PatchDefinitionError(msg)
+            flow_rule, hops, test_host_port, dut_host_port):
+        for hop in hops:
+            rule = {
+                'dpid': hop.dpid,
+                'inport': hop.inport,
+                'outport': hop.outport,
+                'priority': 65535
+            }
+            # merge
+            self._merge_flow_rule(hop.node, flow_rule, rule)
 
 
 class SharedWire(LogicalWire):
     def __init__(self, name, wire_data, ofp_version):
         super(SharedWire, self).__init__(name, wire_data, ofp_version)
 
-    def host_to_dut_port_pair(self):
-        head_port = self.path[0].port_entity
-        tail_port = self.path[-1].port_entity
-        if head_port.is_host_edge_port() and tail_port.is_dut_edge_port():
-            return self._forward_path_port_pair(self.path)
-        elif head_port.is_dut_edge_port() and tail_port.is_host_edge_port():
-            return self._forward_path_port_pair(list(reversed(self.path)))
-        else:
-            msg = "wire head/tail is same type: dut-edge or host-edge"
-            raise patch_error.PatchDefinitionError(msg)
-
-    def dut_to_host_port_pair(self):
+    def _host_to_dut_path(self):
+        # edge classification: path may be defined from dut-edge
         head_port = self.path[0].port_entity
         tail_port = self.path[-1].port_entity
         if head_port.is_host_edge_port() and tail_port.is_dut_edge_port():
-            return self._forward_path_port_pair(list(reversed(self.path)))
+            return self.path
         elif head_port.is_dut_edge_port() and tail_port.is_host_edge_port():
-            return self._forward_path_port_pair(self.path)
+            return list(reversed(self.path))
         else:
             msg = "wire head/tail is same type: dut-edge or host-edge"
             raise patch_error.PatchDefinitionError(msg)
 
     @staticmethod
-    def __use_vlan(path_elm_pair, dut_host_port, forward):
-        port_entity = path_elm_pair.out_elm.port_entity\
-            if forward else path_elm_pair.in_elm.port_entity
+    def __use_vlan(hop, dut_host_port, forward):
+        port_entity = hop.out_port if forward else hop.in_port
         return port_entity.is_dut_edge_port() and dut_host_port.has_vlan()
 
     def _generate_wire_rule_by_path(
             self, forward,
-            flow_rule, path_elm_pairs, test_host_port, dut_host_port):
+            flow_rule, hops, test_host_port, dut_host_port):
 
         match_eth = 'eth_src' if forward else 'eth_dst'
         host_mac = test_host_port.mac_addr
 
-        for path_elm_pair in path_elm_pairs:
+        for hop in hops:
             rule = {
-                # 'dpid': path_elm_pair.in_elm.node,
-                # 'inport': path_elm_pair.in_elm.port,
-                # 'outport': path_elm_pair.out_elm.port,
-                'dpid': path_elm_pair.in_elm.node_entity.datapath_id,
-                'inport': path_elm_pair.in_elm.port_entity.number,
-                'outport': path_elm_pair.out_elm.port_entity.number,
+                'dpid': hop.dpid,
+                'inport': hop.inport,
+                'outport': hop.outport,
                 match_eth: host_mac,
                 'priority': 32767
             }
 
             # select action at dut-edge by direction: push/pop vlan
-            if self.__use_vlan(path_elm_pair, dut_host_port, forward):
-                # print "## %s, %s, %s" % (path_elm_pair, dut_host_port, forward)
+            if self.__use_vlan(hop, dut_host_port, forward):
                 if forward:
                     if self.ofp_version == "OpenFlow13":
                         rule['push_vlan'] = dut_host_port.vlan_id
@@ -215,4 +261,4 @@ class SharedWire(LogicalWire):
                     rule['vlan_vid'] = dut_host_port.vlan_id
                     rule['pop_vlan'] = "true"
             # merge
-            self._merge_flow_rule(path_elm_pair.in_elm.node, flow_rule, rule)
+            self._merge_flow_rule(hop.node, flow_rule, rule)
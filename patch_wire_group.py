@@ -1,13 +1,16 @@
 import json
+import collections
 import patch_wire
 import patch_error
 
 
 class WireGroup(object):
-    def __init__(self, name, wire_group_data, ofp_version="OpenFlow10"):
+    def __init__(self, name, wire_group_data, ofp_version="OpenFlow10", group_table=False):
         self.name = name
         self.wire_group_data = wire_group_data
         self.ofp_version = ofp_version
+        # use ALL-type group (OF1.3) for broadcast instead of multiple outports
+        self.group_table = group_table
         try:
             self.id = self.wire_group_data['id']
             self.wires = self.wire_group_data['wires']
@@ -23,26 +26,36 @@ class WireGroup(object):
         for wire in self.wires:
             print "  %s" % wire
 
+    def generate_bcast_group(self, dpid, out_ports):
+        """
+        ALL-type group of wire group (group id is same as wire group id).
+        members of wire group are buckets: membership change is a group-mod.
+        """
+        return {
+            'dpid': dpid,
+            'group_id': self.id,
+            'type': 'ALL',
+            'buckets': [{'outport': port} for port in out_ports]
+        }
+
     def generate_bcast_rule_by_wire_group(self, bcast_wire, out_ports):
         # wire group id (use as mpls label)
         wire_group_id = self.id
         # path of broadcast (DUT edge -> host edge)
-        path_elm_pairs = bcast_wire.dut_to_host_port_pair()
+        hops = bcast_wire.dut_to_host_hops()
         # switch: [rules] dictionary
         flow_rule = {}
 
-        for path_elm_pair in path_elm_pairs:
+        for hop in hops:
+            group = None
             rule = {
-                # 'dpid': path_elm_pair.in_elm.node,
-                # 'inport': path_elm_pair.in_elm.port,
-                # 'outport': path_elm_pair.out_elm.port
-                'dpid': path_elm_pair.in_elm.node_entity.datapath_id,
-                'inport': path_elm_pair.in_elm.port_entity.number,
-                'outport': path_elm_pair.out_elm.port_entity.number,
+                'dpid': hop.dpid,
+                'inport': hop.inport,
+                'outport': hop.outport,
                 'eth_dst': 'ff:ff:ff:ff:ff:ff',
                 'priority': 16535
             }
-            if path_elm_pair.in_elm.port_entity.is_dut_edge_port():
+            if hop.in_port.is_dut_edge_port():
                 # at DUT edge switch
                 dut_host_port = bcast_wire.dut_host_elm.port_entity
                 if dut_host_port.has_vlan():
@@ -61,7 +74,16 @@ class WireGroup(object):
                         msg = "OpenFlow version unknown for generation wire flow rule."
                         raise patch_error.PatchDefinitionError(msg)
 
-            elif path_elm_pair.out_elm.port_entity.is_host_edge_port():
+            elif hop.out_port.is_host_edge_port() and self.group_table:
+                # at HOST edge switch: output to group
+                rule.update({
+                    'vlan_vid': wire_group_id,
+                    'pop_vlan': "true",
+                    'group_id': wire_group_id
+                })
+                rule.pop('outport')
+                group = self.generate_bcast_group(rule['dpid'], out_ports)
+            elif hop.out_port.is_host_edge_port():
                 # at HOST edge switch
                 rule.update({
                     'vlan_vid': wire_group_id,
@@ -75,15 +97,26 @@ class WireGroup(object):
                 rule.update({
                     'vlan_vid': wire_group_id
                 })
-            flow_rule[path_elm_pair.in_elm.node] = [rule]
+            if group is None:
+                flow_rule[hop.node] = [rule]
+            else:
+                # group must be installed before rule that refers it
+                flow_rule[hop.node] = [group, rule]
         return flow_rule
 
 
 class WireManager(object):
-    def __init__(self, wire_data):
-        ##################################
-        self.ofp_version = "OpenFlow10"  # TODO: ofp version selection
-        ##################################
+    OFP_VERSIONS = ("OpenFlow10", "OpenFlow13")
+
+    def __init__(self, wire_data, ofp_version="OpenFlow10", group_table=False):
+        if ofp_version not in self.OFP_VERSIONS:
+            msg = "Unknown OpenFlow version:%s" % ofp_version
+            raise patch_error.PatchDefinitionError(msg)
+        if group_table and ofp_version != "OpenFlow13":
+            msg = "Group table (broadcast by group) needs OpenFlow13"
+            raise patch_error.PatchDefinitionError(msg)
+        self.ofp_version = ofp_version
+        self.group_table = group_table
         try:
             self._setup_wire_index(wire_data['wire-index'])
             self._setup_wire_group_index(wire_data['wire-group-index'])
@@ -92,6 +125,14 @@ class WireManager(object):
             raise patch_error.PatchDefinitionError(msg)
         self._setup_exclusive_wires()
 
+    def __getstate__(self):
+        # pickled (topology cache) indexes keep order of wires:
+        # dict rebuilt by unpickling may iterate in other order
+        state = dict(self.__dict__)
+        for name in ('wire_index', 'wire_group_index', 'exclusive_wire_index'):
+            state[name] = collections.OrderedDict(state[name].iteritems())
+        return state
+
     def _setup_wire_index(self, wire_index_data):
         self.wire_index = {}  # all wire
         for name, data in wire_index_data.items():
@@ -110,7 +151,9 @@ class WireManager(object):
     def _setup_wire_group_index(self, wire_group_index_data):
         self.wire_group_index = {}
         for name, data in wire_group_index_data.items():
-            self.wire_group_index[name] = WireGroup(name, data, self.ofp_version)
+            self.wire_group_index[name] = WireGroup(
+                name, data, self.ofp_version, self.group_table
+            )
 
     def wire_by_name(self, wire_name):
         if wire_name in self.wire_index:
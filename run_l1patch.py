@@ -1,8 +1,40 @@
 #!/usr/bin/python
 
+import sys
 import json
 import argparse
 import patch_flowgen
+import patch_profile
+import patch_topocache
+import patch_error
+
+MODES = ['all', 'exclusive', 'shared']
+
+
+def output_arg(value):
+    """ --out MODE=FILE """
+    mode, sep, file_name = value.partition('=')
+    if not sep or mode not in MODES or not file_name:
+        msg = "'%s' must be MODE=FILE (MODE: %s)" % (value, ", ".join(MODES))
+        raise argparse.ArgumentTypeError(msg)
+    return mode, file_name
+
+
+def write_flow_rule(flow_rule_generator, mode, args, out_file):
+    if args.stream:
+        for flow_rule_fragment in flow_rule_generator.iter_flow_rule(mode, args.jobs):
+            with patch_profile.span('serialization'):
+                print >> out_file, json.dumps(flow_rule_fragment)
+            out_file.flush()
+        return
+    if args.optimize:
+        flow_rule, optimizer = flow_rule_generator.optimize_flow_rule(mode, args.jobs)
+        sys.stderr.write(optimizer.report() + "\n")
+    else:
+        flow_rule = flow_rule_generator.generate_flow_rule(mode, args.jobs)
+    with patch_profile.span('serialization'):
+        print >> out_file, json.dumps(flow_rule, indent=2)
+
 
 if __name__ == "__main__":
     # parse options
@@ -21,16 +53,98 @@ if __name__ == "__main__":
         type=str, metavar='JSON',
         help="Logical topology (wire) information file"
     )
-    arg_parser.add_argument(
+    arg_gr_mode = arg_parser.add_mutually_exclusive_group(required=True)
+    arg_gr_mode.add_argument(
         '-m', '--mode',
-        required=True,
-        nargs=1, choices=['all', 'exclusive', 'shared']
+        nargs=1, choices=MODES,
+        help="Output rules of the mode to stdout"
+    )
+    arg_gr_mode.add_argument(
+        '--out',
+        action='append', type=output_arg, metavar='MODE=FILE',
+        help="Write rules of MODE to FILE (repeatable), "
+             "all modes are generated from one loaded topology"
+    )
+    arg_parser.add_argument(
+        '--ofp-version',
+        choices=['OpenFlow10', 'OpenFlow13'], default='OpenFlow10',
+        help="OpenFlow version of switches (default:OpenFlow10)"
+    )
+    arg_parser.add_argument(
+        '--group-table',
+        action="store_true", default=False,
+        help="Broadcast of wire-group by ALL-type group (needs OpenFlow13)"
+    )
+    arg_parser.add_argument(
+        '-o', '--optimize',
+        action="store_true", default=False,
+        help="Merge identical rules and collapse transit rules of a wire-group on inter-switch hops"
+    )
+    arg_parser.add_argument(
+        '-s', '--stream',
+        action="store_true", default=False,
+        help="Output rules wire (wire-group) by wire as newline-delimited json"
+    )
+    arg_parser.add_argument(
+        '-j', '--jobs',
+        type=int, default=1, metavar='N',
+        help="Generate rules by N worker processes (sharded by wire/wire-group, default:1)"
+    )
+    arg_parser.add_argument(
+        '--topology-cache',
+        type=str, metavar='DIR',
+        help="Load node/wire topology (wires mapped to ports) from cache in DIR, "
+             "topology is cached at first run (keyed by sha1 of input files)"
+    )
+    arg_parser.add_argument(
+        '--placement',
+        choices=['check', 'balance'],
+        help="Check capacity of inter-switch links ('max-wires'/'bandwidth' of port), "
+             "'balance' also spreads wires across parallel links. "
+             "Link utilization is reported to stderr"
+    )
+    arg_parser.add_argument(
+        '--timing',
+        type=str, metavar='FILE',
+        help="Write json timing summary (spans and counters) to FILE at exit ('-': stderr)"
+    )
+    arg_parser.add_argument(
+        '--profile',
+        type=str, metavar='FILE',
+        help="Write cProfile stats to FILE at exit"
     )
     args = arg_parser.parse_args()
+    if args.stream and args.optimize:
+        arg_parser.error("--optimize needs whole flow rules, cannot use with --stream")
+    if args.jobs < 1:
+        arg_parser.error("--jobs must be 1 or more")
+    if args.group_table and args.ofp_version != 'OpenFlow13':
+        arg_parser.error("--group-table needs --ofp-version OpenFlow13")
+
+    if args.timing or args.profile:
+        patch_profile.enable_instrument(args.timing, args.profile)
 
     # generate flow rules for OFC REST
-    flow_rule_generator = patch_flowgen.FlowRuleGenerator(
-        args.physical, args.logical
-    )
-    flow_rule = flow_rule_generator.generate_flow_rule(args.mode[0])
-    print json.dumps(flow_rule, indent=2)
+    if args.topology_cache:
+        topology_cache = patch_topocache.TopologyCache(args.topology_cache)
+        flow_rule_generator = topology_cache.load_generator(
+            args.physical, args.logical, args.ofp_version, args.group_table
+        )
+    else:
+        flow_rule_generator = patch_flowgen.FlowRuleGenerator(
+            args.physical, args.logical, args.ofp_version, args.group_table
+        )
+    if args.placement:
+        placement = flow_rule_generator.place_wires(args.placement == 'balance')
+        sys.stderr.write(placement.report() + "\n")
+    if args.out is None:
+        write_flow_rule(flow_rule_generator, args.mode[0], args, sys.stdout)
+    else:
+        for mode, file_name in args.out:
+            try:
+                out_file = open(file_name, 'w')
+            except IOError as err:
+                msg = "Cannot open output file: %s.\n%s" % (file_name, err)
+                raise patch_error.PatchError(msg)
+            with out_file:
+                write_flow_rule(flow_rule_generator, mode, args, out_file)
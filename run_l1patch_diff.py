@@ -0,0 +1,94 @@
+#!/usr/bin/python
+
+import json
+import argparse
+import httplib2
+import patch_flowdiff
+import patch_error
+
+if __name__ == "__main__":
+    # parse options
+    arg_parser = argparse.ArgumentParser(
+        description="Create delta of L1patch Flow Rule (REST json)"
+    )
+    arg_parser.add_argument(
+        '-p', '--physical',
+        required=True,
+        type=str, metavar='JSON',
+        help="Physical topology information file"
+    )
+    arg_parser.add_argument(
+        '-l', '--logical',
+        required=True,
+        type=str, metavar='JSON',
+        help="Logical topology (wire) information file"
+    )
+    arg_parser.add_argument(
+        '-m', '--mode',
+        required=True,
+        nargs=1, choices=['all', 'exclusive', 'shared']
+    )
+    arg_parser.add_argument(
+        '--ofp-version',
+        choices=['OpenFlow10', 'OpenFlow13'], default='OpenFlow10',
+        help="OpenFlow version of switches (default:OpenFlow10)"
+    )
+    arg_parser.add_argument(
+        '--group-table',
+        action="store_true", default=False,
+        help="Broadcast of wire-group by ALL-type group (needs OpenFlow13)"
+    )
+    arg_gr_base = arg_parser.add_mutually_exclusive_group(required=True)
+    arg_gr_base.add_argument(
+        '--base-physical',
+        type=str, metavar='JSON',
+        help="Physical topology information file of current (applied) snapshot"
+    )
+    arg_gr_base.add_argument(
+        '--controller',
+        type=str, metavar='HOST:PORT',
+        help="Compare with flows in OpenFlow Controller (GET /patch/flow), "
+             "flows of other mode than --mode are not compared"
+    )
+    arg_parser.add_argument(
+        '--base-logical',
+        type=str, metavar='JSON',
+        help="Logical topology (wire) information file of current (applied) snapshot"
+    )
+    arg_parser.add_argument(
+        '--remove',
+        action="store_true", default=False,
+        help="Make delta to remove flow rules of the snapshot (-p/-l) "
+             "that are in base (deleted rules are not sent again)"
+    )
+    args = arg_parser.parse_args()
+    if args.group_table and args.ofp_version != 'OpenFlow13':
+        arg_parser.error("--group-table needs --ofp-version OpenFlow13")
+
+    # generate delta flow rules for OFC REST
+    diff_generator = patch_flowdiff.FlowRuleDiffGenerator(
+        args.physical, args.logical, args.mode[0], args.ofp_version, args.group_table
+    )
+    if args.controller:
+        url = "http://" + args.controller + "/patch/flow"
+        response, content = httplib2.Http().request(url, 'GET')
+        if response["status"] != "200":
+            msg = "Cannot get flows from controller: %s" % response["status"]
+            raise patch_error.PatchError(msg)
+        controller_flows = json.loads(content)
+        if args.group_table:
+            # groups are compared with group entries (GET /patch/group)
+            url = "http://" + args.controller + "/patch/group"
+            response, content = httplib2.Http().request(url, 'GET')
+            if response["status"] != "200":
+                msg = "Cannot get groups from controller: %s" % response["status"]
+                raise patch_error.PatchError(msg)
+            controller_flows.extend(json.loads(content))
+        delta = diff_generator.diff_by_controller_flows(controller_flows, args.remove)
+    else:
+        if not args.base_logical:
+            arg_parser.error("--base-logical is required with --base-physical")
+        delta = diff_generator.diff_by_files(
+            args.base_physical, args.base_logical, args.remove
+        )
+    print json.dumps(delta, indent=2)
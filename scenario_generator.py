@@ -1,16 +1,47 @@
+import sys
 import json
 import itertools
 import collections
 import re
 import argparse
+import patch_flowgen
 import scenario_error
 
 
+class HostClassifier(object):
+    """
+    Classify hosts into equivalence classes by wire/wire-group membership.
+    Hosts connected to the same set of wire-groups (and exclusive wires)
+    are treated as equivalent in reachability test.
+    """
+    def __init__(self, wire_mgr):
+        host_members = {}  # host name: set of wire-group/wire name
+        for wire_group_name, wire_group in wire_mgr.wire_group_index.items():
+            for wire_name in wire_group.wires:
+                wire = wire_mgr.wire_by_name(wire_name)
+                host_members.setdefault(wire.test_host_elm.node, set()).add(
+                    ('wire-group', wire_group_name)
+                )
+        for wire_name, wire in wire_mgr.exclusive_wire_index.items():
+            host_members.setdefault(wire.test_host_elm.node, set()).add(
+                ('wire', wire_name)
+            )
+        self.host_class = {}
+        for host_name, members in host_members.items():
+            self.host_class[host_name] = tuple(sorted(members))
+
+    def classify(self, host_name):
+        # host that does not have any wire is a class of itself
+        return self.host_class.get(host_name, (('host', host_name),))
+
+
 class ScenarioGenerator(object):
     PARAM_RE = r"@.+@"
     TASK_RE = r"([a-zA-Z\d\-\_]+)\(([A-Z]+)\)"
+    TASK_LIST_MARK = "@task-list@"  # placeholder of task list in write_scenario()
 
-    def __init__(self, file_name):
+    def __init__(self, file_name, host_classifier=None):
+        self.host_classifier = host_classifier  # reduce tasks if classifier exists
         try:
             scenario_data_file = open(file_name, 'r')
             # use Ordered Dict to keep key order in file
@@ -30,29 +61,101 @@ class ScenarioGenerator(object):
         print json.dumps(self.data, indent=2)
 
     def generate_scenario(self):
+        for scenario, ping_tasks in self.iter_scenario():
+            self.data.append({
+                "scenario": scenario,
+                "task-list": list(ping_tasks)
+            })
+
+    def iter_scenario(self):
+        """
+        :return: iterator of (scenario name, iterator of ping task)
+        """
         for scenario in self.scenarios.keys():
             # print "* Scenario: %s" % scenario
-            scenario_data = {
-                "scenario": scenario,
-                "task-list": []
-            }
-            for task in self.scenarios[scenario].keys():
-                # print "** Task: %s" % task
-                scenario_data["task-list"].extend(
-                    self.generate_task(task, self.scenarios[scenario][task])
-                )
-            self.data.append(scenario_data)
+            yield scenario, self._iter_scenario_task(self.scenarios[scenario])
+
+    def _iter_scenario_task(self, scenario_data):
+        for task in scenario_data.keys():
+            # print "** Task: %s" % task
+            for ping_task in self.generate_task(task, scenario_data[task]):
+                yield ping_task
+
+    def write_scenario(self, out):
+        """
+        write scenario list as json (same as dump() after generate_scenario())
+        incrementally: ping tasks are not kept in memory.
+        """
+        out.write("[")
+        for index, (scenario, ping_tasks) in enumerate(self.iter_scenario()):
+            out.write(", \n  " if index else "\n  ")
+            scenario_json = json.dumps(
+                {"scenario": scenario, "task-list": self.TASK_LIST_MARK}, indent=2
+            ).replace("\n", "\n  ")
+            head, tail = scenario_json.split(json.dumps(self.TASK_LIST_MARK))
+            out.write(head + "[")
+            task_count = 0
+            for task_count, ping_task in enumerate(ping_tasks, 1):
+                out.write(", \n      " if task_count > 1 else "\n      ")
+                out.write(json.dumps(ping_task, indent=2).replace("\n", "\n      "))
+            out.write("\n    ]" if task_count else "]")
+            out.write(tail)
+        out.write("\n]\n" if self.scenarios else "]\n")
 
     def generate_task(self, task, task_data):
+        """
+        :return: iterator of ping task
+        """
+        host_pairs = self._iter_host_pairs(task_data)
+        if self.host_classifier and self._expected_result(task) == 'FAIL':
+            return self._iter_reduced_task(task, host_pairs)
+        return (self._generate_ping_task(task, host1, host2)
+                for host1, host2 in host_pairs)
+
+    def _iter_host_pairs(self, task_data):
         # print "### %s" % task_data
-        task_list = []
         for set1, set2 in itertools.permutations(task_data, 2):
             # print "*** set1:%s, set2:%s" % (set1, set2)
             for prod1, prod2 in itertools.product(set1, set2):
                 prod1_is_param = self._is_param(prod1)
                 if not prod1_is_param:
-                    task_list.append(self._generate_ping_task(task, prod1, prod2))
-        return task_list
+                    yield prod1, prod2
+
+    def _iter_reduced_task(self, task, host_pairs):
+        """
+        Unreachable (FAIL) test between equivalent host classes is done
+        once by representative pair. Reachable (SUCCESS) tasks are not reduced
+        because each of them tests its own wire.
+        Reduction is keyed by ordered class pair (direction of ping):
+        a reversed pair goes through other flow rules (inport and match),
+        it is never covered by a task that covers its counterpart.
+        """
+        # (class of host1, class of host2): [(representative pair, covered pairs)]
+        class_pairs = collections.OrderedDict()
+        for host1, host2 in host_pairs:
+            class_pair = (
+                self.host_classifier.classify(host1),
+                self.host_classifier.classify(host2)
+            )
+            reduced_tasks = class_pairs.setdefault(class_pair, [])
+            for reduced_task in reduced_tasks:
+                if (host2, host1) not in reduced_task[1]:
+                    break
+            else:
+                reduced_task = ((host1, host2), collections.OrderedDict())
+                reduced_tasks.append(reduced_task)
+            reduced_task[1][(host1, host2)] = None  # ordered set
+        for reduced_tasks in class_pairs.values():
+            for (host1, host2), covered_pairs in reduced_tasks:
+                ping_task = self._generate_ping_task(task, host1, host2)
+                ping_task["covers"] = ["%s to %s" % pair for pair in covered_pairs]
+                yield ping_task
+
+    def _expected_result(self, task):
+        match = re.match(self.TASK_RE, task)
+        if match:
+            return match.group(2)
+        return None
 
     def _generate_ping_task(self, task, host1, host2):
         try:
@@ -95,9 +198,18 @@ if __name__ == '__main__':
         type=str, metavar='JSON',
         help="Scenario pattern information file"
     )
+    arg_parser.add_argument(
+        '-l', '--logical',
+        type=str, metavar='JSON',
+        help="Logical topology (wire) information file to reduce FAIL tasks"
+             " between equivalent hosts (hosts in same wire-groups)"
+    )
     args = arg_parser.parse_args()
 
     # generate scenario file by pattern file
-    scenario_gen = ScenarioGenerator(args.file)
-    scenario_gen.generate_scenario()
-    scenario_gen.dump()
+    host_classifier = None
+    if args.logical:
+        wire_mgr = patch_flowgen.FlowRuleGenerator.gen_wire_manager_by_file(args.logical)
+        host_classifier = HostClassifier(wire_mgr)
+    scenario_gen = ScenarioGenerator(args.file, host_classifier)
+    scenario_gen.write_scenario(sys.stdout)
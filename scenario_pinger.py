@@ -2,12 +2,30 @@ import json
 import time
 import re
 import signal
+import collections
 import scenario_result_manager
 import scenario_error
 import scenario_tester
 
 
+class PingTaskState(object):
+    """ state of ping task run in parallel """
+    def __init__(self, index, description, src_host, command, expected_result):
+        self.index = index
+        self.description = description
+        self.src_host = src_host
+        self.command = command
+        self.expected_result = expected_result
+        self.result_detail = ""
+        self.result = None
+        self.retry_count = 0
+        self.retry_interval = 0
+        self.start_after = 0  # time to start (wait for retry interval)
+
+
 class ScenarioPingerBase(scenario_tester.ScenarioTesterBase):
+    MONITOR_TIMEOUT_MS = 10
+
     def __init__(self, testdefs_file_name):
         super(ScenarioPingerBase, self).__init__(testdefs_file_name)
         self._set_ping_test_params()
@@ -49,6 +67,9 @@ class ScenarioPingerBase(scenario_tester.ScenarioTesterBase):
             self.ping_retry_interval = 1  # (sec) default
             if "ping-retry-interval" in params:
                 self.ping_retry_interval = params["ping-retry-interval"]
+            self.ping_concurrency = 1  # (tasks) default: run sequentially
+            if "ping-concurrency" in params:
+                self.ping_concurrency = params["ping-concurrency"]
         except KeyError as err:
             msg = "Cannot find key:%s in test definition 'ping-test-params' section." % err.message
             raise scenario_error.ScenarioTestDefinitionError(msg)
@@ -107,7 +128,19 @@ class ScenarioPingerBase(scenario_tester.ScenarioTesterBase):
             self.logger.info("run task: %s", description)
             self._run_test_check_arp_table(description, host, "FAIL")
 
+    def _make_ping_command(self, dst_host_name, host_dict):
+        command = self.ping_cmd
+        if re.match(r"\d+\.\d+\.\d+\.\d+", dst_host_name):
+            # if match IP address
+            return " ".join([command, dst_host_name])
+        else:
+            return " ".join([command, host_dict[dst_host_name].IP()])
+
     def _run_test_ping_task(self, task_list):
+        if self.ping_concurrency > 1:
+            self._run_test_ping_task_parallel(task_list)
+            return
+
         self._start_sub_scenario("main tasks")
         # convert table to get host instance by its name
         host_dict = {h.name: h for h in self.net.hosts}
@@ -121,16 +154,11 @@ class ScenarioPingerBase(scenario_tester.ScenarioTesterBase):
             expected_result = task["expect"]
             count += 1
 
-            command = self.ping_cmd
             self.logger.info(
                 "[%-3.1f%%/current:%d/total:%d] run task: %s",
                 100.0*count/total, count, total, description
             )
-            if re.match(r"\d+\.\d+\.\d+\.\d+", dst_host_name):
-                # if match IP address
-                command = " ".join([command, dst_host_name])
-            else:
-                command = " ".join([command, host_dict[dst_host_name].IP()])
+            command = self._make_ping_command(dst_host_name, host_dict)
 
             # run at first
             result_detail, result = self._run_ping_at(host_dict[src_host_name], command)
@@ -152,6 +180,82 @@ class ScenarioPingerBase(scenario_tester.ScenarioTesterBase):
                 description, src_host_name, command, expected_result, result, result_detail
             )
 
+    def _run_test_ping_task_parallel(self, task_list):
+        """
+        run ping tasks from different source hosts at the same time.
+        each host runs one command at a time (mininet host shell),
+        results are saved in order of task list after all tasks finished.
+        """
+        self._start_sub_scenario("main tasks")
+        host_dict = {h.name: h for h in self.net.hosts}
+        pending_tasks = collections.deque()
+        for index, task in enumerate(task_list):
+            pending_tasks.append(PingTaskState(
+                index, task['task'], host_dict[task["source"]],
+                self._make_ping_command(task["destination"], host_dict),
+                task["expect"]
+            ))
+        finished_tasks = [None] * len(task_list)
+        running_tasks = collections.OrderedDict()  # source host name: task
+
+        count = 0
+        total = len(task_list)
+        while pending_tasks or running_tasks:
+            self._start_parallel_ping_tasks(pending_tasks, running_tasks)
+            if not running_tasks:
+                # all pending tasks are waiting for retry
+                time.sleep(self.MONITOR_TIMEOUT_MS / 1000.0)
+                continue
+            for host_name, task in running_tasks.items():
+                task.result_detail += task.src_host.monitor(
+                    timeoutms=self.MONITOR_TIMEOUT_MS
+                )
+                if task.src_host.waiting:
+                    continue  # ping is still running
+                del running_tasks[host_name]
+                task.result = self._check_ping_result(task.result_detail)
+                self.logger.info("result: %s (task: %s)", task.result, task.description)
+                if (task.result != task.expected_result
+                        and task.retry_count < self.ping_max_retry):
+                    task.retry_count += 1
+                    task.retry_interval += self.ping_retry_interval
+                    task.start_after = time.time() + task.retry_interval
+                    self.logger.warning(
+                        "task: %s, (retry:%d/%d, after wait %s[sec])",
+                        task.description, task.retry_count, self.ping_max_retry,
+                        task.retry_interval
+                    )
+                    pending_tasks.append(task)
+                    continue
+                count += 1
+                self.logger.info(
+                    "[%-3.1f%%/current:%d/total:%d] finished task: %s",
+                    100.0*count/total, count, total, task.description
+                )
+                finished_tasks[task.index] = task
+
+        # save results (keep order of task list)
+        for task in finished_tasks:
+            self.result_mgr.append_task_result_by(
+                task.description, task.src_host.name, task.command,
+                task.expected_result, task.result, task.result_detail
+            )
+
+    def _start_parallel_ping_tasks(self, pending_tasks, running_tasks):
+        now = time.time()
+        for _ in xrange(len(pending_tasks)):
+            if len(running_tasks) >= self.ping_concurrency:
+                break
+            task = pending_tasks.popleft()
+            host_name = task.src_host.name
+            if host_name in running_tasks or task.start_after > now:
+                pending_tasks.append(task)  # try it later
+                continue
+            self.logger.info("run @`%s`: `%s`", host_name, task.command)
+            task.result_detail = ""
+            task.src_host.sendCmd(task.command)
+            running_tasks[host_name] = task
+
     def _run_ping_at(self, host, command):
         result_detail = self._run_command_at(host, command)
         result = self._check_ping_result(result_detail)
@@ -71,14 +71,21 @@ class ScenarioTesterBase(object):
             # node info
             self._set_node_mgr(params["physical-info-file"])
             # generate flow-rules files
-            gen_exc_wire_flows_cmd = self._make_command(
-                params, "generate-exclusive-wire-flows-command"
-            )
-            gen_shd_wire_flows_cmd = self._make_command(
-                params, "generate-shared-wire-flows-command"
-            )
-            self._exec_command(gen_exc_wire_flows_cmd)
-            self._exec_command(gen_shd_wire_flows_cmd)
+            if "generate-wire-flows-command" in params:
+                # exclusive/shared wire flows by one command (run_l1patch.py --out)
+                gen_wire_flows_cmd = self._make_command(
+                    params, "generate-wire-flows-command"
+                )
+                self._exec_command(gen_wire_flows_cmd)
+            else:
+                gen_exc_wire_flows_cmd = self._make_command(
+                    params, "generate-exclusive-wire-flows-command"
+                )
+                gen_shd_wire_flows_cmd = self._make_command(
+                    params, "generate-shared-wire-flows-command"
+                )
+                self._exec_command(gen_exc_wire_flows_cmd)
+                self._exec_command(gen_shd_wire_flows_cmd)
             # set flow-rules ops command
             self.put_exc_wire_flows_cmd = self._make_command(
                 params, "put-exclusive-wire-flows-command"
@@ -92,6 +99,17 @@ class ScenarioTesterBase(object):
             self.del_shd_wire_flows_cmd = self._make_command(
                 params, "delete-shared-wire-flows-command"
             )
+            # delta commands (run_l1patch_diff.py | patch_ofc_rest_knocker.py -m apply):
+            # send only rules changed from flows in controller (optional)
+            self.apply_exc_wire_flows_cmd = self._make_optional_command(
+                params, "apply-exclusive-wire-flows-command"
+            )
+            self.apply_shd_wire_flows_cmd = self._make_optional_command(
+                params, "apply-shared-wire-flows-command"
+            )
+            self.remove_shd_wire_flows_cmd = self._make_optional_command(
+                params, "remove-shared-wire-flows-command"
+            )
         except KeyError as err:
             msg = "Cannot find key:%s in test definition 'l1patch-defs' section." % err.message
             raise scenario_error.ScenarioTestDefinitionError(msg)
@@ -121,6 +139,12 @@ class ScenarioTesterBase(object):
             cmd = cmd.replace(replacement, param_val)
         return cmd
 
+    @classmethod
+    def _make_optional_command(cls, data, cmd_key):
+        if cmd_key not in data:
+            return None
+        return cls._make_command(data, cmd_key)
+
     def _exec_command(self, cmd):
         self.logger.info("exec command: %s", cmd)
         subprocess.check_call(cmd, shell=True)
@@ -169,16 +193,28 @@ class ScenarioTesterBase(object):
         time.sleep(1)
         # delete only shared (mininet-hosts) wire to continue test
         # self._exec_command(self.del_exc_wire_flows_cmd)
-        self.logger.info("delete shared-wire-flow-rules")
-        self._exec_command(self.del_shd_wire_flows_cmd)
+        if self.remove_shd_wire_flows_cmd:
+            self.logger.info("delete shared-wire-flow-rules (delta)")
+            self._exec_command(self.remove_shd_wire_flows_cmd)
+        else:
+            self.logger.info("delete shared-wire-flow-rules")
+            self._exec_command(self.del_shd_wire_flows_cmd)
 
     def _put_layer1_flow_rules(self):
-        self.logger.info("put exclusive-wire-flow-rules")
-        self._exec_command(self.put_exc_wire_flows_cmd)
+        if self.apply_exc_wire_flows_cmd:
+            self.logger.info("apply exclusive-wire-flow-rules (delta)")
+            self._exec_command(self.apply_exc_wire_flows_cmd)
+        else:
+            self.logger.info("put exclusive-wire-flow-rules")
+            self._exec_command(self.put_exc_wire_flows_cmd)
 
     def _put_layer2_flow_rules(self):
-        self.logger.info("put shared-wire-flow-rules")
-        self._exec_command(self.put_shd_wire_flows_cmd)
+        if self.apply_shd_wire_flows_cmd:
+            self.logger.info("apply shared-wire-flow-rules (delta)")
+            self._exec_command(self.apply_shd_wire_flows_cmd)
+        else:
+            self.logger.info("put shared-wire-flow-rules")
+            self._exec_command(self.put_shd_wire_flows_cmd)
 
     def _add_external_nic(self, mn_switch):
         for interface in self.mn_ext_intfs:
@@ -0,0 +1,120 @@
+import unittest
+import patch_flowdiff
+import patch_ofc_flowstore
+
+EXCLUSIVE = patch_ofc_flowstore.EXCLUSIVE_PRIORITY
+SHARED = 32767
+
+
+def _shared_rule(inport, eth_src, outport):
+    return {'dpid': 1, 'inport': inport, 'priority': SHARED,
+            'eth_src': eth_src, 'outport': outport}
+
+
+def _exclusive_rule(inport, outport):
+    return {'dpid': 1, 'inport': inport, 'priority': EXCLUSIVE, 'outport': outport}
+
+
+def _group(group_id, outports):
+    return {'dpid': 1, 'group_id': group_id, 'type': 'ALL',
+            'buckets': [{'outport': port} for port in outports]}
+
+
+class TestFlowRuleDiff(unittest.TestCase):
+    def setUp(self):
+        self.shared_rule = _shared_rule(1, '0a:00:00:00:00:01', 2)
+        self.exclusive_rule = _exclusive_rule(3, 4)
+        self.group = _group(5, [6, 7])
+        self.base = {'s1': [self.shared_rule, self.exclusive_rule, self.group]}
+
+    def _diff(self, target):
+        return patch_flowdiff.FlowRuleDiff(self.base, target).diff()
+
+    def test_same(self):
+        target = {'s1': [dict(rule) for rule in self.base['s1']]}
+        self.assertEqual(self._diff(target), {'delete': {}, 'put': {}})
+
+    def test_added(self):
+        added_rule = _shared_rule(1, '0a:00:00:00:00:02', 2)
+        target = {'s1': self.base['s1'] + [added_rule]}
+        self.assertEqual(self._diff(target), {'delete': {}, 'put': {'s1': [added_rule]}})
+
+    def test_removed(self):
+        target = {'s1': [self.shared_rule, self.group]}
+        self.assertEqual(self._diff(target),
+                         {'delete': {'s1': [self.exclusive_rule]}, 'put': {}})
+
+    def test_changed_shared(self):
+        # put only: flow-mod ADD overwrites the flow entry
+        changed_rule = _shared_rule(1, '0a:00:00:00:00:01', 8)
+        target = {'s1': [changed_rule, self.exclusive_rule, self.group]}
+        self.assertEqual(self._diff(target), {'delete': {}, 'put': {'s1': [changed_rule]}})
+
+    def test_changed_exclusive(self):
+        # deleted at first: OFC rejects the put while old rule holds the port
+        changed_rule = _exclusive_rule(3, 8)
+        target = {'s1': [self.shared_rule, changed_rule, self.group]}
+        self.assertEqual(self._diff(target), {
+            'delete': {'s1': [self.exclusive_rule]}, 'put': {'s1': [changed_rule]}
+        })
+
+    def test_groups(self):
+        changed_group = _group(5, [6, 7, 8])
+        added_group = _group(9, [6])
+        target = {'s1': [self.shared_rule, self.exclusive_rule, changed_group, added_group]}
+        # changed buckets are modified without delete
+        self.assertEqual(self._diff(target), {
+            'delete': {}, 'put': {'s1': [changed_group, added_group]}
+        })
+        target = {'s1': [self.shared_rule, self.exclusive_rule]}
+        self.assertEqual(self._diff(target), {'delete': {'s1': [self.group]}, 'put': {}})
+
+    def test_moved_dispatcher(self):
+        # rule is identified by match key, not by dispatcher
+        target = {'s1': [self.shared_rule, self.group], 's2': [self.exclusive_rule]}
+        self.assertEqual(self._diff(target), {'delete': {}, 'put': {}})
+
+    def test_removal(self):
+        removed_rule = _shared_rule(1, '0a:00:00:00:00:02', 2)
+        target = {'s1': [self.shared_rule, removed_rule, self.group]}
+        removal = patch_flowdiff.FlowRuleDiff(self.base, target).removal()
+        # rules not in base are not deleted again
+        self.assertEqual(removal, {'delete': {'s1': [self.shared_rule, self.group]}, 'put': {}})
+
+
+class TestFlowRuleDiffGenerator(unittest.TestCase):
+    def setUp(self):
+        self.diff_generator = patch_flowdiff.FlowRuleDiffGenerator(
+            'nodeinfo_topo2.json', 'wireinfo_topo2.json', 'shared'
+        )
+
+    def _controller_flows(self):
+        return [rule for rules in self.diff_generator.flow_rule.values() for rule in rules]
+
+    def test_same_snapshot(self):
+        delta = self.diff_generator.diff_by_files('nodeinfo_topo2.json', 'wireinfo_topo2.json')
+        self.assertEqual(delta, {'delete': {}, 'put': {}})
+
+    def test_controller_flows(self):
+        controller_flows = self._controller_flows()
+        exclusive_flow = _exclusive_rule(3, 4)
+        # flows of other mode are not compared
+        delta = self.diff_generator.diff_by_controller_flows(controller_flows + [exclusive_flow])
+        self.assertEqual(delta, {'delete': {}, 'put': {}})
+        # missing flow is put
+        delta = self.diff_generator.diff_by_controller_flows(controller_flows[1:])
+        self.assertEqual(delta['delete'], {})
+        self.assertEqual(delta['put'].values(), [controller_flows[:1]])
+
+    def test_removal_by_controller_flows(self):
+        controller_flows = self._controller_flows()
+        delta = self.diff_generator.diff_by_controller_flows(controller_flows[1:], removal=True)
+        self.assertEqual(delta['put'], {})
+        self.assertEqual(
+            sorted(rule for rules in delta['delete'].values() for rule in rules),
+            sorted(controller_flows[1:])
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
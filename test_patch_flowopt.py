@@ -0,0 +1,85 @@
+import json
+import unittest
+import patch_node
+import patch_flowgen
+import patch_flowopt
+
+
+def _transit_rule(**match):
+    # transit rule of s2 (topo2): inter-switch port 1 -> 3
+    rule = {'dpid': 2, 'inport': 1, 'outport': 3, 'priority': 32767}
+    rule.update(match)
+    return rule
+
+
+class TestFlowRuleOptimizer(unittest.TestCase):
+    def setUp(self):
+        with open('nodeinfo_topo2.json') as node_data_file:
+            node_mgr = patch_node.NodeManager(json.load(node_data_file))
+        self.optimizer = patch_flowopt.FlowRuleOptimizer(node_mgr)
+
+    def test_collapse_rules_of_wire_group(self):
+        wire_group = {'s2': [
+            _transit_rule(eth_src='0a:00:00:00:00:01'),
+            _transit_rule(eth_src='0a:00:00:00:00:02')
+        ]}
+        flow_rule = self.optimizer.optimize([wire_group])
+        self.assertEqual(flow_rule, {'s2': [_transit_rule()]})
+        self.assertEqual(self.optimizer.collapsed_count, 1)
+
+    def test_not_collapse_rules_of_wire_groups_on_same_inport(self):
+        wire_group1 = {'s2': [
+            _transit_rule(eth_src='0a:00:00:00:00:01'),
+            _transit_rule(eth_src='0a:00:00:00:00:02')
+        ]}
+        wire_group2 = {'s2': [
+            _transit_rule(eth_src='0a:00:00:00:00:03'),
+            _transit_rule(eth_src='0a:00:00:00:00:04')
+        ]}
+        flow_rule = self.optimizer.optimize([wire_group1, wire_group2])
+        self.assertEqual(flow_rule, {'s2': wire_group1['s2'] + wire_group2['s2']})
+        self.assertEqual(self.optimizer.collapsed_count, 0)
+
+    def test_collapse_keeps_distinguishing_match(self):
+        wire_group1 = {'s2': [
+            _transit_rule(eth_src='0a:00:00:00:00:01', vlan_vid=101),
+            _transit_rule(eth_src='0a:00:00:00:00:02', vlan_vid=101)
+        ]}
+        wire_group2 = {'s2': [
+            _transit_rule(eth_src='0a:00:00:00:00:03', vlan_vid=102)
+        ]}
+        flow_rule = self.optimizer.optimize([wire_group1, wire_group2])
+        self.assertEqual(
+            flow_rule, {'s2': [_transit_rule(vlan_vid=101)] + wire_group2['s2']}
+        )
+
+    def test_merge_identical_rules(self):
+        rule = _transit_rule(eth_dst='ff:ff:ff:ff:ff:ff')
+        flow_rule = self.optimizer.optimize([{'s2': [rule]}, {'s2': [dict(rule)]}])
+        self.assertEqual(flow_rule, {'s2': [rule]})
+        self.assertEqual(self.optimizer.merged_count, 1)
+        self.assertEqual(self.optimizer.rule_counts, (2, 1))
+
+    def test_shared_wire_groups_of_topo2(self):
+        # wire-groups of topo2 share inter-switch ports of s2
+        flow_rule_generator = patch_flowgen.FlowRuleGenerator(
+            'nodeinfo_topo2.json', 'wireinfo_topo2.json'
+        )
+        flow_rule = flow_rule_generator.generate_flow_rule('shared')
+        optimized_flow_rule, optimizer = flow_rule_generator.optimize_flow_rule('shared')
+        self.assertEqual(optimized_flow_rule, flow_rule)
+        self.assertEqual(optimizer.saved_entries(), 0)
+
+    def test_count_switch_entries(self):
+        flow_rule = {'s1': [
+            {'dpid': 1, 'inport': 1, 'outport': 2, 'pop_vlan': True},
+            {'dpid': 1, 'inport': 2, 'outport': 1},
+            {'dpid': 1, 'group_id': 1, 'buckets': [{'outport': 1}]}
+        ]}
+        self.assertEqual(patch_flowopt.count_flow_rule_entries(flow_rule), 3)
+        self.assertEqual(patch_flowopt.count_switch_entries(flow_rule, "OpenFlow10"), 2)
+        self.assertEqual(patch_flowopt.count_switch_entries(flow_rule, "OpenFlow13"), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import json
+import unittest
+import patch_ofc_decoder
+import patch_ofc_error
+
+
+class TestPatchFlowRequest(unittest.TestCase):
+    def assertInvalid(self, flow):
+        with self.assertRaises(patch_ofc_error.PatchOfcRestError):
+            patch_ofc_decoder.PatchFlowRequest.from_flow(flow)
+
+    def test_valid_flow(self):
+        flow = {'dpid': 1, 'inport': 2, 'outport': 3, 'priority': 32767,
+                'eth_dst': '0a:00:00:00:00:01', 'vlan_vid': 200, 'pop_vlan': 'true'}
+        flow_req = patch_ofc_decoder.PatchFlowRequest.from_flow(flow)
+        self.assertEqual((flow_req.dpid, flow_req.inport, flow_req.outport), (1, 2, 3))
+        self.assertIs(flow_req.pop_vlan, True)
+        self.assertIsNone(flow_req.outports)
+        self.assertEqual(flow_req.keys, frozenset(
+            ['dpid', 'inport', 'outport', 'priority', 'eth_dst', 'vlan_vid', 'pop_vlan']
+        ))
+        self.assertIs(flow_req.flow, flow)
+
+    def test_unknown_key(self):
+        self.assertInvalid({'dpid': 1, 'inport': 2, 'outport': 3, 'in_port': 2})
+
+    def test_type_error(self):
+        for key, value in [('inport', '2'), ('inport', True), ('inport', -1),
+                           ('vlan_vid', 0x2000), ('eth_src', '0a:00:00:00:00'),
+                           ('pop_vlan', 'yes'), ('outports', []), ('outports', [3, '4']),
+                           ('dpid', 1.0)]:
+            flow = {'dpid': 1, 'inport': 2, 'outport': 3}
+            flow[key] = value
+            self.assertInvalid(flow)
+
+    def test_missing_key(self):
+        self.assertInvalid({'dpid': 1, 'outport': 3})
+        self.assertInvalid({'inport': 2, 'outport': 3})
+        self.assertInvalid({'dpid': 1, 'inport': 2})
+        self.assertInvalid([{'dpid': 1, 'inport': 2, 'outport': 3}])
+
+
+class TestDecoder(unittest.TestCase):
+    def test_decode_flow(self):
+        flow_req = patch_ofc_decoder.decode_flow('{"dpid": 1, "inport": 2, "outports": [3, 4]}')
+        self.assertEqual(flow_req.outports, [3, 4])
+
+    def test_decode_error(self):
+        for body in ['{"dpid": 1, "inport": 2', '{"dpid": 1, "inport": 2, "outport": "3"}']:
+            with self.assertRaises(patch_ofc_error.PatchOfcDecodeError):
+                patch_ofc_decoder.decode_flow(body)
+
+    def test_hostile_string_is_not_evaluated(self):
+        # python expressions in body were evaluated by eval()
+        bodies = [
+            "__import__('patch_ofc_decoder').__dict__.update(EVALUATED=True)",
+            '{"dpid": 1, "inport": 2, '
+            '"outport": "__import__(\'patch_ofc_decoder\').__dict__.update(EVALUATED=True)"}',
+            "{'dpid': 1, 'inport': 2, 'outport': 3}"
+        ]
+        for body in bodies:
+            with self.assertRaises(patch_ofc_error.PatchOfcDecodeError):
+                patch_ofc_decoder.decode_flow(body)
+            with self.assertRaises(patch_ofc_error.PatchOfcDecodeError):
+                patch_ofc_decoder.decode_flow_document(body)
+            with self.assertRaises(patch_ofc_error.PatchOfcDecodeError):
+                patch_ofc_decoder.decode_group(body)
+        self.assertFalse(hasattr(patch_ofc_decoder, 'EVALUATED'))
+
+    def test_decode_flow_document(self):
+        document = {'s1': [{'dpid': 1, 'inport': 2, 'outport': 3}],
+                    's2': [{'dpid': 2, 'inport': 1, 'outport': 2}]}
+        decoded = patch_ofc_decoder.decode_flow_document(json.dumps(document))
+        self.assertEqual(sorted(decoded.keys()), ['s1', 's2'])
+        self.assertEqual(decoded['s2'][0].dpid, 2)
+
+    def test_invalid_flow_in_document(self):
+        document = {'s1': [{'dpid': 1, 'inport': 2, 'outport': 3},
+                           {'dpid': 1, 'inport': 2, 'outport': 3, 'unknown': 1}],
+                    's2': [{'dpid': 2, 'inport': 1, 'outport': 2}]}
+        with self.assertRaises(patch_ofc_error.PatchOfcDecodeError) as context:
+            patch_ofc_decoder.decode_flow_document(json.dumps(document))
+        results = context.exception.to_dict()
+        self.assertEqual([result['status'] for result in results['s1']], [424, 400])
+        self.assertEqual([result['status'] for result in results['s2']], [424])
+        self.assertEqual(results['s1'][1]['dpid'], 1)
+
+    def test_invalid_document(self):
+        for body in ['[]', '{"s1": {"dpid": 1}}']:
+            with self.assertRaises(patch_ofc_error.PatchOfcDecodeError):
+                patch_ofc_decoder.decode_flow_document(body)
+
+    def test_decode_group(self):
+        group = {'dpid': 1, 'group_id': 101, 'type': 'ALL',
+                 'buckets': [{'outport': 3}, {'outport': 4}]}
+        self.assertEqual(patch_ofc_decoder.decode_group(json.dumps(group)), group)
+
+    def test_invalid_group(self):
+        valid_group = {'dpid': 1, 'group_id': 101, 'buckets': [{'outport': 3}]}
+        for key, value in [('type', 'ANY'), ('buckets', []), ('buckets', [{'port': 3}]),
+                           ('buckets', [{'outport': '3'}]), ('group_id', 0xffffffff),
+                           ('unknown', 1)]:
+            group = dict(valid_group)
+            group[key] = value
+            with self.assertRaises(patch_ofc_error.PatchOfcDecodeError):
+                patch_ofc_decoder.decode_group(json.dumps(group))
+        group = dict(valid_group)
+        del group['buckets']
+        with self.assertRaises(patch_ofc_error.PatchOfcDecodeError):
+            patch_ofc_decoder.decode_group(json.dumps(group))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import json
+import itertools
+import unittest
+from ryu.ofproto import ofproto_v1_0
+from ryu.ofproto import ofproto_v1_2
+from ryu.ofproto import ofproto_v1_3
+import patch_ofc_flowbuilder
+import patch_ofc_decoder
+import patch_ofc_error
+
+# optional keys of REST flow request and a valid value of each
+OPTIONAL_VALUES = (
+    ('priority', 100),
+    ('eth_src', '0a:00:00:00:00:01'),
+    ('eth_dst', 'ff:ff:ff:ff:ff:ff'),
+    ('vlan_vid', 101),
+    ('mpls_label', 201),
+    ('push_vlan', 301),
+    ('pop_vlan', True),
+    ('set_vlan', 401),
+    ('push_mpls', 501),
+    ('pop_mpls', True)
+)
+OUTPUT_ACTIONS = (
+    {'outport': 3},
+    {'outports': [3, 4]},
+    {'group_id': 101}
+)
+OFP_VERSIONS = (
+    ofproto_v1_0.OFP_VERSION, ofproto_v1_2.OFP_VERSION, ofproto_v1_3.OFP_VERSION
+)
+
+
+class _Ofproto(object):
+    def __init__(self, ofp_version):
+        self.OFP_VERSION = ofp_version
+
+
+class _Datapath(object):
+    def __init__(self, ofp_version):
+        self.ofproto = _Ofproto(ofp_version)
+
+
+def _build(builder, dp, flow_req):
+    """ :return: flow rules (sorted json) or error """
+    try:
+        return json.dumps(builder(dp, flow_req), sort_keys=True)
+    except (patch_ofc_error.PatchOfcError, AttributeError) as err:
+        # AttributeError: action not supported by FlowRule (e.g. MPLS of OF1.0)
+        return type(err), str(err)
+
+
+class TestCompiledFlowRuleBuilder(unittest.TestCase):
+    def test_same_rules_as_flow_rule_builder(self):
+        # all combinations of optional keys, output actions and ofp versions
+        compiled_builder = patch_ofc_flowbuilder.CompiledFlowRuleBuilder()
+        count = 0
+        for ofp_version in OFP_VERSIONS:
+            dp = _Datapath(ofp_version)
+            for output_action in OUTPUT_ACTIONS:
+                for flags in itertools.product((False, True), repeat=len(OPTIONAL_VALUES)):
+                    flow = {'dpid': 1, 'inport': 2}
+                    flow.update(output_action)
+                    flow.update(item for item, flag in zip(OPTIONAL_VALUES, flags) if flag)
+                    flow_req = patch_ofc_decoder.PatchFlowRequest.from_flow(flow)
+                    expected = _build(
+                        lambda dp, req: patch_ofc_flowbuilder.FlowRuleBuilder(dp, req).build_flow(),
+                        dp, flow_req
+                    )
+                    # build twice: template is made at first, then cached
+                    for i in range(2):
+                        self.assertEqual(
+                            expected, _build(compiled_builder.build_flow, dp, flow_req), flow
+                        )
+                    count += 1
+        self.assertEqual(count, 9216)
+
+    def test_template_is_cached(self):
+        compiled_builder = patch_ofc_flowbuilder.CompiledFlowRuleBuilder()
+        dp = _Datapath(ofproto_v1_3.OFP_VERSION)
+        for inport in range(1, 4):
+            flow_req = patch_ofc_decoder.PatchFlowRequest.from_flow(
+                {'dpid': 1, 'inport': inport, 'outport': 9}
+            )
+            rules = compiled_builder.build_flow(dp, flow_req)
+            self.assertEqual(rules[0]['match']['in_port'], inport)
+        self.assertEqual(compiled_builder.miss_count, 1)
+        self.assertEqual(compiled_builder.hit_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
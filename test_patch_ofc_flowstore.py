@@ -0,0 +1,192 @@
+import json
+import unittest
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+import patch_ofc
+import patch_ofc_decoder
+import patch_ofc_flowstore
+import patch_ofc_error
+
+EXCLUSIVE = patch_ofc_flowstore.EXCLUSIVE_PRIORITY
+SHARED = 32767
+
+
+def _flow(inport, priority=SHARED, **kwargs):
+    flow = {'dpid': 1, 'inport': inport, 'priority': priority}
+    flow.update(kwargs)
+    return flow
+
+
+class TestPatchFlowStore(unittest.TestCase):
+    def setUp(self):
+        self.store = patch_ofc_flowstore.PatchFlowStore()
+
+    def assertConflict(self, flow, direction, holder):
+        with self.assertRaises(patch_ofc_error.PatchOfcConflictError) as context:
+            self.store.check_conflict(flow)
+        self.assertEqual(context.exception.direction, direction)
+        self.assertEqual(context.exception.holder, holder)
+
+    def test_shared_flow_on_exclusive_inport(self):
+        exclusive_flow = _flow(1, EXCLUSIVE, outport=2)
+        self.store.add(exclusive_flow)
+        self.assertConflict(
+            _flow(1, eth_src='0a:00:00:00:00:01', outport=3), 'inport', exclusive_flow
+        )
+
+    def test_exclusive_flow_on_shared_outport(self):
+        shared_flow = _flow(3, eth_src='0a:00:00:00:00:01', outport=2)
+        self.store.add(shared_flow)
+        self.assertConflict(_flow(1, EXCLUSIVE, outport=2), 'outport', shared_flow)
+
+    def test_shared_flows_share_ports(self):
+        self.store.add(_flow(1, eth_src='0a:00:00:00:00:01', outport=2))
+        self.store.check_conflict(_flow(1, eth_src='0a:00:00:00:00:02', outport=2))
+
+    def test_replace_same_flow(self):
+        # same match and same actions: put again (replace)
+        self.store.add(_flow(1, EXCLUSIVE, outport=2))
+        self.store.check_conflict(_flow(1, EXCLUSIVE, outport=2))
+
+    def test_exclusive_flow_of_other_wire(self):
+        # same match but other actions: flow of other wire
+        exclusive_flow = _flow(1, EXCLUSIVE, outport=2)
+        self.store.add(exclusive_flow)
+        self.assertConflict(_flow(1, EXCLUSIVE, outport=3), 'inport', exclusive_flow)
+
+    def test_release_after_remove(self):
+        exclusive_flow = _flow(1, EXCLUSIVE, outport=2)
+        self.store.add(exclusive_flow)
+        self.store.remove(exclusive_flow)
+        self.store.check_conflict(_flow(1, eth_src='0a:00:00:00:00:01', outport=2))
+        self.assertEqual(self.store.resources.inports, {})
+        self.assertEqual(self.store.resources.outports, {})
+
+    def test_conflict_in_document(self):
+        exclusive_flow = _flow(1, EXCLUSIVE, outport=2)
+        shared_flow = _flow(1, eth_src='0a:00:00:00:00:01', outport=3)
+        conflicts = self.store.check_conflicts([exclusive_flow, shared_flow])
+        self.assertEqual([flow for flow, err in conflicts], [shared_flow])
+        self.assertEqual(conflicts[0][1].holder, exclusive_flow)
+        # temporary reservations are rolled back
+        self.assertEqual(self.store.resources.inports, {})
+        self.assertEqual(self.store.resources.outports, {})
+        self.store.check_conflict(shared_flow)
+
+    def test_replace_in_document(self):
+        exclusive_flow = _flow(1, EXCLUSIVE, outport=2)
+        self.store.add(exclusive_flow)
+        conflicts = self.store.check_conflicts([
+            _flow(1, EXCLUSIVE, outport=2), _flow(3, eth_src='0a:00:00:00:00:01', outport=4)
+        ])
+        self.assertEqual(conflicts, [])
+        # stored flow keeps its reservation
+        self.assertConflict(_flow(1, eth_src='0a:00:00:00:00:02', outport=3),
+                            'inport', exclusive_flow)
+
+    def test_group_outports(self):
+        group = {'dpid': 1, 'group_id': 5, 'buckets': [{'outport': 2}, {'outport': 3}]}
+        self.store.set_group(group)
+        group_flow = _flow(1, EXCLUSIVE, group_id=5)
+        self.store.add(group_flow)
+        self.assertConflict(_flow(4, eth_src='0a:00:00:00:00:01', outport=3),
+                            'outport', group_flow)
+        self.store.remove_group(group)
+        self.store.check_conflict(_flow(4, eth_src='0a:00:00:00:00:01', outport=3))
+
+    def test_group_change_conflict(self):
+        self.store.set_group({'dpid': 1, 'group_id': 5, 'buckets': [{'outport': 2}]})
+        self.store.add(_flow(1, EXCLUSIVE, group_id=5))
+        self.store.add(_flow(4, eth_src='0a:00:00:00:00:01', outport=3))
+        changed_group = {'dpid': 1, 'group_id': 5, 'buckets': [{'outport': 2}, {'outport': 3}]}
+        with self.assertRaises(patch_ofc_error.PatchOfcConflictError):
+            self.store.check_group_conflict(changed_group)
+        # outports of group are not changed by check
+        self.assertEqual(self.store.resources.group_ports[(1, 5)], [2])
+
+
+class _Datapath(object):
+    def __init__(self, dpid):
+        self.id = dpid
+        self.ofproto = ofproto_v1_3
+        self.ofproto_parser = ofproto_v1_3_parser
+        self.xid = 0
+        self.sent = []
+
+    def set_xid(self, msg):
+        self.xid += 1
+        msg.xid = self.xid
+
+    def send_msg(self, msg):
+        if msg.xid is None:
+            self.set_xid(msg)
+        self.sent.append(msg)
+
+
+class _DPSet(object):
+    def __init__(self, datapaths):
+        self.datapaths = dict((dp.id, dp) for dp in datapaths)
+
+    def get(self, dpid):
+        return self.datapaths.get(dpid)
+
+    def get_all(self):
+        return self.datapaths.items()
+
+
+class _WSGIApplication(object):
+    def register(self, controller, data):
+        pass
+
+
+class TestPatchPanelConflict(unittest.TestCase):
+    def setUp(self):
+        patch_ofc.CONF.set_override('patch_db', '')  # in memory only
+        self.patch_app = patch_ofc.PatchPanel(
+            dpset=_DPSet([_Datapath(1)]), wsgi=_WSGIApplication()
+        )
+
+    @staticmethod
+    def _request(flow):
+        return patch_ofc_decoder.PatchFlowRequest.from_flow(flow)
+
+    def test_conflict_response(self):
+        exclusive_flow = _flow(1, EXCLUSIVE, outport=2)
+        self.patch_app.add_patch_flow(self._request(exclusive_flow))
+        response = self.patch_app.add_patch_flow(
+            self._request(_flow(1, eth_src='0a:00:00:00:00:01', outport=3))
+        )
+        self.assertEqual(response.status_int, 409)
+        conflict = json.loads(response.body)
+        self.assertEqual(conflict['direction'], 'inport')
+        self.assertEqual(conflict['holder'], exclusive_flow)
+        self.assertEqual(list(self.patch_app.patch_flows), [exclusive_flow])
+
+    def test_conflict_in_document_response(self):
+        response = self.patch_app.add_patch_flows({'s1': [
+            self._request(_flow(3, eth_src='0a:00:00:00:00:01', outport=4)),
+            self._request(_flow(1, EXCLUSIVE, outport=2)),
+            self._request(_flow(1, eth_src='0a:00:00:00:00:01', outport=3))
+        ]})
+        self.assertEqual(response.status_int, 409)
+        results = json.loads(response.body)
+        self.assertEqual([result['status'] for result in results['s1']], [424, 424, 409])
+        # nothing is stored
+        self.assertEqual(len(self.patch_app.patch_flows), 0)
+
+    def test_accepted_response(self):
+        # single flow API answers 200 when flow-mods are queued (as before job tracking)
+        response = self.patch_app.add_patch_flow(self._request(_flow(1, EXCLUSIVE, outport=2)))
+        self.assertEqual(response.status_int, 200)
+        self.assertIn('Location', response.headers)
+        # bulk API reports queued rules: not confirmed by barrier reply yet
+        response = self.patch_app.add_patch_flows({'s1': [
+            self._request(_flow(3, eth_src='0a:00:00:00:00:01', outport=4))
+        ]})
+        self.assertEqual(response.status_int, 202)
+        results = json.loads(response.body)
+        self.assertEqual([result['status'] for result in results['s1']], [202])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+import os
+import shutil
+import tempfile
+import unittest
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+import patch_ofc
+import patch_ofc_decoder
+import patch_ofc_intentdb
+import patch_ofc_flowstore
+import patch_ofc_error
+
+EXCLUSIVE = patch_ofc_flowstore.EXCLUSIVE_PRIORITY
+SHARED = 32767
+
+
+class TestPatchIntentDB(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_file_name = os.path.join(self.temp_dir, 'patch_flows.db')
+        self.intent_db = patch_ofc_intentdb.PatchIntentDB(self.db_file_name)
+        self.exclusive_flow = {'dpid': 1, 'inport': 1, 'outport': 2, 'priority': EXCLUSIVE}
+        self.shared_flow = {'dpid': 1, 'inport': 3, 'outport': 4, 'priority': SHARED,
+                            'eth_src': '0a:00:00:00:00:01'}
+        self.group_flow = {'dpid': 2, 'inport': 1, 'group_id': 5, 'priority': SHARED,
+                           'eth_dst': 'ff:ff:ff:ff:ff:ff'}
+        self.group = {'dpid': 2, 'group_id': 5, 'type': 'ALL',
+                      'buckets': [{'outport': 2}, {'outport': 3}]}
+
+    def tearDown(self):
+        self.intent_db.close()
+        shutil.rmtree(self.temp_dir)
+
+    def _reopen(self):
+        self.intent_db.close()
+        self.intent_db = patch_ofc_intentdb.PatchIntentDB(self.db_file_name)
+
+    def test_reload(self):
+        self.intent_db.apply([
+            ('put', self.group), ('put', self.exclusive_flow),
+            ('put', self.shared_flow), ('put', self.group_flow)
+        ])
+        self._reopen()
+        self.assertEqual(self.intent_db.load(),
+                         [self.exclusive_flow, self.shared_flow, self.group_flow])
+        self.assertEqual(self.intent_db.load_groups(), [self.group])
+
+    def test_replace_and_delete(self):
+        self.intent_db.apply([
+            ('put', self.group), ('put', self.exclusive_flow), ('put', self.shared_flow)
+        ])
+        # same match key: replaced
+        changed_flow = dict(self.shared_flow, outport=5)
+        changed_group = dict(self.group, buckets=[{'outport': 2}])
+        self.intent_db.apply([('put', changed_flow), ('put', changed_group)])
+        self.intent_db.apply([('delete', self.exclusive_flow)])
+        self._reopen()
+        self.assertEqual(self.intent_db.load(), [changed_flow])
+        self.assertEqual(self.intent_db.load_groups(), [changed_group])
+        self.intent_db.apply([('delete', self.group)])
+        self._reopen()
+        self.assertEqual(self.intent_db.load_groups(), [])
+
+    def test_rollback_of_failed_request(self):
+        self.intent_db.apply([('put', self.exclusive_flow)])
+        # write of a flow fails in the middle of a request
+        with self.intent_db.conn:
+            self.intent_db.conn.execute(
+                "CREATE TRIGGER fail_write BEFORE INSERT ON patch_flows"
+                " WHEN NEW.flow LIKE '%\"group_id\"%'"
+                " BEGIN SELECT RAISE(ABORT, 'write error'); END"
+            )
+        with self.assertRaises(patch_ofc_error.PatchOfcError):
+            self.intent_db.apply([
+                ('put', self.group), ('put', self.shared_flow),
+                ('delete', self.exclusive_flow), ('put', self.group_flow)
+            ])
+        # no change of the request is written
+        self._reopen()
+        self.assertEqual(self.intent_db.load(), [self.exclusive_flow])
+        self.assertEqual(self.intent_db.load_groups(), [])
+
+
+class _Datapath(object):
+    def __init__(self, dpid):
+        self.id = dpid
+        self.ofproto = ofproto_v1_3
+        self.ofproto_parser = ofproto_v1_3_parser
+        self.xid = 0
+
+    def set_xid(self, msg):
+        self.xid += 1
+        msg.xid = self.xid
+
+    def send_msg(self, msg):
+        if msg.xid is None:
+            self.set_xid(msg)
+
+
+class _DPSet(object):
+    def __init__(self, datapaths):
+        self.datapaths = dict((dp.id, dp) for dp in datapaths)
+
+    def get(self, dpid):
+        return self.datapaths.get(dpid)
+
+    def get_all(self):
+        return self.datapaths.items()
+
+
+class _WSGIApplication(object):
+    def register(self, controller, data):
+        pass
+
+
+class TestPatchPanelRestart(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        patch_ofc.CONF.set_override('patch_db', os.path.join(self.temp_dir, 'patch_flows.db'))
+        self.patch_apps = []
+
+    def tearDown(self):
+        for patch_app in self.patch_apps:
+            patch_app.sender.datapath_left(patch_app.dpset.get(2))
+            patch_app.intent_db.close()
+        patch_ofc.CONF.set_override('patch_db', '')
+        shutil.rmtree(self.temp_dir)
+
+    def _patch_app(self):
+        patch_app = patch_ofc.PatchPanel(dpset=_DPSet([_Datapath(2)]), wsgi=_WSGIApplication())
+        self.patch_apps.append(patch_app)
+        return patch_app
+
+    @staticmethod
+    def _request(flow):
+        return patch_ofc_decoder.PatchFlowRequest.from_flow(flow)
+
+    def test_reload_after_restart(self):
+        group = {'dpid': 2, 'group_id': 5, 'buckets': [{'outport': 2}, {'outport': 3}]}
+        group_flow = {'dpid': 2, 'inport': 1, 'group_id': 5, 'priority': EXCLUSIVE}
+        shared_flow = {'dpid': 2, 'inport': 4, 'outport': 6, 'priority': SHARED,
+                       'eth_src': '0a:00:00:00:00:01'}
+        deleted_flow = {'dpid': 2, 'inport': 7, 'outport': 8, 'priority': EXCLUSIVE}
+        patch_app = self._patch_app()
+        self.assertEqual(patch_app.add_patch_group(group).status_int, 200)
+        for flow in [group_flow, shared_flow, deleted_flow]:
+            self.assertEqual(patch_app.add_patch_flow(self._request(flow)).status_int, 200)
+        self.assertEqual(patch_app.delete_patch_flow(self._request(deleted_flow)).status_int, 200)
+
+        restarted_app = self._patch_app()
+        self.assertEqual(list(restarted_app.patch_flows), [group_flow, shared_flow])
+        self.assertEqual(restarted_app.patch_groups.values(), [group])
+        # outports of group are reserved by restored flow
+        with self.assertRaises(patch_ofc_error.PatchOfcConflictError):
+            restarted_app.patch_flows.check_conflict(
+                {'dpid': 2, 'inport': 9, 'outport': 3, 'priority': EXCLUSIVE}
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+import unittest
+from ryu.lib import hub
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+import patch_ofc
+import patch_ofc_decoder
+import patch_ofc_flowstore
+
+EXCLUSIVE = patch_ofc_flowstore.EXCLUSIVE_PRIORITY
+
+
+class _Datapath(object):
+    def __init__(self, dpid):
+        self.id = dpid
+        self.ofproto = ofproto_v1_3
+        self.ofproto_parser = ofproto_v1_3_parser
+        self.xid = 0
+        self.sent = []
+
+    def set_xid(self, msg):
+        self.xid += 1
+        msg.xid = self.xid
+
+    def send_msg(self, msg):
+        if msg.xid is None:
+            self.set_xid(msg)
+        self.sent.append(msg)
+
+
+class _DPSet(object):
+    def __init__(self, datapaths):
+        self.datapaths = dict((dp.id, dp) for dp in datapaths)
+
+    def get(self, dpid):
+        return self.datapaths.get(dpid)
+
+    def get_all(self):
+        return self.datapaths.items()
+
+
+class _WSGIApplication(object):
+    def register(self, controller, data):
+        pass
+
+
+class _Msg(object):
+    def __init__(self, dp, xid, body=None):
+        self.datapath = dp
+        self.xid = xid
+        self.body = body
+
+
+class _AggregateStats(object):
+    def __init__(self, flow_count):
+        self.flow_count = flow_count
+
+
+class _FlowStats(object):
+    def __init__(self, cookie, priority, match):
+        self.cookie = cookie
+        self.priority = priority
+        self.match = match
+
+
+class TestPatchFlowReconciler(unittest.TestCase):
+    def setUp(self):
+        patch_ofc.CONF.set_override('patch_db', '')  # in memory only
+        self.dp = _Datapath(1)
+        self.patch_app = patch_ofc.PatchPanel(
+            dpset=_DPSet([self.dp]), wsgi=_WSGIApplication()
+        )
+        self.reconciler = self.patch_app.reconciler
+        # flow rules sent by ofctl: [(flow_rule, command)]
+        self.sent_rules = []
+        self.patch_app._mod_patch_flow_entry = self._mod_patch_flow_entry
+        self.flow = {'dpid': 1, 'inport': 1, 'outport': 2, 'priority': EXCLUSIVE}
+
+    def tearDown(self):
+        self.patch_app.sender.datapath_left(self.dp)
+
+    def _mod_patch_flow_entry(self, dp, flow_rule, command):
+        self.sent_rules.append((flow_rule, command))
+        dp.set_xid(ofproto_v1_3_parser.OFPFlowMod(dp))  # consumes xid as ofctl
+        return True
+
+    def _put_flow(self, flow):
+        flow_req = patch_ofc_decoder.PatchFlowRequest.from_flow(flow)
+        self.assertEqual(self.patch_app.add_patch_flow(flow_req).status_int, 200)
+
+    def _delete_flow(self, flow):
+        flow_req = patch_ofc_decoder.PatchFlowRequest.from_flow(flow)
+        self.assertEqual(self.patch_app.delete_patch_flow(flow_req).status_int, 200)
+
+    def _wait_barrier(self):
+        for _ in range(100):
+            if self.patch_app.sender.barrier_jobs:
+                break
+            hub.sleep(0.01)
+        (dpid, barrier_xid), sent_jobs = self.patch_app.sender.barrier_jobs.items()[0]
+        self.patch_app.sender.barrier_reply(_Msg(self.dp, barrier_xid))
+
+    def _reconcile(self, stats):
+        self.dp.sent = []
+        self.sent_rules = []
+        self.reconciler.request_flow_stats(self.dp)
+        request = self.dp.sent.pop()
+        self.assertIsInstance(request, ofproto_v1_3_parser.OFPFlowStatsRequest)
+        msg = _Msg(self.dp, request.xid, stats)
+        msg.flags = 0
+        self.reconciler.flow_stats_reply(msg)
+        self.assertNotIn(self.dp.id, self.reconciler.flow_stats)
+
+    def _audit(self, flow_count):
+        """ :return: True if flow stats is requested by the audit """
+        self.dp.sent = []
+        self.reconciler.request_aggregate_stats(self.dp)
+        request = self.dp.sent.pop()
+        self.reconciler.aggregate_stats_reply(
+            _Msg(self.dp, request.xid, _AggregateStats(flow_count))
+        )
+        return self.dp.id in self.reconciler.flow_stats
+
+    def _stored_entries(self, flow):
+        return [_FlowStats(patch_ofc_flowstore.flow_cookie(flow), flow['priority'], None)]
+
+    def test_stale_entry_deleted(self):
+        self._put_flow(self.flow)
+        self._wait_barrier()
+        stale_cookie = 12345
+        self._reconcile(self._stored_entries(self.flow) + [_FlowStats(stale_cookie, 100, 'match')])
+        self._wait_barrier()
+        flow_mods = [msg for msg in self.dp.sent
+                     if isinstance(msg, ofproto_v1_3_parser.OFPFlowMod)]
+        self.assertEqual(len(flow_mods), 1)
+        self.assertEqual(flow_mods[0].command, ofproto_v1_3.OFPFC_DELETE_STRICT)
+        self.assertEqual((flow_mods[0].cookie, flow_mods[0].priority, flow_mods[0].match),
+                         (stale_cookie, 100, 'match'))
+        # stored flow is not pushed again
+        self.assertEqual(self.sent_rules, [])
+
+    def test_missing_flow_added(self):
+        self._put_flow(self.flow)
+        self._wait_barrier()
+        self._reconcile([])
+        self._wait_barrier()
+        self.assertEqual(len(self.sent_rules), 1)
+        flow_rule, command = self.sent_rules[0]
+        self.assertEqual(command, ofproto_v1_3.OFPFC_ADD)
+        self.assertEqual(flow_rule['cookie'], patch_ofc_flowstore.flow_cookie(self.flow))
+
+    def test_reconciled_table_is_not_changed(self):
+        self._put_flow(self.flow)
+        self._wait_barrier()
+        self._reconcile(self._stored_entries(self.flow))
+        self.assertEqual(self.dp.sent, [])
+        self.assertEqual(self.sent_rules, [])
+
+    def test_expected_count_follows_store(self):
+        # not reconciled: audit requests flow stats
+        self.assertTrue(self._audit(1))
+        self.reconciler.flow_stats.clear()
+        self._reconcile([])
+        self.assertEqual(self.reconciler.expected_counts[self.dp.id], 0)
+        self.assertFalse(self._audit(1))  # default deny rule only
+
+        self._put_flow(self.flow)
+        self.assertEqual(self.reconciler.expected_counts[self.dp.id], 1)
+        self.assertFalse(self._audit(2))
+        self.assertTrue(self._audit(1))
+        self.reconciler.flow_stats.clear()
+        # replace by same match key
+        self._put_flow(self.flow)
+        self.assertEqual(self.reconciler.expected_counts[self.dp.id], 1)
+        self._delete_flow(self.flow)
+        self.assertEqual(self.reconciler.expected_counts[self.dp.id], 0)
+        self.assertFalse(self._audit(1))
+
+    def test_audit_does_not_build_entries(self):
+        self._reconcile([])
+        self._put_flow(self.flow)
+
+        def _build_flow(dp, req_flow):
+            self.fail("flow entries are built in audit")
+        self.patch_app.flow_builder.build_flow = _build_flow
+        self.assertFalse(self._audit(2))
+
+    def test_datapath_left(self):
+        self._reconcile([])
+        self.reconciler.datapath_left(self.dp)
+        self.assertNotIn(self.dp.id, self.reconciler.expected_counts)
+        self.assertTrue(self._audit(1))
+
+
+if __name__ == '__main__':
+    unittest.main()
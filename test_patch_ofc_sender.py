@@ -0,0 +1,174 @@
+import unittest
+from ryu.lib import hub
+from ryu.ofproto import ofproto_v1_3
+from ryu.ofproto import ofproto_v1_3_parser
+import patch_ofc_error
+import patch_ofc_sender
+
+
+class _Datapath(object):
+    def __init__(self, dpid, xid=0):
+        self.id = dpid
+        self.ofproto = ofproto_v1_3
+        self.ofproto_parser = ofproto_v1_3_parser
+        self.xid = xid
+        self.sent = []
+
+    def set_xid(self, msg):
+        self.xid = (self.xid + 1) & patch_ofc_sender.MAX_XID
+        msg.xid = self.xid
+
+    def send_msg(self, msg):
+        if msg.xid is None:
+            self.set_xid(msg)
+        self.sent.append(msg)
+
+
+class _FlowMod(object):
+    def __init__(self, entry, command):
+        self.entry = entry
+        self.command = command
+        self.xid = None
+
+
+class _PatchApp(object):
+    """ sends one message per entry, as ofctl does """
+    def _mod_patch_entry(self, dp, entry, command):
+        if entry == 'invalid':
+            raise patch_ofc_error.PatchOfcError("invalid entry")
+        if entry == 'malformed':
+            raise KeyError('outport')
+        dp.send_msg(_FlowMod(entry, command))
+
+
+class _Msg(object):
+    def __init__(self, dp, xid, msg_type=0, code=0):
+        self.datapath = dp
+        self.xid = xid
+        self.type = msg_type
+        self.code = code
+
+
+def _flow_mods(*entries):
+    return [(entry, ofproto_v1_3.OFPFC_ADD) for entry in entries]
+
+
+class TestPatchFlowSender(unittest.TestCase):
+    def setUp(self):
+        self.sender = patch_ofc_sender.PatchFlowSender(_PatchApp())
+        self.dp = _Datapath(1)
+
+    def _new_job(self, flow_mods):
+        job = self.sender.new_job()
+        job.add_pending(len(flow_mods))
+        job.close()
+        return job, flow_mods
+
+    def _barrier(self):
+        barrier = self.dp.sent[-1]
+        self.assertIsInstance(barrier, ofproto_v1_3_parser.OFPBarrierRequest)
+        return barrier
+
+    def test_xid_in_range(self):
+        self.assertTrue(patch_ofc_sender._xid_in_range(5, 3, 7))
+        self.assertFalse(patch_ofc_sender._xid_in_range(8, 3, 7))
+        self.assertFalse(patch_ofc_sender._xid_in_range(2, 3, 7))
+        max_xid = patch_ofc_sender.MAX_XID
+        self.assertTrue(patch_ofc_sender._xid_in_range(0, max_xid - 1, 1))
+        self.assertTrue(patch_ofc_sender._xid_in_range(max_xid, max_xid - 1, 1))
+        self.assertFalse(patch_ofc_sender._xid_in_range(2, max_xid - 1, 1))
+
+    def test_coalesce_batch(self):
+        self.sender.BATCH_SIZE = 4
+        queue = hub.Queue()
+        entries = [self._new_job(_flow_mods('a', 'b', 'c')),
+                   self._new_job(_flow_mods('d', 'e')),
+                   self._new_job(_flow_mods('f'))]
+        for entry in entries:
+            queue.put(entry)
+        # coalesced until BATCH_SIZE is reached
+        self.assertEqual(self.sender._next_batch(queue), entries[:2])
+        self.assertEqual(self.sender._next_batch(queue), entries[2:])
+
+    def test_barrier_confirms_batch(self):
+        entries = [self._new_job(_flow_mods('a', 'b')), self._new_job(_flow_mods('c'))]
+        self.sender._send_batch(self.dp, entries)
+        # flow-mods back to back and one barrier
+        self.assertEqual([msg.entry for msg in self.dp.sent[:-1]], ['a', 'b', 'c'])
+        barrier = self._barrier()
+        jobs = [job for job, flow_mods in entries]
+        self.assertFalse(any(job.is_finished() for job in jobs))
+        # barrier reply of other datapath is ignored
+        self.sender.barrier_reply(_Msg(_Datapath(2), barrier.xid))
+        self.assertFalse(any(job.is_finished() for job in jobs))
+        self.sender.barrier_reply(_Msg(self.dp, barrier.xid))
+        self.assertEqual([job.status for job in jobs], ['done', 'done'])
+        self.assertEqual(self.sender.barrier_jobs, {})
+
+    def test_error_reply_fails_job_of_xid(self):
+        entries = [self._new_job(_flow_mods('a', 'b')), self._new_job(_flow_mods('c', 'd'))]
+        self.sender._send_batch(self.dp, entries)
+        rejected_xid = self.dp.sent[2].xid  # flow-mod 'c' of second job
+        self.assertTrue(self.sender.error_reply(_Msg(self.dp, rejected_xid, 5, 1)))
+        self.assertFalse(self.sender.error_reply(_Msg(self.dp, self.dp.xid + 10)))
+        self.sender.barrier_reply(_Msg(self.dp, self._barrier().xid))
+        first_job, second_job = [job for job, flow_mods in entries]
+        self.assertEqual(first_job.status, 'done')
+        self.assertEqual(second_job.status, 'failed')
+        self.assertIn('xid:%d' % rejected_xid, second_job.errors[0])
+
+    def test_error_reply_over_xid_wraparound(self):
+        self.dp.xid = patch_ofc_sender.MAX_XID - 1
+        entries = [self._new_job(_flow_mods('a')), self._new_job(_flow_mods('b', 'c'))]
+        self.sender._send_batch(self.dp, entries)
+        self.assertEqual([msg.xid for msg in self.dp.sent], [patch_ofc_sender.MAX_XID, 0, 1, 2])
+        self.assertTrue(self.sender.error_reply(_Msg(self.dp, 1)))
+        self.sender.barrier_reply(_Msg(self.dp, 2))
+        self.assertEqual([job.status for job, flow_mods in entries], ['done', 'failed'])
+
+    def test_send_error_fails_only_the_job(self):
+        entries = [self._new_job(_flow_mods('a', 'invalid')),
+                   self._new_job(_flow_mods('malformed')),
+                   self._new_job(_flow_mods('b'))]
+        self.sender._send_batch(self.dp, entries)
+        jobs = [job for job, flow_mods in entries]
+        self.assertEqual([job.status for job in jobs[:2]], ['failed', 'failed'])
+        self.sender.barrier_reply(_Msg(self.dp, self._barrier().xid))
+        self.assertEqual(jobs[2].status, 'done')
+
+    def test_datapath_left_fails_jobs(self):
+        # drain thread is not running: submitted job stays in queue
+        self.sender.queues[self.dp.id] = queue = hub.Queue()
+        queued_job = self.sender.new_job()
+        self.sender.submit(queued_job, self.dp, _flow_mods('a'))
+        queued_job.close()
+        sent_job, flow_mods = self._new_job(_flow_mods('b'))
+        self.sender._send_batch(self.dp, [(sent_job, flow_mods)])
+
+        self.sender.datapath_left(self.dp)
+        self.assertEqual(queued_job.status, 'failed')
+        self.assertIn('before flow-mods are sent', queued_job.errors[0])
+        self.assertEqual(sent_job.status, 'failed')
+        self.assertIn('before barrier reply', sent_job.errors[0])
+        self.assertEqual(self.sender.barrier_jobs, {})
+        self.assertNotIn(self.dp.id, self.sender.queues)
+        # drain thread is stopped by sentinel
+        self.assertIsNone(queue.get_nowait())
+
+    def test_submit_and_confirm(self):
+        job = self.sender.new_job()
+        self.sender.submit(job, self.dp, _flow_mods('a', 'b'))
+        job.close()
+        for _ in range(100):
+            if self.sender.barrier_jobs:
+                break
+            hub.sleep(0.01)
+        self.sender.barrier_reply(_Msg(self.dp, self._barrier().xid))
+        self.assertTrue(job.wait(1))
+        self.assertEqual(job.to_dict()['flow-mods'], 2)
+        self.assertEqual(self.sender.job_by_id(job.id), job)
+        self.sender.datapath_left(self.dp)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+import patch_node
+import patch_wire_group
+import patch_path
+import patch_error
+
+
+def _node_data(host_count):
+    # triangle of dispatchers: s1 - s2 (shortest), s1 - s3 - s2 (detour)
+    # test hosts on s1 and DUTs on s2
+    node_data = {
+        'test-hosts': {}, 'dut-hosts': {}, 'dispatchers': {},
+        'link-list': [
+            [['s1', 's1-eth1'], ['s2', 's2-eth1']],
+            [['s1', 's1-eth2'], ['s3', 's3-eth1']],
+            [['s3', 's3-eth2'], ['s2', 's2-eth2']]
+        ]
+    }
+    # s1/s2: 2 inter-switch ports and host ports, s3: 2 inter-switch ports
+    port_counts = [('s1', 2 + host_count), ('s2', 2 + host_count), ('s3', 2)]
+    for index, (switch_name, port_count) in enumerate(port_counts):
+        node_data['dispatchers'][switch_name] = {
+            'datapath-id': index + 1,
+            'port-index': dict(
+                ('%s-eth%d' % (switch_name, number), {'number': number})
+                for number in range(1, port_count + 1)
+            )
+        }
+    for number in range(1, host_count + 1):
+        test_host = 'th%d' % number
+        dut_host = 'dut%d' % number
+        node_data['test-hosts'][test_host] = {'port-index': {
+            test_host + '-eth0': {
+                'mac-addr': '0a:00:00:00:00:%02x' % number, 'ip-addr': '10.0.0.%d/8' % number
+            }
+        }}
+        node_data['dut-hosts'][dut_host] = {'port-index': {
+            dut_host + '-eth0': {'vlan-tagged': False}
+        }}
+        node_data['link-list'].append(
+            [[test_host, test_host + '-eth0'], ['s1', 's1-eth%d' % (number + 2)]]
+        )
+        node_data['link-list'].append(
+            [[dut_host, dut_host + '-eth0'], ['s2', 's2-eth%d' % (number + 2)]]
+        )
+    return node_data
+
+
+def _wire_data(host_count):
+    return {
+        'wire-index': dict(
+            ('wire%d' % number, {
+                'mode': 'exclusive',
+                'test-host-port': ['th%d' % number, 'th%d-eth0' % number],
+                'dut-host-port': ['dut%d' % number, 'dut%d-eth0' % number]
+            })
+            for number in range(1, host_count + 1)
+        ),
+        'wire-group-index': {}
+    }
+
+
+def _switches(path):
+    return [(elm.node, elm.port) for elm in path]
+
+
+class TestPathComputer(unittest.TestCase):
+    def _setup(self, host_count):
+        node_mgr = patch_node.NodeManager(_node_data(host_count))
+        wire_mgr = patch_wire_group.WireManager(_wire_data(host_count))
+        return patch_path.PathComputer(node_mgr), wire_mgr
+
+    def test_shortest_path(self):
+        path_computer, wire_mgr = self._setup(1)
+        path = path_computer.compute_path(wire_mgr.wire_by_name('wire1'))
+        self.assertEqual(_switches(path), [
+            ('s1', 's1-eth3'), ('s1', 's1-eth1'), ('s2', 's2-eth1'), ('s2', 's2-eth3')
+        ])
+
+    def test_detour_of_reserved_link(self):
+        # shortest link is reserved by wire1: detour is the only feasible path
+        path_computer, wire_mgr = self._setup(2)
+        path_computer.fill_wire_paths(wire_mgr)
+        self.assertEqual(_switches(wire_mgr.wire_by_name('wire2').path), [
+            ('s1', 's1-eth4'), ('s1', 's1-eth2'), ('s3', 's3-eth1'),
+            ('s3', 's3-eth2'), ('s2', 's2-eth2'), ('s2', 's2-eth4')
+        ])
+        self.assertEqual(sorted(path_computer.reserved_links.values()),
+                         ['wire1', 'wire2', 'wire2'])
+
+    def test_no_available_path(self):
+        path_computer, wire_mgr = self._setup(3)
+        path_computer.compute_path(wire_mgr.wire_by_name('wire1'))
+        path_computer.compute_path(wire_mgr.wire_by_name('wire2'))
+        link_load = dict(path_computer.link_load)
+        with self.assertRaises(patch_error.PatchDefinitionError):
+            path_computer.compute_path(wire_mgr.wire_by_name('wire3'))
+        # links are not counted for the failed wire
+        self.assertEqual(path_computer.link_load, link_load)
+
+
+if __name__ == '__main__':
+    unittest.main()
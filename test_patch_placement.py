@@ -0,0 +1,160 @@
+import unittest
+import patch_node
+import patch_wire_group
+import patch_placement
+import patch_topogen
+import patch_error
+
+FABRIC_LINK = 0  # index of s1-s2 link of fabric in link list
+
+
+class _Port(object):
+    def __init__(self, bandwidth=None, max_wires=None):
+        self.bandwidth = bandwidth
+        self.max_wires = max_wires
+
+
+class _Wire(object):
+    def __init__(self, name, bandwidth=0, exclusive=False):
+        self.name = name
+        self.bandwidth = bandwidth
+        self.exclusive = exclusive
+
+    def is_exclusive(self):
+        return self.exclusive
+
+
+class TestLinkUsage(unittest.TestCase):
+    def test_budgets_of_both_ports(self):
+        usage = patch_placement.LinkUsage(None, _Port(100, None), _Port(1000, 3))
+        self.assertEqual((usage.bandwidth, usage.max_wires), (100, 3))
+        usage = patch_placement.LinkUsage(None, _Port(), _Port())
+        self.assertEqual((usage.bandwidth, usage.max_wires), (None, None))
+
+    def test_max_wires(self):
+        usage = patch_placement.LinkUsage(None, _Port(max_wires=2), _Port())
+        for name in ['w1', 'w2']:
+            self.assertTrue(usage.can_accept(_Wire(name)))
+            usage.accept(_Wire(name))
+        self.assertFalse(usage.can_accept(_Wire('w3')))
+        self.assertEqual(usage.utilization(), 1.0)
+
+    def test_bandwidth(self):
+        usage = patch_placement.LinkUsage(None, _Port(bandwidth=100), _Port())
+        usage.accept(_Wire('w1', 60))
+        self.assertTrue(usage.can_accept(_Wire('w2', 40)))
+        self.assertFalse(usage.can_accept(_Wire('w2', 41)))
+        self.assertEqual(usage.utilization(), 0.6)
+
+    def test_exclusive_wire_takes_whole_link(self):
+        usage = patch_placement.LinkUsage(None, _Port(bandwidth=100), _Port())
+        usage.accept(_Wire('w1', 10))
+        self.assertFalse(usage.can_accept(_Wire('exc1', exclusive=True)))
+
+        usage = patch_placement.LinkUsage(None, _Port(bandwidth=100), _Port())
+        self.assertTrue(usage.can_accept(_Wire('exc1', exclusive=True)))
+        usage.accept(_Wire('exc1', exclusive=True))
+        self.assertEqual((usage.exclusive_wire, usage.used_bandwidth), ('exc1', 100))
+        self.assertFalse(usage.can_accept(_Wire('w1')))
+        self.assertFalse(usage.can_accept(_Wire('exc2', exclusive=True)))
+        self.assertEqual(usage.utilization(), 1.0)
+
+
+class TestWirePlacementOptimizer(unittest.TestCase):
+    """
+    synthetic topology: s1 - s2 (fabric link) and dedicated link of each exclusive wire,
+    fabric link is used by 3 shared wires (shd-wire1, 3, 5).
+    """
+    def setUp(self):
+        self.topology = patch_topogen.SyntheticTopology(2, 'line', 8, 0.25, 4)
+        self.crossing_wires = ['shd-wire1', 'shd-wire3', 'shd-wire5']
+
+    def _set_link_budget(self, link_index, budget):
+        for node, port in self.topology.link_list[link_index]:
+            self.topology.dispatchers[node]['port-index'][port].update(budget)
+
+    def _place(self, rebalance):
+        node_mgr = patch_node.NodeManager(self.topology.node_data())
+        wire_mgr = patch_wire_group.WireManager(self.topology.wire_data())
+        placement = patch_placement.WirePlacementOptimizer(node_mgr)
+        placement.place(wire_mgr, rebalance)
+        return placement, wire_mgr
+
+    def _usage(self, placement, link_index):
+        (node1, port1), (node2, port2) = self.topology.link_list[link_index]
+        for link, usage in placement.usage.items():
+            if (link.endpoint1.node, link.endpoint1.port) == (node1, port1):
+                return usage
+        return None
+
+    def test_check(self):
+        placement, wire_mgr = self._place(False)
+        self.assertEqual(sorted(self._usage(placement, FABRIC_LINK).wires), self.crossing_wires)
+        self.assertEqual(placement.moved_hops, 0)
+
+    def test_max_wires_budget(self):
+        self._set_link_budget(FABRIC_LINK, {'max-wires': 2})
+        with self.assertRaises(patch_error.PatchDefinitionError):
+            self._place(False)
+        self._set_link_budget(FABRIC_LINK, {'max-wires': 3})
+        placement, wire_mgr = self._place(False)
+        self.assertEqual(self._usage(placement, FABRIC_LINK).utilization(), 1.0)
+
+    def test_bandwidth_budget(self):
+        self._set_link_budget(FABRIC_LINK, {'bandwidth': 100})
+        for name in self.crossing_wires:
+            self.topology.wire_index[name]['bandwidth'] = 40
+        with self.assertRaises(patch_error.PatchDefinitionError):
+            self._place(False)
+        for name in self.crossing_wires:
+            self.topology.wire_index[name]['bandwidth'] = 30
+        placement, wire_mgr = self._place(False)
+        self.assertEqual(self._usage(placement, FABRIC_LINK).used_bandwidth, 90)
+
+    def test_exclusive_wire_takes_whole_link(self):
+        # exclusive wire through fabric link: shared wires cannot use it
+        exc_wire = self.topology.wire_index['exc-wire1']
+        exc_wire['path'][1:3] = self.topology.link_list[FABRIC_LINK]
+        with self.assertRaises(patch_error.PatchDefinitionError) as context:
+            self._place(False)
+        self.assertIn("used by exclusive wire:exc-wire1", context.exception.message)
+
+    def test_rebalance_parallel_links(self):
+        self.topology._add_inter_switch_link('s1', 's2')
+        parallel_link = len(self.topology.link_list) - 1
+        for link_index in [FABRIC_LINK, parallel_link]:
+            self._set_link_budget(link_index, {'max-wires': 2})
+        with self.assertRaises(patch_error.PatchDefinitionError):
+            self._place(False)
+
+        placement, wire_mgr = self._place(True)
+        self.assertEqual(placement.moved_hops, 1)
+        fabric_usage = self._usage(placement, FABRIC_LINK)
+        parallel_usage = self._usage(placement, parallel_link)
+        self.assertEqual(len(fabric_usage.wires), 2)
+        self.assertEqual(len(parallel_usage.wires), 1)
+        # links of exclusive wires are not used by shared wires
+        for usage in placement.usage.values():
+            if usage.exclusive_wire is not None:
+                self.assertEqual(usage.wires, [usage.exclusive_wire])
+        # path of moved wire uses ports of parallel link
+        moved_wire = wire_mgr.wire_index[parallel_usage.wires[0]]
+        parallel_ports = [tuple(hop) for hop in self.topology.link_list[parallel_link]]
+        path_ports = [(elm.node, elm.port) for elm in moved_wire.path]
+        for port in parallel_ports:
+            self.assertIn(port, path_ports)
+
+    def test_rebalance_to_free_dedicated_link(self):
+        # exclusive wire through fabric link: its dedicated link is free for shared wires
+        exc_wire = self.topology.wire_index['exc-wire1']
+        dedicated_link = exc_wire['path'][1:3]
+        exc_wire['path'][1:3] = self.topology.link_list[FABRIC_LINK]
+        placement, wire_mgr = self._place(True)
+        self.assertEqual(placement.moved_hops, 3)
+        self.assertEqual(self._usage(placement, FABRIC_LINK).wires, ['exc-wire1'])
+        dedicated_usage = self._usage(placement, self.topology.link_list.index(dedicated_link))
+        self.assertEqual(sorted(dedicated_usage.wires), self.crossing_wires)
+
+
+if __name__ == '__main__':
+    unittest.main()
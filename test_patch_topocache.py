@@ -0,0 +1,106 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import patch_flowgen
+import patch_topocache
+
+
+class _RecordingTopologyCache(patch_topocache.TopologyCache):
+    """ topology cache that records keys of saved (missed) topology """
+    def __init__(self, cache_dir):
+        super(_RecordingTopologyCache, self).__init__(cache_dir)
+        self.saved_keys = []
+
+    def save(self, key, node_mgr, wire_mgr):
+        self.saved_keys.append(key)
+        super(_RecordingTopologyCache, self).save(key, node_mgr, wire_mgr)
+
+
+class TestTopologyCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = _RecordingTopologyCache(os.path.join(self.temp_dir, 'cache'))
+        self.nodeinfo_filename = self._copy('nodeinfo_topo2.json')
+        self.wireinfo_filename = self._copy('wireinfo_topo2.json')
+        self.model_modules = patch_topocache.MODEL_MODULES
+
+    def tearDown(self):
+        patch_topocache.MODEL_MODULES = self.model_modules
+        shutil.rmtree(self.temp_dir)
+
+    def _copy(self, file_name):
+        copied_file_name = os.path.join(self.temp_dir, file_name)
+        shutil.copy(file_name, copied_file_name)
+        return copied_file_name
+
+    def _load_generator(self):
+        return self.cache.load_generator(self.nodeinfo_filename, self.wireinfo_filename)
+
+    def _key(self):
+        return self.cache.cache_key(self.nodeinfo_filename, self.wireinfo_filename)
+
+    def test_hit(self):
+        generator = self._load_generator()
+        self.assertEqual(self.cache.saved_keys, [self._key()])
+        self.assertTrue(os.path.exists(self.cache.cache_file_name(self._key())))
+        cached_generator = self._load_generator()
+        self.assertEqual(len(self.cache.saved_keys), 1)
+        # cached topology makes same flow rules
+        self.assertEqual(cached_generator.generate_flow_rule('all'),
+                         generator.generate_flow_rule('all'))
+        self.assertEqual(
+            cached_generator.generate_flow_rule('all'),
+            patch_flowgen.FlowRuleGenerator(
+                self.nodeinfo_filename, self.wireinfo_filename
+            ).generate_flow_rule('all')
+        )
+
+    def test_miss_by_input_change(self):
+        self._load_generator()
+        with open(self.wireinfo_filename) as wireinfo_file:
+            wireinfo = json.load(wireinfo_file)
+        wire_name = sorted(wireinfo['wire-index'].keys())[0]
+        wireinfo['wire-index'][wire_name]['description'] = 'changed wire'
+        with open(self.wireinfo_filename, 'w') as wireinfo_file:
+            json.dump(wireinfo, wireinfo_file)
+        self._load_generator()
+        self.assertEqual(len(self.cache.saved_keys), 2)
+        self.assertNotEqual(self.cache.saved_keys[0], self.cache.saved_keys[1])
+
+    def test_miss_by_option_change(self):
+        self._load_generator()
+        self.cache.load_generator(
+            self.nodeinfo_filename, self.wireinfo_filename, "OpenFlow13", False
+        )
+        self.assertEqual(len(self.cache.saved_keys), 2)
+
+    def test_miss_by_source_change(self):
+        source_file_name = os.path.join(self.temp_dir, 'patch_model.py')
+        with open(source_file_name, 'w') as source_file:
+            source_file.write("VERSION = 1\n")
+        source_module = type('SourceModule', (object,), {'__file__': source_file_name + 'c'})
+        patch_topocache.MODEL_MODULES = self.model_modules + (source_module,)
+        self._load_generator()
+        with open(source_file_name, 'w') as source_file:
+            source_file.write("VERSION = 2\n")
+        self._load_generator()
+        self.assertEqual(len(self.cache.saved_keys), 2)
+        self.assertNotEqual(self.cache.saved_keys[0], self.cache.saved_keys[1])
+
+    def test_corrupt_cache_file(self):
+        generator = self._load_generator()
+        with open(self.cache.cache_file_name(self._key()), 'wb') as cache_file:
+            cache_file.write("not a pickle")
+        self.assertIsNone(self.cache.load(self._key()))
+        # made again and cache file is replaced
+        rebuilt_generator = self._load_generator()
+        self.assertEqual(self.cache.saved_keys, [self._key(), self._key()])
+        self.assertEqual(rebuilt_generator.generate_flow_rule('all'),
+                         generator.generate_flow_rule('all'))
+        self.assertIsNotNone(self.cache.load(self._key()))
+
+
+if __name__ == '__main__':
+    unittest.main()
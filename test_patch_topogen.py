@@ -0,0 +1,50 @@
+import unittest
+import collections
+import patch_node
+import patch_wire_group
+import patch_flowgen
+import patch_topogen
+
+
+class TestSyntheticTopology(unittest.TestCase):
+    @staticmethod
+    def _topologies():
+        for fabric in patch_topogen.SyntheticTopology.FABRIC_SHAPES:
+            for dispatchers in (1, 4, 9, 16):
+                for exclusive_ratio in (0.25, 1.0):
+                    yield patch_topogen.SyntheticTopology(
+                        dispatchers, fabric, 64, exclusive_ratio, 4
+                    )
+
+    def test_placement_check_passes(self):
+        for topology in self._topologies():
+            placement = topology.check_placement()
+            # exclusive wires do not share inter-switch links
+            for usage in placement.usage.values():
+                if usage.exclusive_wire is not None:
+                    self.assertEqual(usage.wires, [usage.exclusive_wire])
+
+    def test_exclusive_wires_have_dedicated_ports(self):
+        for topology in self._topologies():
+            port_wires = collections.defaultdict(set)  # (node, port): wire names
+            for name, wire in topology.wire_index.items():
+                for node, port in wire['path']:
+                    port_wires[(node, port)].add(name)
+            for name, wire in topology.wire_index.items():
+                if wire['mode'] != 'exclusive':
+                    continue
+                for node, port in wire['path']:
+                    self.assertEqual(port_wires[(node, port)], set([name]))
+
+    def test_no_duplicate_rules(self):
+        for topology in self._topologies():
+            flow_rule_generator = patch_flowgen.FlowRuleGenerator.from_managers(
+                patch_node.NodeManager(topology.node_data()),
+                patch_wire_group.WireManager(topology.wire_data())
+            )
+            flow_rule, optimizer = flow_rule_generator.optimize_flow_rule('all')
+            self.assertEqual(optimizer.merged_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import re
+import json
+import unittest
+import StringIO
+import patch_flowgen
+import scenario_generator
+
+
+class TestScenarioGenerator(unittest.TestCase):
+    PATTERN_FILE = 'scenario_pattern_topo2.json'
+    WIREINFO_FILE = 'wireinfo_topo2.json'
+    PING_RE = r"\[(.+)\] ping (.+) to (.+)"
+
+    def setUp(self):
+        wire_mgr = patch_flowgen.FlowRuleGenerator.gen_wire_manager_by_file(self.WIREINFO_FILE)
+        self.host_classifier = scenario_generator.HostClassifier(wire_mgr)
+
+    def _generate(self, host_classifier=None):
+        scenario_gen = scenario_generator.ScenarioGenerator(self.PATTERN_FILE, host_classifier)
+        scenario_gen.generate_scenario()
+        return scenario_gen
+
+    def _ping_tasks(self, scenario_gen):
+        return [ping_task for scenario_data in scenario_gen.data
+                for ping_task in scenario_data["task-list"]]
+
+    def _parse(self, ping_task):
+        return re.match(self.PING_RE, ping_task["task"]).groups()
+
+    def test_write_scenario(self):
+        # streaming output is same as dump of whole scenario list
+        for host_classifier in [None, self.host_classifier]:
+            scenario_gen = self._generate(host_classifier)
+            out = StringIO.StringIO()
+            scenario_gen.write_scenario(out)
+            self.assertEqual(out.getvalue(), json.dumps(scenario_gen.data, indent=2) + "\n")
+
+    def test_reduced_tasks_cover_all_fail_pairs(self):
+        full_tasks = self._ping_tasks(self._generate())
+        reduced_tasks = self._ping_tasks(self._generate(self.host_classifier))
+        self.assertLess(len(reduced_tasks), len(full_tasks))
+
+        # SUCCESS tasks are not reduced
+        self.assertEqual([task for task in reduced_tasks if task["expect"] == 'SUCCESS'],
+                         [task for task in full_tasks if task["expect"] == 'SUCCESS'])
+        # each FAIL pair is covered once by a task of same task name
+        full_pairs = sorted(self._parse(task) for task in full_tasks if task["expect"] == 'FAIL')
+        covered_pairs = []
+        for task in reduced_tasks:
+            if task["expect"] != 'FAIL':
+                continue
+            task_name, host1, host2 = self._parse(task)
+            self.assertEqual(task["covers"][0], "%s to %s" % (host1, host2))
+            for covered_pair in task["covers"]:
+                covered_host1, covered_host2 = covered_pair.split(" to ")
+                covered_pairs.append((task_name, covered_host1, covered_host2))
+        self.assertEqual(sorted(covered_pairs), full_pairs)
+
+    def test_reduced_by_ordered_class_pair(self):
+        classify = self.host_classifier.classify
+        for task in self._ping_tasks(self._generate(self.host_classifier)):
+            if "covers" not in task:
+                continue
+            task_name, host1, host2 = self._parse(task)
+            covered_pairs = [tuple(pair.split(" to ")) for pair in task["covers"]]
+            for covered_host1, covered_host2 in covered_pairs:
+                self.assertEqual((classify(covered_host1), classify(covered_host2)),
+                                 (classify(host1), classify(host2)))
+                # reversed pair is tested by its own task
+                self.assertNotIn((covered_host2, covered_host1), covered_pairs)
+
+    def test_reversed_pair_is_tested(self):
+        classify = self.host_classifier.classify
+        full_pairs = set(self._parse(task) for task in self._ping_tasks(self._generate()))
+        tested_pairs = set(
+            self._parse(task) for task in self._ping_tasks(self._generate(self.host_classifier))
+        )
+        for task_name, host1, host2 in tested_pairs:
+            if (task_name, host2, host1) in full_pairs and classify(host1) == classify(host2):
+                self.assertIn((task_name, host2, host1), tested_pairs)
+
+
+if __name__ == '__main__':
+    unittest.main()